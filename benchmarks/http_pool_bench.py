@@ -0,0 +1,129 @@
+"""
+Benchmark: connection reuse of the shared LLM HTTP pool against a local stub.
+
+Starts the mock providers (benchmarks/mock_providers.py) and replays the LLM
+calls of concurrent workflows (coordinator, planner, supervisor, researcher,
+supervisor, reporter, supervisor) with one LLM per type, as
+get_llm_by_type does, using each agent's primary LLM type. Three client setups are compared:
+- new client per call: no connection is ever reused;
+- per-LLM pools: every LLM owns its clients, the SDK default and the
+  previous behaviour;
+- shared pool: every LLM uses the per-origin clients of one HttpClientPool.
+
+Reported per setup: requests, connections opened, connection reuse rate and
+call latency (p50/p95). The stub speaks plain HTTP; against a real backend
+every opened connection also costs a TLS handshake.
+
+Usage:
+    python -m benchmarks.http_pool_bench [--workflows 20] [--rounds 3] [--ttft 0.05]
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.load_test import ROOT, free_port, percentile, stop_servers, wait_until_ready
+from src.agents.http_pool import HttpClientPool
+from src.config.agents import AGENT_LLM_MAP
+
+WORKFLOW_CALLS = ["coordinator", "planner", "supervisor", "researcher", "supervisor", "reporter", "supervisor"]
+
+
+def start_mock(ttft: float, log) -> tuple[str, subprocess.Popen]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.mock_providers",
+            "--port", str(port), "--ttft", str(ttft), "--tokens-per-second", "0",
+        ],
+        cwd=ROOT, stdout=log, stderr=log,
+    )
+    try:
+        wait_until_ready(f"{url}/openapi.json", process)
+    except BaseException:
+        stop_servers([process])
+        raise
+    return url, process
+
+
+def llm(base_url: str, pool: HttpClientPool) -> ChatOpenAI:
+    return ChatOpenAI(
+        model="mock",
+        api_key="mock",
+        base_url=base_url,
+        http_client=pool.sync_client(base_url),
+        http_async_client=pool.async_client(base_url),
+    )
+
+
+async def run(setup: str, base_url: str, workflows: int, rounds: int) -> tuple[dict, list[float]]:
+    """Replay workflows concurrently for rounds; return the pool statistics and call latencies."""
+    shared = HttpClientPool()
+    pools = []
+    llms = {}
+    for llm_type in sorted({llm_types[0] for llm_types in AGENT_LLM_MAP.values()}):
+        pool = shared if setup == "shared pool" else HttpClientPool()
+        pools.append(pool)
+        llms[llm_type] = llm(base_url, pool)
+    latencies = []
+
+    async def call(agent: str):
+        model = llms[AGENT_LLM_MAP[agent][0]]
+        if setup == "new client per call":
+            pool = HttpClientPool()
+            pools.append(pool)
+            model = llm(base_url, pool)
+        messages = [SystemMessage(content=f"You are the {agent}."), HumanMessage(content="hi")]
+        start = time.perf_counter()
+        await model.ainvoke(messages)
+        latencies.append(time.perf_counter() - start)
+
+    async def workflow():
+        for agent in WORKFLOW_CALLS:
+            await call(agent)
+
+    for _ in range(rounds):
+        await asyncio.gather(*(workflow() for _ in range(workflows)))
+
+    totals = {"requests": 0, "connections_opened": 0}
+    for pool in {id(pool): pool for pool in pools}.values():
+        for stats in pool.get_stats().values():
+            for key in totals:
+                totals[key] += stats[key]
+        await pool.aclose()
+    return totals, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workflows", type=int, default=20, help="concurrent workflows")
+    parser.add_argument("--rounds", type=int, default=3, help="times the workflows are replayed")
+    parser.add_argument("--ttft", type=float, default=0.05, help="mock LLM response time")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w+", prefix="http_pool_bench_", suffix=".log", delete=False) as log:
+        url, process = start_mock(args.ttft, log)
+        try:
+            print(f"workflows: {args.workflows}  rounds: {args.rounds}  calls per workflow: {len(WORKFLOW_CALLS)}")
+            print(f"{'setup':<22} {'requests':>9} {'conns':>7} {'reuse':>7} {'p50 ms':>8} {'p95 ms':>8}")
+            for setup in ("new client per call", "per-LLM pools", "shared pool"):
+                totals, latencies = asyncio.run(run(setup, f"{url}/v1", args.workflows, args.rounds))
+                requests, opened = totals["requests"], totals["connections_opened"]
+                reuse = (requests - opened) / requests if requests else 0.0
+                print(
+                    f"{setup:<22} {requests:>9} {opened:>7} {reuse:>7.1%} "
+                    f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+                )
+        finally:
+            stop_servers([process])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark: end-to-end load test of /api/chat/stream with offline providers.
+
+Starts the mock providers (benchmarks/mock_providers.py) and the API server
+pointed at them, then drives /api/chat/stream with N concurrent clients. As
+provider latency is fixed by the mock, the numbers isolate the cost of the
+orchestration: the graph, the agents and the SSE layer.
+
+Reported:
+- time to first event (p50/p95/p99): request sent to first SSE event received;
+- workflow latency (p50/p95/p99): request sent to end_of_workflow;
+- throughput: completed workflows/sec;
+- CPU per workflow: server process CPU time (process_cpu_seconds_total from
+  /metrics) divided by the completed workflows.
+
+Usage:
+    python -m benchmarks.load_test [--clients 10] [--requests 50] [--ttft 0.2]
+        [--tokens-per-second 50] [--tool-latency 0.1]
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 [--clients 10]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROMPT = "Research the history of the Python programming language and write a short report."
+
+
+@dataclass
+class WorkflowResult:
+    time_to_first_event: Optional[float] = None
+    latency: Optional[float] = None
+    events: int = 0
+    error: Optional[str] = None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} did not start within {timeout}s")
+
+
+def start_servers(args, log) -> tuple[str, list[subprocess.Popen]]:
+    """Start the mock providers and an API server that uses them; return the server URL."""
+    mock_port, server_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.mock_providers",
+            "--port", str(mock_port),
+            "--ttft", str(args.ttft),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--tool-latency", str(args.tool_latency),
+        ],
+        cwd=ROOT, stdout=log, stderr=log,
+    )
+    processes = [mock]
+    env = {
+        **os.environ,
+        **{f"{llm}_BASE_URL": f"{mock_url}/v1" for llm in ("BASIC", "REASONING", "VL")},
+        **{f"{llm}_API_KEY": "mock" for llm in ("BASIC", "REASONING", "VL")},
+        "TAVILY_BASE_URL": f"{mock_url}/tavily",
+        "TAVILY_API_KEY": "mock",
+        "JINA_BASE_URL": f"{mock_url}/jina/",
+        # Every run goes to the providers, and no client waits in the admission queue
+        "SEARCH_CACHE_ENABLED": "false",
+        "LLM_CACHE_ENABLED": "false",
+        "CHECKPOINT_ENABLED": "false",
+        "WORKFLOW_MAX_CONCURRENT": "0",
+        "ANONYMIZED_TELEMETRY": "false",
+    }
+    try:
+        wait_until_ready(f"{mock_url}/openapi.json", mock)
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "src.api.app:app",
+                "--port", str(server_port), "--log-level", "warning",
+            ],
+            cwd=ROOT, env=env, stdout=log, stderr=log,
+        )
+        processes.append(server)
+        server_url = f"http://127.0.0.1:{server_port}"
+        wait_until_ready(f"{server_url}/metrics", server)
+    except BaseException:
+        stop_servers(processes)
+        raise
+    return server_url, processes
+
+
+def stop_servers(processes: list[subprocess.Popen]):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run_workflow(client: httpx.AsyncClient, url: str) -> WorkflowResult:
+    result = WorkflowResult()
+    payload = {"messages": [{"role": "user", "content": PROMPT}]}
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", f"{url}/api/chat/stream", json=payload) as response:
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("event:"):
+                    continue
+                if result.time_to_first_event is None:
+                    result.time_to_first_event = time.perf_counter() - start
+                result.events += 1
+                if line.split(":", 1)[1].strip() == "end_of_workflow":
+                    result.latency = time.perf_counter() - start
+        if result.latency is None:
+            result.error = "stream ended without end_of_workflow"
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+    return result
+
+
+async def server_cpu_seconds(client: httpx.AsyncClient, url: str) -> Optional[float]:
+    response = await client.get(f"{url}/metrics")
+    for line in response.text.splitlines():
+        if line.startswith("process_cpu_seconds_total "):
+            return float(line.split()[1])
+    return None
+
+
+async def load(url: str, clients: int, requests: int) -> tuple[list[WorkflowResult], float, Optional[float]]:
+    """Run requests workflows with clients concurrent clients; return results, seconds and CPU seconds."""
+    async with httpx.AsyncClient(timeout=None) as client:
+        # Warm up: the first run pays for lazy initialisation in the server
+        await run_workflow(client, url)
+        remaining = requests
+        results = []
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                results.append(await run_workflow(client, url))
+
+        cpu_before = await server_cpu_seconds(client, url)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        cpu_after = await server_cpu_seconds(client, url)
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return results, elapsed, cpu
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def report(results: list[WorkflowResult], elapsed: float, cpu: Optional[float], clients: int):
+    completed = [r for r in results if r.error is None]
+    errors = [r.error for r in results if r.error is not None]
+    print(f"clients: {clients}  workflows: {len(results)}  completed: {len(completed)}  errors: {len(errors)}")
+    if errors:
+        print(f"first error: {errors[0]}")
+    if not completed:
+        return
+    print(f"{'':<22} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, values in (
+        ("time to first event s", [r.time_to_first_event for r in completed]),
+        ("workflow latency s", [r.latency for r in completed]),
+    ):
+        print(f"{name:<22} " + " ".join(f"{percentile(values, p):>8.3f}" for p in (50, 95, 99)))
+    print(f"throughput: {len(completed) / elapsed:.2f} workflows/s")
+    print(f"events per workflow: {sum(r.events for r in completed) / len(completed):.1f}")
+    if cpu is not None:
+        print(f"server CPU per workflow: {cpu / len(completed) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=50, help="workflows to run in total")
+    parser.add_argument("--ttft", type=float, default=0.2, help="mock LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="mock LLM stream rate")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="mock Tavily/Jina latency")
+    parser.add_argument("--target", help="URL of a running server instead of starting one")
+    args = parser.parse_args()
+
+    if args.target:
+        report(*asyncio.run(load(args.target, args.clients, args.requests)), args.clients)
+        return
+    with tempfile.NamedTemporaryFile("w+", prefix="load_test_", suffix=".log", delete=False) as log:
+        url, processes = start_servers(args, log)
+        try:
+            report(*asyncio.run(load(url, args.clients, args.requests)), args.clients)
+        finally:
+            stop_servers(processes)
+        print(f"server logs: {log.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Mock providers: an offline OpenAI-compatible LLM server plus Tavily and Jina stand-ins.
+
+Serves scripted, deterministic responses so a whole workflow runs without
+network access and with a provider latency you control:
+- POST /v1/chat/completions: OpenAI chat completions, streaming or not. Each
+  request is matched to the agent that sent it by its system prompt and
+  answered from the script: the coordinator hands off to the planner, the
+  planner streams a plan JSON, the supervisor returns Router JSON, tool-using
+  agents call their first tool once and then answer, the reporter writes a
+  report. Usage reports prompt-cache hits like OpenAI's prefix caching does.
+- POST /tavily/search: Tavily search results.
+- POST /jina/: a Jina reader page.
+
+Point the service at it with:
+    BASIC_BASE_URL=http://127.0.0.1:8900/v1  BASIC_API_KEY=mock
+    REASONING_BASE_URL=http://127.0.0.1:8900/v1  REASONING_API_KEY=mock
+    VL_BASE_URL=http://127.0.0.1:8900/v1  VL_API_KEY=mock
+    TAVILY_BASE_URL=http://127.0.0.1:8900/tavily  TAVILY_API_KEY=mock
+    JINA_BASE_URL=http://127.0.0.1:8900/jina/
+
+Usage:
+    python -m benchmarks.mock_providers [--port 8900] [--ttft 0.2] [--tokens-per-second 50]
+        [--tool-latency 0.1] [--script script.json] [--cache-min-tokens 1024]
+
+The script file is a JSON object mapping agent names (coordinator, planner,
+supervisor, researcher, coder, browser, reporter) to the reply text that
+replaces the built-in one.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+# Phrases from each agent's system prompt (src/prompts/*.md) that identify the caller
+AGENT_FINGERPRINTS = (
+    ("coordinator", "You are Langmanus, a friendly AI assistant"),
+    ("planner", "You are a professional Deep Researcher"),
+    ("supervisor", "You are a supervisor coordinating a team"),
+    ("researcher", "You are a researcher tasked with solving"),
+    ("coder", "You are a professional software engineer"),
+    ("browser", "You are a web browser interaction specialist"),
+    ("reporter", "You are a professional reporter"),
+)
+
+DEFAULT_PLAN = {
+    "thought": "The user wants an overview, so research the topic and then write a report.",
+    "title": "Research and report",
+    "steps": [
+        {
+            "agent_name": "researcher",
+            "title": "Research the topic",
+            "description": "Search the web for recent, reliable sources on the topic.",
+        },
+        {
+            "agent_name": "reporter",
+            "title": "Write the report",
+            "description": "Summarize the research findings in a structured report.",
+        },
+    ],
+}
+
+DEFAULT_SCRIPT = {
+    "coordinator": "handoff_to_planner()",
+    "planner": json.dumps(DEFAULT_PLAN, indent=2),
+    "researcher": (
+        "## Findings\n\nThe search returned several relevant sources. "
+        "The key points are summarized below with their references.\n\n"
+        "- Source one covers the background.\n- Source two covers recent developments."
+    ),
+    "coder": "```python\nprint(sum(range(10)))\n```\n\nThe result is 45.",
+    "browser": "The page was opened and its main content extracted.",
+    "reporter": (
+        "# Report\n\n## Summary\n\nThe research covered the background and recent "
+        "developments of the topic.\n\n## Details\n\nBoth sources agree on the main "
+        "facts; details are listed in the findings above.\n\n## Conclusion\n\n"
+        "The topic is well documented."
+    ),
+}
+
+# Agents that get a single tool call before they answer
+TOOL_AGENTS = ("researcher", "coder", "browser")
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class PromptCache:
+    """
+    Simulates provider-side prompt prefix caching.
+
+    Like OpenAI, a prompt sharing at least min_tokens leading tokens with a
+    recent prompt reports the shared prefix as cached, in 128-token steps.
+    """
+
+    def __init__(self, min_tokens: int = 1024, size: int = 256):
+        self.min_tokens = min_tokens
+        self._prompts: deque = deque(maxlen=size)
+
+    def cached_tokens(self, prompt: str) -> int:
+        """Return the cached tokens of prompt and remember it for later requests."""
+        shared = max((_common_prefix_length(prompt, seen) for seen in self._prompts), default=0)
+        self._prompts.append(prompt)
+        tokens = shared // 4
+        return tokens // 128 * 128 if tokens >= self.min_tokens else 0
+
+
+@dataclass
+class MockConfig:
+    ttft: float = 0.2
+    tokens_per_second: float = 50.0
+    tool_latency: float = 0.1
+    script: dict = field(default_factory=lambda: dict(DEFAULT_SCRIPT))
+    prompt_cache: PromptCache = field(default_factory=PromptCache)
+
+
+def identify_agent(messages: list[dict]) -> Optional[str]:
+    """Return the agent whose system prompt opens the conversation, if known."""
+    for message in messages:
+        if message.get("role") == "system":
+            content = _text(message.get("content"))
+            for agent, fingerprint in AGENT_FINGERPRINTS:
+                if fingerprint in content:
+                    return agent
+    return None
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _last_user_text(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return _text(message.get("content"))
+    return ""
+
+
+def supervisor_choice(messages: list[dict]) -> str:
+    """Route researcher -> reporter -> FINISH based on the responses so far."""
+    history = "\n".join(_text(message.get("content")) for message in messages)
+    if "Response from reporter" in history:
+        return "FINISH"
+    if "Response from researcher" in history:
+        return "reporter"
+    return "researcher"
+
+
+def plan_reply(body: dict, config: MockConfig) -> dict:
+    """
+    Build the reply for a chat completions request.
+
+    Returns:
+        {"content": str} or {"tool_call": {"name": str, "arguments": str}}
+    """
+    messages = body.get("messages", [])
+    agent = identify_agent(messages)
+    tools = body.get("tools") or []
+    if agent == "supervisor" or _wants_router(body):
+        return {"content": json.dumps({"next": supervisor_choice(messages)})}
+    if agent in TOOL_AGENTS and tools and messages[-1].get("role") != "tool":
+        tool = next(
+            (t for t in tools if "search" in t["function"]["name"]), tools[0]
+        )["function"]
+        return {"tool_call": {"name": tool["name"], "arguments": _tool_arguments(tool, messages)}}
+    if agent in config.script:
+        return {"content": config.script[agent]}
+    return {"content": f"Mock reply to: {_last_user_text(messages)[:200]}"}
+
+
+def _wants_router(body: dict) -> bool:
+    schema = (body.get("response_format") or {}).get("json_schema") or {}
+    return schema.get("name") == "Router"
+
+
+def _tool_arguments(tool: dict, messages: list[dict]) -> str:
+    """Fill the tool's first string parameter with the latest user request."""
+    properties = tool.get("parameters", {}).get("properties", {})
+    name = next(iter(properties), "query")
+    return json.dumps({name: _last_user_text(messages)[:200] or "mock"})
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into word-sized tokens that join back into the original."""
+    return re.findall(r"\s*\S+|\s+", text) or [""]
+
+
+def _prompt_text(body: dict) -> str:
+    return "".join(_text(m.get("content")) for m in body.get("messages", []))
+
+
+def _usage(body: dict, completion: str, cached_tokens: int = 0) -> dict:
+    prompt_tokens = len(_prompt_text(body)) // 4 + 1
+    completion_tokens = len(tokenize(completion))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _completion(body: dict, reply: dict) -> dict:
+    message = {"role": "assistant", "content": reply.get("content")}
+    finish_reason = "stop"
+    if "tool_call" in reply:
+        message["tool_calls"] = [
+            {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": reply["tool_call"]}
+        ]
+        finish_reason = "tool_calls"
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": _usage(
+            body,
+            reply.get("content") or reply.get("tool_call", {}).get("arguments", ""),
+            reply.get("cached_tokens", 0),
+        ),
+    }
+
+
+async def _stream(body: dict, reply: dict, config: MockConfig):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+
+    def chunk(delta: dict, finish_reason: Optional[str] = None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    await asyncio.sleep(config.ttft)
+    yield chunk({"role": "assistant", "content": ""})
+    interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+    if "tool_call" in reply:
+        call = reply["tool_call"]
+        yield chunk({
+            "tool_calls": [{
+                "index": 0,
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]},
+            }]
+        })
+        finish_reason, text = "tool_calls", call["arguments"]
+    else:
+        text = reply["content"]
+        for i, token in enumerate(tokenize(text)):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield chunk({"content": token})
+        finish_reason = "stop"
+    yield chunk({}, finish_reason)
+    if (body.get("stream_options") or {}).get("include_usage"):
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": _usage(body, text, reply.get("cached_tokens", 0)),
+        }
+        yield f"data: {json.dumps(payload)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """Create the mock provider app."""
+    config = config or MockConfig()
+    app = FastAPI(title="LangManus mock providers")
+    app.state.config = config
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        reply = plan_reply(body, config)
+        reply["cached_tokens"] = config.prompt_cache.cached_tokens(_prompt_text(body))
+        if body.get("stream"):
+            return StreamingResponse(_stream(body, reply, config), media_type="text/event-stream")
+        # A non-streamed reply arrives after the full generation time
+        tokens = len(tokenize(reply.get("content") or ""))
+        generation = tokens / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        await asyncio.sleep(config.ttft + generation)
+        return _completion(body, reply)
+
+    @app.post("/tavily/search")
+    async def tavily_search(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.tool_latency)
+        query = body.get("query", "")
+        results = [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "url": f"https://example.com/{i + 1}",
+                "content": f"Mock search result {i + 1} about {query}.",
+                "score": round(1 - i * 0.1, 2),
+                "raw_content": None,
+            }
+            for i in range(body.get("max_results", 5))
+        ]
+        return {"query": query, "answer": None, "images": [], "results": results, "response_time": config.tool_latency}
+
+    @app.post("/jina/")
+    async def jina_reader(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.tool_latency)
+        url = body.get("url", "")
+        return HTMLResponse(
+            f"<html><head><title>Mock page</title></head><body><article><h1>Mock page</h1>"
+            f"<p>Offline content for {url}.</p></article></body></html>"
+        )
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="0 streams at once")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="Tavily/Jina latency")
+    parser.add_argument("--script", help="JSON file mapping agent names to reply text")
+    parser.add_argument(
+        "--cache-min-tokens", type=int, default=1024, help="shortest prefix reported as cached"
+    )
+    args = parser.parse_args()
+
+    config = MockConfig(
+        args.ttft, args.tokens_per_second, args.tool_latency,
+        prompt_cache=PromptCache(args.cache_min_tokens),
+    )
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            config.script.update(json.load(f))
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Microbenchmark: per-call cost of building a system prompt.
+
+Compares the previous implementation of apply_prompt_template (read the
+markdown file, escape braces, rewrite `<<VAR>>` with a regex and build a new
+PromptTemplate on every call) with the compiled prompt registry.
+
+Usage:
+    python -m benchmarks.prompt_template_bench [--number 2000]
+"""
+
+import argparse
+import os
+import re
+import timeit
+from datetime import datetime
+
+from langchain_core.prompts import PromptTemplate
+
+from src.prompts.template import PROMPTS_DIR, apply_prompt_template
+
+PROMPTS = ("supervisor", "planner", "coordinator", "reporter")
+
+STATE = {
+    "messages": [{"role": "user", "content": "Compare the GDP of France and Germany"}],
+    "TEAM_MEMBERS": ["researcher", "coder", "browser", "reporter"],
+    "deep_thinking_mode": False,
+    "search_before_planning": False,
+}
+
+
+def legacy_apply_prompt_template(prompt_name: str, state: dict) -> list:
+    """The implementation before the prompt registry was introduced."""
+    template = open(os.path.join(PROMPTS_DIR, f"{prompt_name}.md")).read()
+    template = template.replace("{", "{{").replace("}", "}}")
+    template = re.sub(r"<<([^>>]+)>>", r"{\1}", template)
+    system_prompt = PromptTemplate(
+        input_variables=["CURRENT_TIME"],
+        template=template,
+    ).format(CURRENT_TIME=datetime.now().strftime("%a %b %d %Y %H:%M:%S %z"), **state)
+    return [{"role": "system", "content": system_prompt}] + state["messages"]
+
+
+def bench(func, prompt_name: str, number: int) -> float:
+    """Return the mean cost of one call in microseconds."""
+    func(prompt_name, STATE)  # warm up caches
+    return timeit.timeit(lambda: func(prompt_name, STATE), number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="calls per prompt")
+    args = parser.parse_args()
+
+    print(f"{'prompt':<12} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for prompt_name in PROMPTS:
+        before = bench(legacy_apply_prompt_template, prompt_name, args.number)
+        after = bench(apply_prompt_template, prompt_name, args.number)
+        print(f"{prompt_name:<12} {before:>12.1f} {after:>12.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
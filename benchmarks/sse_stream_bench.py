@@ -0,0 +1,98 @@
+"""
+Benchmark: SSE frame generation for a token-by-token reasoning stream.
+
+Compares the previous per-event path (json.dumps and a disconnect check for
+every event) with the current _event_generator (delta coalescing, fast JSON
+encoding, disconnect checks on a timer).
+
+Two measurements are reported:
+- throughput: upstream events/sec when the workflow produces events as fast
+  as they can be consumed;
+- CPU per stream: process CPU time per stream for concurrent streams whose
+  tokens arrive at a realistic pace.
+
+Usage:
+    python -m benchmarks.sse_stream_bench [--tokens 5000] [--streams 20]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sse_starlette.sse import ServerSentEvent
+from starlette.requests import Request
+
+from src.api.app import _event_generator
+
+
+def connected_request() -> Request:
+    """A starlette Request whose client never disconnects."""
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+async def reasoning_stream(tokens: int, interval: float = 0.0):
+    """A planner run: reasoning tokens, then content tokens, framed by agent events."""
+    yield {"event": "start_of_agent", "data": {"agent_name": "planner", "agent_id": "wf_planner_1"}}
+    for i in range(tokens):
+        field = "reasoning_content" if i < tokens // 2 else "content"
+        yield {"event": "message", "data": {"message_id": "run-1", "delta": {field: "tok "}}}
+        if interval:
+            await asyncio.sleep(interval)
+        elif i % 64 == 0:
+            await asyncio.sleep(0)
+    yield {"event": "end_of_agent", "data": {"agent_name": "planner", "agent_id": "wf_planner_1"}}
+
+
+async def legacy_event_generator(events, req):
+    """The implementation before delta coalescing was introduced."""
+    async for event in events:
+        if await req.is_disconnected():
+            break
+        yield {
+            "event": event["event"],
+            "data": json.dumps(event["data"], ensure_ascii=False),
+        }
+
+
+async def consume(generator_factory, tokens: int, interval: float = 0.0) -> int:
+    frames = 0
+    async for frame in generator_factory(reasoning_stream(tokens, interval), connected_request()):
+        # Encode the frame as EventSourceResponse does before writing it to the socket
+        ServerSentEvent(**frame, sep="\n").encode()
+        frames += 1
+    return frames
+
+
+async def throughput(generator_factory, tokens: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    frames = await consume(generator_factory, tokens)
+    return (tokens + 2) / (time.perf_counter() - start), frames
+
+
+async def cpu_per_stream(generator_factory, tokens: int, streams: int, interval: float) -> float:
+    start = time.process_time()
+    await asyncio.gather(*(consume(generator_factory, tokens, interval) for _ in range(streams)))
+    return (time.process_time() - start) / streams * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=5000, help="tokens per stream")
+    parser.add_argument("--streams", type=int, default=20, help="concurrent streams")
+    parser.add_argument("--interval", type=float, default=0.0005, help="seconds between tokens")
+    args = parser.parse_args()
+
+    print(f"{'path':<8} {'events/s':>10} {'frames':>8} {'CPU ms/stream':>14}")
+    for name, factory in (("before", legacy_event_generator), ("after", _event_generator)):
+        rate, frames = asyncio.run(throughput(factory, args.tokens))
+        cpu = asyncio.run(cpu_per_stream(factory, args.tokens, args.streams, args.interval))
+        print(f"{name:<8} {rate:>10.0f} {frames:>8} {cpu:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,28 @@
-from datetime import datetime
+from typing import Optional, Sequence
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import create_tool_calling_agent, AgentExecutor
 
 from src.tools.search import tavily_tool
 from src.tools.file_management import list_files_tool, read_file_tool, write_file_tool
 from src.tools.python_repl import python_repl_tool
 from src.tools.browser import browser_tool
-from src.prompts.template import get_prompt_template
-from src.config.agents import AGENT_LLM_MAP
-from src.agents.llm import get_llm_by_type
+from src.prompts.template import current_time, get_prompt_template
+from src.config.agents import AGENT_LLM_MAP, LLMType
+from src.agents.llm import get_llm_by_types
+from src.agents.tool_loop import ToolCallingAgent
 
 # Agent文件和源码相差很大
 
-# 创建Agent的工厂函数,返回的是AgentExecutor，可以调用invoke方法执行Agent
-def create_agent(agent_type: str, tools: list):
+# 创建Agent的工厂函数,返回的是ToolCallingAgent，可以调用invoke方法执行Agent
+def create_agent(agent_type: str, tools: list, llm_types: Optional[Sequence[LLMType]] = None):
     """
     一个通用的Agent创建工厂函数。
 
     @param {str} agent_type - Agent的类型（例如 'researcher', 'coder'）。
                               这个类型用于从配置中获取对应的LLM和Prompt。
     @param {list} tools - 一个包含该Agent可以使用的工具的列表。
-    @returns {AgentExecutor} 一个创建好的、可执行的Agent实例。
+    @param {Sequence[LLMType]|None} llm_types - 按顺序使用的LLM类型，默认取AGENT_LLM_MAP中的配置。
+    @returns {ToolCallingAgent} 一个创建好的、可执行的Agent实例。
     """
     # 1. 根据Agent类型获取对应的Prompt模板字符串
     system_prompt_template = get_prompt_template(agent_type)
@@ -35,39 +36,43 @@ def create_agent(agent_type: str, tools: list):
         ]
     )
 
-    # 3. 使用当前时间部分填充模板中<<CURRENT_TIME>>变量
-    prompt = prompt.partial(
-        CURRENT_TIME=datetime.now().strftime("%a %b %d %Y %H:%M:%S %z")
-    )
+    # 3. 模板中的<<CURRENT_TIME>>默认填充调用时的时间；工作流会在输入中传入开始时固定的时间
+    prompt = prompt.partial(CURRENT_TIME=current_time)
 
     # 4. 根据Agent类型获取对应的LLM实例
-    llm = get_llm_by_type(AGENT_LLM_MAP[agent_type])
+    llm = get_llm_by_types(llm_types or AGENT_LLM_MAP[agent_type])
 
-    # 5. 使用LangChain的create_tool_calling_agent方法创建Agent核心逻辑
-    agent_runnable = create_tool_calling_agent(llm, tools, prompt)
+    # 5. 创建工具调用循环：模型同一轮发出的多个独立工具调用并发执行，结果按原顺序返回给模型
+    return ToolCallingAgent(llm, tools, prompt, name=f"{agent_type}_agent")
 
-    # 6. 将核心Agent与工具包装成一个可执行的AgentExecutor
-    return AgentExecutor(
-        agent=agent_runnable, tools=tools, handle_parsing_errors=True, verbose=True
-    )
 
+# 对三个需要调用工具干活的node配置Agent，添加tool。 为每个Agent创建一个ToolCallingAgent。
+AGENT_TOOLS = {
+    # 研究员Agent，配备搜索引擎工具
+    "researcher": [tavily_tool],
+    # 程序员Agent，配备文件操作和Python代码执行工具
+    "coder": [list_files_tool, read_file_tool, write_file_tool, python_repl_tool],
+    # 浏览器Agent，配备完整的浏览器操作工具集
+    "browser": [browser_tool],
+}
 
-# 对三个需要调用工具干活的node配置Agent，添加tool。 为每个Agent创建一个AgentExecutor。
+research_agent = create_agent("researcher", AGENT_TOOLS["researcher"])
+coder_agent = create_agent("coder", AGENT_TOOLS["coder"])
+browser_agent = create_agent("browser", AGENT_TOOLS["browser"])
 
-# 创建研究员Agent，为其配备搜索引擎工具
-research_agent = create_agent(
-    "researcher",
-    [tavily_tool],
-)
+# 使用非默认LLM的Agent（例如预算降级时），按需创建后缓存：(Agent类型, LLM类型列表) -> ToolCallingAgent
+_agent_variants: dict[tuple[str, tuple[LLMType, ...]], ToolCallingAgent] = {}
 
-# 创建程序员Agent，为其配备文件操作和Python代码执行工具
-coder_agent = create_agent(
-    "coder",
-    [list_files_tool, read_file_tool, write_file_tool, python_repl_tool],
-)
 
-# 创建浏览器Agent，为其配备完整的浏览器操作工具集
-browser_agent = create_agent(
-    "browser",
-    [browser_tool],
-)
+def get_agent_variant(agent_type: str, llm_types: Sequence[LLMType]) -> ToolCallingAgent:
+    """
+    获取按顺序使用指定LLM类型的Agent，工具与默认的Agent相同。
+
+    @param {str} agent_type - Agent的类型。
+    @param {Sequence[LLMType]} llm_types - 按顺序使用的LLM类型。
+    @returns {ToolCallingAgent} 缓存的Agent实例。
+    """
+    key = (agent_type, tuple(llm_types))
+    if key not in _agent_variants:
+        _agent_variants[key] = create_agent(agent_type, AGENT_TOOLS[agent_type], llm_types)
+    return _agent_variants[key]
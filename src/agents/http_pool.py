@@ -0,0 +1,264 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import weakref
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+from src.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+)
+from src.agents.rate_limit import (
+    AsyncRateLimitedTransport,
+    RateLimitedTransport,
+    RateLimiter,
+)
+
+logger = logging.getLogger(__name__)
+
+# httpcore trace events that mean a new connection or TLS session was set up
+_CONNECT_EVENTS = {
+    "connection.connect_tcp.complete": "connections_opened",
+    "connection.connect_unix_socket.complete": "connections_opened",
+    "connection.start_tls.complete": "tls_handshakes",
+}
+
+
+def origin_of(url: str) -> str:
+    """Return scheme://host:port of a URL; clients are pooled per origin."""
+    parsed = httpx.URL(url)
+    port = parsed.port or {"http": 80, "https": 443}.get(parsed.scheme)
+    return f"{parsed.scheme}://{parsed.host}:{port}"
+
+
+class PoolStats:
+    """Thread-safe counters of requests and new connections per origin."""
+
+    def __init__(self):
+        self._counts: dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, origin: str, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[origin][name] += amount
+
+    def get(self) -> dict[str, dict[str, float]]:
+        """Return requests, connections, TLS handshakes and reuse rate per origin."""
+        with self._lock:
+            stats = {}
+            for origin, counts in self._counts.items():
+                requests = counts["requests"]
+                opened = counts["connections_opened"]
+                stats[origin] = {
+                    "requests": requests,
+                    "connections_opened": opened,
+                    "tls_handshakes": counts["tls_handshakes"],
+                    # Share of requests that were sent on an existing connection
+                    "reuse_rate": (
+                        max(requests - opened, 0) / requests if requests else 0.0
+                    ),
+                }
+            return stats
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTPTransport that records requests and new connections in PoolStats."""
+
+    def __init__(self, origin: str, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._origin = origin
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record(self._origin, "requests")
+        inner = request.extensions.get("trace")
+
+        def trace(name: str, info: dict):
+            if name in _CONNECT_EVENTS:
+                self._stats.record(self._origin, _CONNECT_EVENTS[name])
+            if inner is not None:
+                inner(name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return super().handle_request(request)
+
+
+class _CountingAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that records requests and new connections in PoolStats.
+
+    asyncio connections belong to the event loop that opened them, so each
+    loop gets its own connection pool. A server has a single loop and thus a
+    single pool; code that calls asyncio.run() repeatedly still works.
+    """
+
+    def __init__(self, origin: str, stats: PoolStats, **kwargs):
+        self._origin = origin
+        self._stats = stats
+        self._kwargs = kwargs
+        self._transports: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(**self._kwargs)
+            self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record(self._origin, "requests")
+        inner = request.extensions.get("trace")
+
+        async def trace(name: str, info: dict):
+            if name in _CONNECT_EVENTS:
+                self._stats.record(self._origin, _CONNECT_EVENTS[name])
+            if inner is not None:
+                await inner(name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class HttpClientPool:
+    """
+    Shared sync and async HTTP clients, one of each per origin.
+
+    Every LLM created through get_llm_by_type gets its clients from here, so
+    agents and tools that talk to the same backend reuse its connections
+    instead of each opening (and TLS-handshaking) their own.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: httpx.Timeout = httpx.Timeout(600.0, connect=10.0),
+    ):
+        """
+        Args:
+            max_connections: Maximum open connections per origin and client flavour
+            max_keepalive_connections: Idle connections kept open per origin
+            keepalive_expiry: Seconds an idle connection is kept open
+            http2: Negotiate HTTP/2 where the server supports it (needs the h2 package)
+            timeout: Default timeout of requests sent through the clients
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "HTTP/2 requires the h2 package (pip install httpx[http2]); "
+                "using HTTP/1.1"
+            )
+            http2 = False
+        self.http2 = http2
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.stats = PoolStats()
+        # One connection pool per origin, shared by the clients of every limiter
+        self._sync_transports: dict[str, _CountingTransport] = {}
+        self._async_transports: dict[str, _CountingAsyncTransport] = {}
+        self._sync: dict[tuple, httpx.Client] = {}
+        self._async: dict[tuple, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def _transport_kwargs(self) -> dict:
+        return {"limits": self.limits, "http2": self.http2}
+
+    def sync_client(
+        self, base_url: str, limiter: Optional[RateLimiter] = None
+    ) -> httpx.Client:
+        """
+        Return the shared sync client for the origin of base_url.
+
+        Args:
+            base_url: URL of the backend
+            limiter: Rate limiter applied to the client's requests; clients with
+                different limiters still share the origin's connections
+        """
+        origin = origin_of(base_url)
+        key = (origin, limiter.name if limiter else None)
+        with self._lock:
+            client = self._sync.get(key)
+            if client is None:
+                transport = self._sync_transports.get(origin)
+                if transport is None:
+                    transport = self._sync_transports[origin] = _CountingTransport(
+                        origin, self.stats, **self._transport_kwargs()
+                    )
+                if limiter is not None:
+                    transport = RateLimitedTransport(transport, limiter)
+                client = self._sync[key] = httpx.Client(
+                    transport=transport, timeout=self.timeout, follow_redirects=True
+                )
+            return client
+
+    def async_client(
+        self, base_url: str, limiter: Optional[RateLimiter] = None
+    ) -> httpx.AsyncClient:
+        """
+        Return the shared async client for the origin of base_url.
+
+        Args:
+            base_url: URL of the backend
+            limiter: Rate limiter applied to the client's requests; clients with
+                different limiters still share the origin's connections
+        """
+        origin = origin_of(base_url)
+        key = (origin, limiter.name if limiter else None)
+        with self._lock:
+            client = self._async.get(key)
+            if client is None:
+                transport = self._async_transports.get(origin)
+                if transport is None:
+                    transport = self._async_transports[origin] = (
+                        _CountingAsyncTransport(
+                            origin, self.stats, **self._transport_kwargs()
+                        )
+                    )
+                if limiter is not None:
+                    transport = AsyncRateLimitedTransport(transport, limiter)
+                client = self._async[key] = httpx.AsyncClient(
+                    transport=transport, timeout=self.timeout, follow_redirects=True
+                )
+            return client
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Return requests, connections, TLS handshakes and reuse rate per origin."""
+        return self.stats.get()
+
+    async def aclose(self):
+        """Close the idle connections of every origin; the clients stay usable."""
+        with self._lock:
+            sync_transports = list(self._sync_transports.values())
+            async_transports = list(self._async_transports.values())
+        for transport in sync_transports:
+            transport.close()
+        for transport in async_transports:
+            await transport.aclose()
+
+
+http_pool = HttpClientPool(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    http2=HTTP2_ENABLED,
+    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+)
@@ -1,6 +1,9 @@
+import os
+
 from langchain_openai import ChatOpenAI
 from langchain_deepseek import ChatDeepSeek
-from typing import Optional
+from langchain_core.language_models import BaseChatModel
+from typing import Optional, Sequence
 
 from src.config import (
     REASONING_MODEL,
@@ -12,8 +15,62 @@ from src.config import (
     VL_MODEL,
     VL_BASE_URL,
     VL_API_KEY,
+    CHEAP_MODEL,
+    CHEAP_BASE_URL,
+    CHEAP_API_KEY,
+    LLM_CACHE_ENABLED,
+    REASONING_RPM,
+    REASONING_TPM,
+    BASIC_RPM,
+    BASIC_TPM,
+    VL_RPM,
+    VL_TPM,
+    CHEAP_RPM,
+    CHEAP_TPM,
+    LLM_RATE_LIMIT_MAX_BACKOFF,
+    LLM_HEDGE_DELAY,
+    LLM_HEDGE_MIN_DELAY,
 )
 from src.config.agents import LLMType
+from src.agents.http_pool import http_pool
+from src.agents.llm_router import RoutedChatModel
+from src.agents.rate_limit import RateLimiter, get_rate_limiter
+from src.agents.llm_cache import (
+    CachedChatDeepSeek,
+    CachedChatOpenAI,
+    configure_llm_response_cache,
+)
+
+# Opt-in response cache for deterministic calls, see src/agents/llm_cache.py
+if LLM_CACHE_ENABLED:
+    configure_llm_response_cache()
+
+# Endpoints the SDKs use when no base_url is configured
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEEPSEEK_DEFAULT_BASE_URL = "https://api.deepseek.com"
+
+
+# Requests and prompt tokens per minute of each LLM type
+LLM_RATE_LIMITS: dict[LLMType, tuple[float, float]] = {
+    "reasoning": (REASONING_RPM, REASONING_TPM),
+    "basic": (BASIC_RPM, BASIC_TPM),
+    "vision": (VL_RPM, VL_TPM),
+    "cheap": (CHEAP_RPM, CHEAP_TPM),
+}
+
+# Model and base URL of each LLM type; types that share both call the same backend
+LLM_ENDPOINTS: dict[LLMType, tuple[str, str]] = {
+    "reasoning": (REASONING_MODEL, REASONING_BASE_URL),
+    "basic": (BASIC_MODEL, BASIC_BASE_URL),
+    "vision": (VL_MODEL, VL_BASE_URL),
+    "cheap": (CHEAP_MODEL, CHEAP_BASE_URL),
+}
+
+
+def _pooled_clients(llm_kwargs: dict, base_url: str, limiter: Optional[RateLimiter]):
+    """Share one connection pool per backend between all LLMs, unless clients were passed in."""
+    llm_kwargs.setdefault("http_client", http_pool.sync_client(base_url, limiter))
+    llm_kwargs.setdefault("http_async_client", http_pool.async_client(base_url, limiter))
 
 
 def create_openai_llm(
@@ -21,13 +78,15 @@ def create_openai_llm(
     base_url: Optional[str] = None,
     api_key: Optional[str] = None,
     temperature: float = 0.0,
+    limiter: Optional[RateLimiter] = None,
     **kwargs,
 ) -> ChatOpenAI:
     """
     Create a ChatOpenAI instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    # Streamed responses report token usage as well, for the per-workflow token budget
+    llm_kwargs = {"model": model, "temperature": temperature, "stream_usage": True, **kwargs}
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["base_url"] = base_url
@@ -35,6 +94,13 @@ def create_openai_llm(
     if api_key:  # This will handle None or empty string
         llm_kwargs["api_key"] = api_key
 
+    _pooled_clients(
+        llm_kwargs, base_url or os.getenv("OPENAI_BASE_URL") or OPENAI_DEFAULT_BASE_URL,
+        limiter,
+    )
+
+    if LLM_CACHE_ENABLED:
+        return CachedChatOpenAI(**llm_kwargs)
     return ChatOpenAI(**llm_kwargs)
 
 
@@ -43,13 +109,15 @@ def create_deepseek_llm(
     base_url: Optional[str] = None,
     api_key: Optional[str] = None,
     temperature: float = 0.0,
+    limiter: Optional[RateLimiter] = None,
     **kwargs,
 ) -> ChatDeepSeek:
     """
     Create a ChatDeepSeek instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    # Streamed responses report token usage as well, for the per-workflow token budget
+    llm_kwargs = {"model": model, "temperature": temperature, "stream_usage": True, **kwargs}
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["api_base"] = base_url
@@ -57,6 +125,13 @@ def create_deepseek_llm(
     if api_key:  # This will handle None or empty string
         llm_kwargs["api_key"] = api_key
 
+    _pooled_clients(
+        llm_kwargs, base_url or os.getenv("DEEPSEEK_API_BASE") or DEEPSEEK_DEFAULT_BASE_URL,
+        limiter,
+    )
+
+    if LLM_CACHE_ENABLED:
+        return CachedChatDeepSeek(**llm_kwargs)
     return ChatDeepSeek(**llm_kwargs)
 
 
@@ -71,23 +146,42 @@ def get_llm_by_type(llm_type: LLMType) -> ChatOpenAI | ChatDeepSeek:
     if llm_type in _llm_cache:
         return _llm_cache[llm_type]
 
+    # Calls of every agent and workflow using this type share one limiter
+    requests_per_minute, tokens_per_minute = LLM_RATE_LIMITS.get(llm_type, (0, 0))
+    limiter = get_rate_limiter(
+        llm_type,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        max_backoff=LLM_RATE_LIMIT_MAX_BACKOFF,
+    )
+
     if llm_type == "reasoning":
         llm = create_deepseek_llm(
             model=REASONING_MODEL,
             base_url=REASONING_BASE_URL,
             api_key=REASONING_API_KEY,
+            limiter=limiter,
         )
     elif llm_type == "basic":
         llm = create_openai_llm(
             model=BASIC_MODEL,
             base_url=BASIC_BASE_URL,
             api_key=BASIC_API_KEY,
+            limiter=limiter,
         )
     elif llm_type == "vision":
         llm = create_openai_llm(
             model=VL_MODEL,
             base_url=VL_BASE_URL,
             api_key=VL_API_KEY,
+            limiter=limiter,
+        )
+    elif llm_type == "cheap":
+        llm = create_openai_llm(
+            model=CHEAP_MODEL,
+            base_url=CHEAP_BASE_URL,
+            api_key=CHEAP_API_KEY,
+            limiter=limiter,
         )
     else:
         raise ValueError(f"Unknown LLM type: {llm_type}")
@@ -96,6 +190,38 @@ def get_llm_by_type(llm_type: LLMType) -> ChatOpenAI | ChatDeepSeek:
     return llm
 
 
+# Cache for routed LLMs, by ordered LLM types
+_routed_llm_cache: dict[tuple[LLMType, ...], BaseChatModel] = {}
+
+
+def get_llm_by_types(llm_types: Sequence[LLMType]) -> BaseChatModel:
+    """
+    Get the LLM for an ordered list of LLM types, as configured in AGENT_LLM_MAP.
+
+    A single type returns its cached instance; several types return a cached
+    RoutedChatModel that fails over between them in order and, with
+    LLM_HEDGE_DELAY set, hedges slow streams. Types with the same model and
+    base URL as an earlier one (e.g. cheap without its own settings) are
+    dropped, and a reasoning model is never hedged with the models behind it.
+    """
+    distinct: dict[tuple, LLMType] = {}
+    for llm_type in llm_types:
+        distinct.setdefault(LLM_ENDPOINTS.get(llm_type, (llm_type,)), llm_type)
+    llm_types = tuple(distinct.values())
+    if len(llm_types) == 1:
+        return get_llm_by_type(llm_types[0])
+    if llm_types not in _routed_llm_cache:
+        _routed_llm_cache[llm_types] = RoutedChatModel(
+            backends=[get_llm_by_type(llm_type) for llm_type in llm_types],
+            names=list(llm_types),
+            # Reasoning models are slow to their first token by design; racing one
+            # would hand deep-thinking calls to a model that does not reason
+            hedge_delay=0 if llm_types[0] == "reasoning" else LLM_HEDGE_DELAY,
+            min_hedge_delay=LLM_HEDGE_MIN_DELAY,
+        )
+    return _routed_llm_cache[llm_types]
+
+
 # Initialize LLMs for different purposes - now these will be cached
 reasoning_llm = get_llm_by_type("reasoning")
 basic_llm = get_llm_by_type("basic")
@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.load import dumpd, load
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables.config import ensure_config
+from langchain_deepseek import ChatDeepSeek
+from langchain_openai import ChatOpenAI
+
+from src.cache import SqliteTTLStore
+from src.config import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_HOURS,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_AGENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# CURRENT_TIME as rendered into the prompts; only the date part is part of the key
+_TIMESTAMP = re.compile(r"\b(\w{3} \w{3} \d{2} \d{4}) \d{2}:\d{2}:\d{2}( [+-]\d{4})?")
+
+# Message fields that differ between otherwise identical requests
+_VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+# Key of the flag in the response metadata of messages served from the cache
+CACHE_HIT_METADATA_KEY = "llm_cache_hit"
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of chat model responses with per-agent hit-rate metrics.
+
+    Entries are keyed on the model configuration (model name, temperature,
+    bound tools and structured output schema) and the normalized messages.
+    Responses obtained by streaming are stored as their chunks so they can be
+    replayed chunk by chunk.
+    """
+
+    def __init__(self, store: SqliteTTLStore, agents: Optional[list[str]] = None):
+        self.store = store
+        self.agents = set(agents) if agents is not None else None
+        self._stats: dict[str, dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+
+    def enabled_for(self, agent: Optional[str]) -> bool:
+        return self.agents is None or agent in self.agents
+
+    @staticmethod
+    def make_key(llm_string: str, messages: list[BaseMessage]) -> str:
+        normalized = []
+        for message in messages:
+            fields = message.model_dump(exclude=_VOLATILE_FIELDS)
+            if isinstance(fields.get("content"), str):
+                fields["content"] = _TIMESTAMP.sub(r"\1", fields["content"])
+            normalized.append(fields)
+        payload = json.dumps(
+            [llm_string, normalized], sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def lookup(self, key: str, agent: Optional[str]) -> Optional[dict]:
+        value = self.store.get(key)
+        with self._lock:
+            self._stats[agent or "unknown"]["hits" if value is not None else "misses"] += 1
+        if value is None:
+            return None
+        logger.debug(f"LLM cache hit for {agent}")
+        return json.loads(value)
+
+    def update(self, key: str, kind: str, messages: list[BaseMessage]):
+        entry = {"kind": kind, "messages": [dumpd(message) for message in messages]}
+        self.store.set(key, json.dumps(entry).encode())
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Return hits, misses and hit rate per agent."""
+        with self._lock:
+            return {
+                agent: {**counts, "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"])}
+                for agent, counts in self._stats.items()
+                if counts["hits"] + counts["misses"]
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _to_chunk(message: AIMessage) -> AIMessageChunk:
+    return AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        tool_call_chunks=[
+            {
+                "name": call["name"],
+                "args": json.dumps(call["args"]),
+                "id": call["id"],
+                "index": index,
+            }
+            for index, call in enumerate(message.tool_calls)
+        ],
+        usage_metadata=message.usage_metadata,
+    )
+
+
+def _replayed(message: AIMessage) -> AIMessage:
+    """
+    A cached message as served again: flagged as a cache hit and without the
+    stored token usage, so budgets and metrics do not count tokens nobody spent.
+    """
+    message.usage_metadata = None
+    message.response_metadata = {**message.response_metadata, CACHE_HIT_METADATA_KEY: True}
+    return message
+
+
+def _replay_chunks(entry: dict) -> list[ChatGenerationChunk]:
+    messages = [_replayed(load(message)) for message in entry["messages"]]
+    if entry["kind"] == "message":
+        messages = [_to_chunk(message) for message in messages]
+    return [ChatGenerationChunk(message=message) for message in messages]
+
+
+def _replay_result(entry: dict) -> ChatResult:
+    if entry["kind"] == "chunks":
+        return generate_from_stream(iter(_replay_chunks(entry)))
+    return ChatResult(
+        generations=[ChatGeneration(message=_replayed(load(message))) for message in entry["messages"]]
+    )
+
+
+class ResponseCacheMixin:
+    """
+    Serves deterministic chat model calls from an LLMResponseCache.
+
+    Applied below the public invoke/stream API, so cached responses go through
+    the normal callback machinery: a cached streamed response is replayed chunk
+    by chunk and still produces on_chat_model_stream events. Only calls at
+    temperature 0 made from one of the cache's agents (the LangGraph node in
+    the runnable config metadata) are cached.
+    """
+
+    def _cache_key(self, messages, stop, **kwargs) -> tuple[Optional[str], Optional[str]]:
+        cache = get_llm_response_cache()
+        if cache is None or self.temperature not in (0, 0.0):
+            return None, None
+        # BaseChatModel does not pass run_manager to _stream, so read the node from the config
+        agent = ensure_config().get("metadata", {}).get("langgraph_node")
+        if not cache.enabled_for(agent):
+            return None, None
+        return cache.make_key(self._get_llm_string(stop=stop, **kwargs), messages), agent
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, agent = self._cache_key(messages, stop, **kwargs)
+        if key is None:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        cache = get_llm_response_cache()
+        if entry := cache.lookup(key, agent):
+            return _replay_result(entry)
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        cache.update(key, "message", [generation.message for generation in result.generations])
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, agent = self._cache_key(messages, stop, **kwargs)
+        if key is None:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        cache = get_llm_response_cache()
+        if entry := await asyncio.to_thread(cache.lookup, key, agent):
+            return _replay_result(entry)
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        await asyncio.to_thread(
+            cache.update, key, "message", [generation.message for generation in result.generations]
+        )
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key, agent = self._cache_key(messages, stop, **kwargs)
+        if key is None:
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        cache = get_llm_response_cache()
+        if entry := cache.lookup(key, agent):
+            yield from _replay_chunks(entry)
+            return
+        chunks = []
+        for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            chunks.append(chunk.message)
+            yield chunk
+        # Only complete responses are cached; an abandoned stream never gets here
+        cache.update(key, "chunks", chunks)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key, agent = self._cache_key(messages, stop, **kwargs)
+        if key is None:
+            async for chunk in super()._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
+            return
+        cache = get_llm_response_cache()
+        if entry := await asyncio.to_thread(cache.lookup, key, agent):
+            for chunk in _replay_chunks(entry):
+                yield chunk
+            return
+        chunks = []
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            chunks.append(chunk.message)
+            yield chunk
+        await asyncio.to_thread(cache.update, key, "chunks", chunks)
+
+
+class CachedChatOpenAI(ResponseCacheMixin, ChatOpenAI):
+    """ChatOpenAI that serves deterministic calls from the LLM response cache."""
+
+
+class CachedChatDeepSeek(ResponseCacheMixin, ChatDeepSeek):
+    """ChatDeepSeek that serves deterministic calls from the LLM response cache."""
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide response cache, or None before it is configured."""
+    return _llm_response_cache
+
+
+def configure_llm_response_cache(
+    path: str = LLM_CACHE_PATH,
+    ttl_hours: float = LLM_CACHE_TTL_HOURS,
+    max_mb: float = LLM_CACHE_MAX_MB,
+    agents: Optional[list[str]] = LLM_CACHE_AGENTS,
+) -> LLMResponseCache:
+    """
+    Create the process-wide response cache used by the cached chat models.
+
+    Args:
+        path: SQLite file for the cache, ":memory:" for a process-local cache.
+        ttl_hours: Time to live of an entry in hours, 0 to never expire.
+        max_mb: Total size limit in megabytes, 0 for no limit.
+        agents: Graph nodes whose calls are cached, None for all callers.
+
+    Returns:
+        The configured cache.
+    """
+    global _llm_response_cache
+    store = SqliteTTLStore(
+        path,
+        ttl_seconds=ttl_hours * 3600,
+        max_bytes=int(max_mb * 1024 * 1024),
+        table="llm_responses",
+    )
+    _llm_response_cache = LLMResponseCache(store, agents)
+    return _llm_response_cache
@@ -0,0 +1,481 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import (
+    Runnable,
+    RunnableBinding,
+    RunnableLambda,
+    RunnableSequence,
+)
+from pydantic import ConfigDict
+
+# Consecutive failures after which a backend is tried last, and for how long
+_FAILURE_THRESHOLD = 3
+_FAILURE_COOLDOWN = 30.0
+# Latency samples kept per backend, and needed before the hedge delay adapts to them
+_SAMPLE_WINDOW = 200
+_MIN_SAMPLES = 20
+
+# Key of the answering backend in the response metadata
+BACKEND_METADATA_KEY = "llm_backend"
+
+
+def _percentile(values: Sequence[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class BackendStats:
+    """Latency and outcome statistics of one LLM backend, shared by all its users."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = Counter()
+        # Seconds to the first streamed chunk, and to the response of non-streamed calls
+        self.latencies = {
+            "first_token": deque(maxlen=_SAMPLE_WINDOW),
+            "response": deque(maxlen=_SAMPLE_WINDOW),
+        }
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, kind: str, latency: float):
+        with self._lock:
+            self.counts["success"] += 1
+            self.latencies[kind].append(latency)
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.counts["error"] += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= _FAILURE_THRESHOLD:
+                self.unhealthy_until = time.monotonic() + _FAILURE_COOLDOWN
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def p95(self, kind: str) -> Optional[float]:
+        """Return the p95 latency of the given kind, None until enough samples exist."""
+        with self._lock:
+            samples = list(self.latencies[kind])
+        return _percentile(samples, 95) if len(samples) >= _MIN_SAMPLES else None
+
+    def get(self) -> dict[str, Any]:
+        with self._lock:
+            stats = {
+                outcome: self.counts[outcome]
+                for outcome in ("success", "error", "hedged", "hedge_won", "failover")
+            }
+            for kind, samples in self.latencies.items():
+                stats[f"{kind}_p50"] = (
+                    round(_percentile(samples, 50), 3) if samples else None
+                )
+                stats[f"{kind}_p95"] = (
+                    round(_percentile(samples, 95), 3) if samples else None
+                )
+            stats["healthy"] = time.monotonic() >= self.unhealthy_until
+            return stats
+
+
+_backend_stats: dict[str, BackendStats] = {}
+_backend_stats_lock = threading.Lock()
+
+
+def get_backend_stats(name: str) -> BackendStats:
+    with _backend_stats_lock:
+        if name not in _backend_stats:
+            _backend_stats[name] = BackendStats(name)
+        return _backend_stats[name]
+
+
+def llm_backend_stats() -> dict[str, dict[str, Any]]:
+    """Return the statistics of every LLM backend by name."""
+    with _backend_stats_lock:
+        stats = list(_backend_stats.values())
+    return {backend.name: backend.get() for backend in stats}
+
+
+def _strip_tracing(kwargs: dict) -> dict:
+    # BaseChatModel pops this before _generate/_stream; backends are called directly
+    return {
+        key: value
+        for key, value in kwargs.items()
+        if key != "ls_structured_output_format"
+    }
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model that sends each call to an ordered list of backends.
+
+    - Hedging: if the first backend has not produced its first token after
+      the hedge delay, the next backend is called as well and whichever
+      answers first is used; the other stream is closed. Non-streamed calls
+      are not hedged: the race would be decided on the full response, and
+      the losing call would be paid for in full.
+    - Failover: a backend that fails before answering is replaced by the next
+      one.
+    - Routing: per-backend latency and error statistics are kept. Backends
+      that failed repeatedly are tried last for a while, and once enough
+      samples exist the hedge delay drops to the first backend's p95 latency.
+
+    Backends are called without callbacks, so token usage, streaming events
+    and metrics are reported once, for the answer that was used; the streamed
+    tokens are reported by BaseChatModel.stream/astream as they are yielded.
+    """
+
+    backends: list[BaseChatModel]
+    names: list[str]
+    hedge_delay: float = 10.0
+    min_hedge_delay: float = 1.0
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _stats(self, index: int) -> BackendStats:
+        return get_backend_stats(self.names[index])
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"backends": [backend._identifying_params for backend in self.backends]}
+
+    def _order(self) -> list[int]:
+        """Backend indexes in configured order, repeatedly failing ones moved last."""
+        indexes = range(len(self.backends))
+        return sorted(indexes, key=lambda i: not self._stats(i).healthy())
+
+    def _hedge_after(self, index: int, kind: str) -> Optional[float]:
+        """
+        Seconds to wait for backend index before also calling the next one.
+
+        None means the call is not hedged.
+        """
+        if self.hedge_delay <= 0 or kind != "first_token":
+            return None
+        p95 = self._stats(index).p95(kind)
+        if p95 is None:
+            return self.hedge_delay
+        return min(self.hedge_delay, max(p95, self.min_hedge_delay))
+
+    def _backend_kwargs(self, index: int, kwargs: dict) -> dict:
+        per_backend = kwargs.get("backend_kwargs")
+        base = {key: value for key, value in kwargs.items() if key != "backend_kwargs"}
+        if per_backend is not None:
+            base.update(per_backend[index])
+        return _strip_tracing(base)
+
+    def _should_stream(
+        self, *, async_api: bool, run_manager=None, **kwargs: Any
+    ) -> bool:
+        # Stream whenever the primary backend would, e.g. it may not stream tool calls
+        if not super()._should_stream(
+            async_api=async_api, run_manager=run_manager, **kwargs
+        ):
+            return False
+        primary = self._order()[0]
+        return self.backends[primary]._should_stream(
+            async_api=async_api,
+            run_manager=run_manager,
+            **self._backend_kwargs(primary, kwargs),
+        )
+
+    def _winner(self, index: int, kind: str, started: float, hedge_won: bool):
+        self._stats(index).record_success(kind, time.monotonic() - started)
+        if hedge_won:
+            self._stats(index).record("hedge_won")
+
+    def _failover(
+        self, kind: str, order: list[int], attempt: Callable[[int], Any]
+    ) -> tuple[int, Any]:
+        """Run attempt(index) inline, one backend after another until one succeeds."""
+        last_error: Optional[Exception] = None
+        for position, index in enumerate(order):
+            if position > 0:
+                self._stats(index).record("failover")
+            begun = time.monotonic()
+            try:
+                result = attempt(index)
+            except Exception as e:
+                last_error = e
+                self._stats(index).record_failure()
+                continue
+            self._winner(index, kind, begun, False)
+            return index, result
+        raise last_error
+
+    def _race(self, kind: str, attempt: Callable[[int], Any]) -> tuple[int, Any]:
+        """
+        Run attempt(index) with hedging and failover in threads.
+
+        Returns the index of the winning backend and its result.
+
+        Without a hedge (a single backend, hedging disabled or a non-streamed
+        call) the backends are called inline through _failover instead. A thread
+        cannot be interrupted: a losing attempt keeps running after the race is
+        decided (shutdown(wait=False) only stops waiting for it). Only
+        first-chunk attempts are hedged, and those end at their first chunk.
+        """
+        order = self._order()
+        if len(order) == 1 or self._hedge_after(order[0], kind) is None:
+            return self._failover(kind, order, attempt)
+        executor = ThreadPoolExecutor(max_workers=len(order))
+        running: dict = {}
+        last_error: Optional[BaseException] = None
+
+        def start(position: int):
+            context = contextvars.copy_context()
+            running[executor.submit(context.run, attempt, order[position])] = (
+                position,
+                time.monotonic(),
+            )
+
+        try:
+            start(0)
+            started, hedged = 1, False
+            while running:
+                primary = min(position for position, _ in running.values())
+                timeout = (
+                    self._hedge_after(order[primary], kind)
+                    if started < len(order)
+                    else None
+                )
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    self._stats(order[primary]).record("hedged")
+                    start(started)
+                    started, hedged = started + 1, True
+                    continue
+                for future in done:
+                    position, begun = running.pop(future)
+                    index = order[position]
+                    if future.exception() is None:
+                        self._winner(index, kind, begun, hedged and position > 0)
+                        return index, future.result()
+                    last_error = future.exception()
+                    self._stats(index).record_failure()
+                    if started < len(order) and len(running) == 0:
+                        self._stats(order[started]).record("failover")
+                        start(started)
+                        started += 1
+            raise last_error
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    async def _arace(self, kind: str, attempt: Callable[[int], Any]) -> tuple[int, Any]:
+        """Async _race; losing calls are cancelled."""
+        order = self._order()
+        running: dict[asyncio.Task, tuple[int, float]] = {}
+        last_error: Optional[BaseException] = None
+
+        def start(position: int):
+            running[asyncio.ensure_future(attempt(order[position]))] = (
+                position,
+                time.monotonic(),
+            )
+
+        try:
+            start(0)
+            started, hedged = 1, False
+            while running:
+                primary = min(position for position, _ in running.values())
+                timeout = (
+                    self._hedge_after(order[primary], kind)
+                    if started < len(order)
+                    else None
+                )
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._stats(order[primary]).record("hedged")
+                    start(started)
+                    started, hedged = started + 1, True
+                    continue
+                for task in done:
+                    position, begun = running.pop(task)
+                    index = order[position]
+                    if task.exception() is None:
+                        self._winner(index, kind, begun, hedged and position > 0)
+                        return index, task.result()
+                    last_error = task.exception()
+                    self._stats(index).record_failure()
+                    if started < len(order) and len(running) == 0:
+                        self._stats(order[started]).record("failover")
+                        start(started)
+                        started += 1
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def _tag(self, message: BaseMessage, index: int):
+        message.response_metadata = {
+            **message.response_metadata,
+            BACKEND_METADATA_KEY: self.names[index],
+        }
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        index, result = self._race(
+            "response",
+            lambda i: self.backends[i]._generate(
+                messages, stop=stop, **self._backend_kwargs(i, kwargs)
+            ),
+        )
+        for generation in result.generations:
+            self._tag(generation.message, index)
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        index, result = await self._arace(
+            "response",
+            lambda i: self.backends[i]._agenerate(
+                messages, stop=stop, **self._backend_kwargs(i, kwargs)
+            ),
+        )
+        for generation in result.generations:
+            self._tag(generation.message, index)
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        streams, lock, decided = {}, threading.Lock(), []
+
+        def first_chunk(i: int):
+            stream = self.backends[i]._stream(
+                messages, stop=stop, **self._backend_kwargs(i, kwargs)
+            )
+            chunk = next(stream, None)
+            with lock:
+                streams[i] = stream
+                if decided and decided[0] != i:
+                    # Lost the race while waiting for the first chunk
+                    stream.close()
+            return chunk
+
+        index, chunk = self._race("first_token", first_chunk)
+        with lock:
+            decided.append(index)
+            for i, stream in streams.items():
+                if i != index:
+                    stream.close()
+        try:
+            if chunk is None:
+                return
+            self._tag(chunk.message, index)
+            yield chunk
+            yield from streams[index]
+        finally:
+            streams[index].close()
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        streams = {}
+
+        async def first_chunk(i: int):
+            stream = streams[i] = self.backends[i]._astream(
+                messages, stop=stop, **self._backend_kwargs(i, kwargs)
+            )
+            return await anext(stream, None)
+
+        try:
+            index, chunk = await self._arace("first_token", first_chunk)
+        except BaseException:
+            for stream in streams.values():
+                await stream.aclose()
+            raise
+        # The losing calls were cancelled by _arace
+        for i, stream in streams.items():
+            if i != index:
+                await stream.aclose()
+        try:
+            if chunk is None:
+                return
+            self._tag(chunk.message, index)
+            yield chunk
+            async for chunk in streams[index]:
+                yield chunk
+        finally:
+            await streams[index].aclose()
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """Bind tools the way each backend binds them."""
+        return self.bind(
+            backend_kwargs=[
+                backend.bind_tools(tools, **kwargs).kwargs for backend in self.backends
+            ]
+        )
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        """
+        Structured output in each backend's own mode (e.g. JSON schema or tool calling).
+
+        The request uses the binding of every backend; the answer is parsed by
+        the parser of the backend that produced it.
+        """
+        bindings, parsers = [], {}
+        for name, backend in zip(self.names, self.backends):
+            structured = backend.with_structured_output(schema, **kwargs)
+            if not (
+                isinstance(structured, RunnableSequence)
+                and isinstance(structured.first, RunnableBinding)
+                and structured.first.bound is backend
+            ):
+                # Unknown layout: fall back to function calling through bind_tools
+                return super().with_structured_output(schema, **kwargs)
+            bindings.append(structured.first.kwargs)
+            rest = structured.steps[1:]
+            parsers[name] = rest[0] if len(rest) == 1 else RunnableSequence(*rest)
+
+        def parse(message: BaseMessage) -> Runnable:
+            return parsers.get(
+                message.response_metadata.get(BACKEND_METADATA_KEY),
+                parsers[self.names[0]],
+            )
+
+        return self.bind(backend_kwargs=bindings) | RunnableLambda(parse)
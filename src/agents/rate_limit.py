@@ -0,0 +1,265 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+import httpx
+from langchain_core.runnables.config import ensure_config
+
+from src.config.agents import AGENT_PRIORITIES, DEFAULT_PRIORITY
+
+# Bursts may use this many seconds' worth of a rate at once
+_BURST_SECONDS = 10
+# Backoff after the first 429 without Retry-After; doubles on each further 429
+_INITIAL_BACKOFF = 1.0
+# Each 429 halves the configured rates down to this share; successes restore them
+_MIN_RATE_FACTOR = 0.1
+_RATE_RECOVERY = 0.05
+# How often waiters that are not first in line check again
+_POLL_INTERVAL = 0.01
+_MAX_SLEEP = 1.0
+
+
+class TokenBucket:
+    """Token bucket refilled at a per-minute rate; RateLimiter holds the lock."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * _BURST_SECONDS, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self, amount: float, now: float, factor: float = 1.0) -> float:
+        """Return the seconds until amount is available at a share of the rate."""
+        self.level = min(
+            self.capacity, self.level + (now - self.updated) * self.rate * factor
+        )
+        self.updated = now
+        # A request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.rate * factor)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+def retry_after_seconds(headers: httpx.Headers) -> Optional[float]:
+    """Parse retry-after-ms or Retry-After (seconds or an HTTP date) into seconds."""
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Estimate the prompt tokens of a request from its body size (~4 bytes each)."""
+    try:
+        return len(request.content) // 4 + 1
+    except httpx.RequestNotRead:
+        return 1
+
+
+def current_priority() -> int:
+    """Return the priority of the calling graph node; lower values are served first."""
+    agent = ensure_config().get("metadata", {}).get("langgraph_node")
+    return AGENT_PRIORITIES.get(agent, DEFAULT_PRIORITY)
+
+
+class RateLimiter:
+    """
+    Process-wide request and token limits for one LLM backend, with adaptive backoff.
+
+    Callers wait in priority order until both buckets have room, so bursts of
+    concurrent workflows are spread out instead of turning into 429s, and
+    latency-critical calls (coordinator, supervisor) go ahead of bulk ones
+    (reporter). A 429 pauses all calls for Retry-After (or an exponential
+    backoff) and halves the rates until successful responses restore them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_backoff: float = 60.0,
+    ):
+        """
+        Args:
+            name: Name used in statistics, usually the LLM type
+            requests_per_minute: Request limit, 0 for none
+            tokens_per_minute: Prompt token limit, 0 for none
+            max_backoff: Longest pause after a 429, in seconds
+        """
+        self.name = name
+        self.max_backoff = max_backoff
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._backoff_until = 0.0
+        self._backoff = 0.0
+        self._rate_factor = 1.0
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def _enqueue(self, priority: int) -> tuple[int, int]:
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _try_acquire(self, ticket: tuple[int, int], tokens: int) -> float:
+        """Take capacity if ticket is first in line; else return seconds to wait."""
+        with self._lock:
+            if self._waiters[0] != ticket:
+                return _POLL_INTERVAL
+            now = time.monotonic()
+            delay = max(self._backoff_until - now, 0.0)
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    delay = max(delay, bucket.delay(amount, now, self._rate_factor))
+            if delay > 0:
+                return min(delay, _MAX_SLEEP)
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.take(amount)
+            heapq.heappop(self._waiters)
+            return 0.0
+
+    def _done(self, ticket: tuple[int, int], started: float, waited: bool):
+        with self._lock:
+            if ticket in self._waiters:
+                # Cancelled or failed while waiting
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+            self._stats["requests"] += 1
+            if waited:
+                self._stats["throttled"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+
+    def acquire(self, tokens: int = 0, priority: int = DEFAULT_PRIORITY):
+        """Block until a request of the given prompt tokens may be sent."""
+        ticket = self._enqueue(priority)
+        started, waited = time.monotonic(), False
+        try:
+            while (delay := self._try_acquire(ticket, tokens)) > 0:
+                waited = True
+                time.sleep(delay)
+        finally:
+            self._done(ticket, started, waited)
+
+    async def aacquire(self, tokens: int = 0, priority: int = DEFAULT_PRIORITY):
+        """Wait until a request of the given prompt tokens may be sent."""
+        ticket = self._enqueue(priority)
+        started, waited = time.monotonic(), False
+        try:
+            while (delay := self._try_acquire(ticket, tokens)) > 0:
+                waited = True
+                await asyncio.sleep(delay)
+        finally:
+            self._done(ticket, started, waited)
+
+    def record_response(self, response: httpx.Response):
+        """Adapt to the backend: back off on 429, recover the rates on success."""
+        with self._lock:
+            if response.status_code == 429:
+                self._stats["rate_limited"] += 1
+                self._backoff = min(
+                    max(self._backoff * 2, _INITIAL_BACKOFF), self.max_backoff
+                )
+                retry_after = retry_after_seconds(response.headers)
+                pause = min(
+                    self._backoff if retry_after is None else max(retry_after, 0.0),
+                    self.max_backoff,
+                )
+                self._backoff_until = max(self._backoff_until, time.monotonic() + pause)
+                self._rate_factor = max(self._rate_factor / 2, _MIN_RATE_FACTOR)
+            elif response.status_code < 400:
+                self._backoff = 0.0
+                self._rate_factor = min(self._rate_factor + _RATE_RECOVERY, 1.0)
+
+    def get_stats(self) -> dict[str, float]:
+        """Return request, throttle, wait, 429, backoff and rate share counters."""
+        with self._lock:
+            return {
+                "requests": self._stats["requests"],
+                "throttled": self._stats["throttled"],
+                "wait_seconds": round(self._stats["wait_seconds"], 3),
+                "rate_limited": self._stats["rate_limited"],
+                "waiting": len(self._waiters),
+                "backoff_seconds": round(
+                    max(self._backoff_until - time.monotonic(), 0.0), 3
+                ),
+                "rate_factor": self._rate_factor,
+            }
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Transport that passes requests through a RateLimiter before sending them."""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._limiter.acquire(estimate_tokens(request), current_priority())
+        response = self._transport.handle_request(request)
+        self._limiter.record_response(response)
+        return response
+
+    def close(self):
+        # The wrapped transport is shared with other clients and closed by its pool
+        pass
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async transport that passes requests through a RateLimiter before sending."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._limiter.aacquire(estimate_tokens(request), current_priority())
+        response = await self._transport.handle_async_request(request)
+        self._limiter.record_response(response)
+        return response
+
+    async def aclose(self):
+        # The wrapped transport is shared with other clients and closed by its pool
+        pass
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, **limits) -> RateLimiter:
+    """Return the process-wide limiter of that name, creating it on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(name, **limits)
+        return _limiters[name]
+
+
+def rate_limiter_stats() -> dict[str, dict[str, float]]:
+    """Return the statistics of every limiter by name."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
@@ -0,0 +1,237 @@
+"""
+Tool-calling agent loop that runs the independent tool calls of a model turn concurrently.
+
+Models often issue several tool calls in one turn, e.g. four tavily_search
+queries or a handful of read_file calls. AgentExecutor runs them one at a time;
+ToolCallingAgent runs them side by side, bounded per tool, and answers them in
+the order the model issued them.
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForChainRun, CallbackManagerForChainRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor, patch_config
+from langchain_core.tools import BaseTool
+
+from src.config import (
+    AGENT_MAX_ITERATIONS,
+    TOOL_CONCURRENCY_LIMITS,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_SEQUENTIAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Same wording as AgentExecutor so plan step failure detection keeps working
+MAX_ITERATIONS_OUTPUT = "Agent stopped due to max iterations."
+
+
+def tool_batches(tool_calls: Sequence[dict], sequential: Sequence[str] = ()) -> list[list[int]]:
+    """
+    Split the tool calls of a turn into batches that may run concurrently.
+
+    Calls to tools with side effects (writing files, running code, driving the
+    browser) form a batch of their own, so calls issued after them see their effects.
+
+    Args:
+        tool_calls: Tool calls of one model turn, in the order the model issued them
+        sequential: Names of the tools whose calls must run alone
+
+    Returns:
+        Batches of indexes into tool_calls, in order
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for index, call in enumerate(tool_calls):
+        if call["name"] in sequential:
+            if current:
+                batches.append(current)
+                current = []
+            batches.append([index])
+        else:
+            current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class ToolCallingAgent(Runnable[dict, dict]):
+    """
+    Agent that calls the model, runs the tool calls it asks for and repeats
+    until the model answers without tool calls.
+
+    Drop-in for AgentExecutor in the graph nodes: invoke/ainvoke take the prompt
+    variables (messages, optionally CURRENT_TIME) and return {"output": answer}.
+    Tools are run with the agent's callbacks, so on_tool_start/on_tool_end events
+    reach the workflow's event stream as before.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        tools: Sequence[BaseTool],
+        prompt: ChatPromptTemplate,
+        max_iterations: int = AGENT_MAX_ITERATIONS,
+        max_concurrency: int = TOOL_MAX_CONCURRENCY,
+        concurrency_limits: Optional[dict[str, int]] = None,
+        sequential: Sequence[str] = TOOL_SEQUENTIAL,
+        name: str = "ToolCallingAgent",
+    ):
+        """
+        Args:
+            llm: Chat model; the tools are bound to it
+            tools: Tools the model may call
+            prompt: Prompt with "messages" and "agent_scratchpad" placeholders
+            max_iterations: Model turns before the agent gives up
+            max_concurrency: Default number of concurrent calls per tool in one turn
+            concurrency_limits: Per-tool overrides of max_concurrency, by tool name
+            sequential: Names of the tools whose calls run alone, see tool_batches
+            name: Run name reported to the callbacks
+        """
+        self.llm = llm.bind_tools(tools)
+        self.tools = {tool.name: tool for tool in tools}
+        self.prompt = prompt
+        self.max_iterations = max_iterations
+        self.max_concurrency = max_concurrency
+        self.concurrency_limits = TOOL_CONCURRENCY_LIMITS if concurrency_limits is None else concurrency_limits
+        self.sequential = set(sequential)
+        self.name = name
+
+    def _limit(self, tool_name: str) -> int:
+        return max(1, self.concurrency_limits.get(tool_name, self.max_concurrency))
+
+    def _unknown_tool(self, call: dict) -> Optional[str]:
+        """Error message for a call the tools cannot run, as AgentExecutor would report it."""
+        if call["name"] not in self.tools:
+            return f"{call['name']} is not a valid tool, try one of [{', '.join(self.tools)}]."
+        return None
+
+    @staticmethod
+    def _calls(message: AIMessage) -> list[dict]:
+        """Tool calls of a turn, including calls whose arguments failed to parse."""
+        return list(message.tool_calls) + [
+            {**call, "args": None} for call in message.invalid_tool_calls
+        ]
+
+    @staticmethod
+    def _tool_message(call: dict, output: Any) -> ToolMessage:
+        content = output if isinstance(output, (str, list)) else str(output)
+        return ToolMessage(content=content, tool_call_id=call["id"], name=call["name"])
+
+    def _run_tool(self, call: dict, config: RunnableConfig) -> ToolMessage:
+        error = self._unknown_tool(call)
+        if error is None and call["args"] is None:
+            error = f"Could not parse the arguments of {call['name']}, please call it again with valid JSON."
+        if error is not None:
+            return self._tool_message(call, error)
+        return self._tool_message(call, self.tools[call["name"]].invoke(call["args"], config))
+
+    async def _arun_tool(self, call: dict, config: RunnableConfig, semaphores: dict) -> ToolMessage:
+        if self._unknown_tool(call) is not None or call["args"] is None:
+            return self._run_tool(call, config)
+        async with semaphores[call["name"]]:
+            output = await self.tools[call["name"]].ainvoke(call["args"], config)
+        return self._tool_message(call, output)
+
+    def _run_tools(self, calls: list[dict], config: RunnableConfig) -> list[ToolMessage]:
+        results: list[Optional[ToolMessage]] = [None] * len(calls)
+        for batch in tool_batches(calls, self.sequential):
+            if len(batch) == 1:
+                results[batch[0]] = self._run_tool(calls[batch[0]], config)
+                continue
+            # Calls of the same tool above its limit wait for a worker of their own tool
+            by_tool: dict[str, list[int]] = {}
+            for index in batch:
+                by_tool.setdefault(calls[index]["name"], []).append(index)
+            executors = [
+                ContextThreadPoolExecutor(max_workers=min(self._limit(name), len(indexes)))
+                for name, indexes in by_tool.items()
+            ]
+            try:
+                futures = {
+                    index: executor.submit(self._run_tool, calls[index], config)
+                    for executor, indexes in zip(executors, by_tool.values())
+                    for index in indexes
+                }
+                for index, future in futures.items():
+                    results[index] = future.result()
+            finally:
+                for executor in executors:
+                    executor.shutdown(wait=True, cancel_futures=True)
+        return results
+
+    async def _arun_tools(self, calls: list[dict], config: RunnableConfig) -> list[ToolMessage]:
+        semaphores = {name: asyncio.Semaphore(self._limit(name)) for name in self.tools}
+        results: list[ToolMessage] = []
+        for batch in tool_batches(calls, self.sequential):
+            # A failing call cancels the other calls of its batch and is raised as is
+            try:
+                async with asyncio.TaskGroup() as group:
+                    tasks = [
+                        group.create_task(self._arun_tool(calls[index], config, semaphores))
+                        for index in batch
+                    ]
+            except ExceptionGroup as errors:
+                raise errors.exceptions[0]
+            results.extend(task.result() for task in tasks)
+        return results
+
+    def _prompt_input(self, input: dict, scratchpad: list[BaseMessage]) -> dict:
+        return {**input, "agent_scratchpad": scratchpad}
+
+    def _log_turn(self, calls: list[dict], iteration: int):
+        if calls:
+            logger.debug(
+                f"{self.name} turn {iteration}: {len(calls)} tool call(s): {', '.join(c['name'] for c in calls)}"
+            )
+
+    def _loop(self, input: dict, run_manager: CallbackManagerForChainRun, config: RunnableConfig) -> dict:
+        config = patch_config(config, callbacks=run_manager.get_child())
+        scratchpad: list[BaseMessage] = []
+        for iteration in range(self.max_iterations):
+            messages = self.prompt.invoke(self._prompt_input(input, scratchpad), config)
+            message = self.llm.invoke(messages, config)
+            calls = self._calls(message)
+            if not calls:
+                return {"output": message.content}
+            self._log_turn(calls, iteration)
+            scratchpad += [message, *self._run_tools(calls, config)]
+        return {"output": MAX_ITERATIONS_OUTPUT}
+
+    async def _aloop(
+        self, input: dict, run_manager: AsyncCallbackManagerForChainRun, config: RunnableConfig
+    ) -> dict:
+        config = patch_config(config, callbacks=run_manager.get_child())
+        scratchpad: list[BaseMessage] = []
+        for iteration in range(self.max_iterations):
+            messages = await self.prompt.ainvoke(self._prompt_input(input, scratchpad), config)
+            message = await self.llm.ainvoke(messages, config)
+            calls = self._calls(message)
+            if not calls:
+                return {"output": message.content}
+            self._log_turn(calls, iteration)
+            scratchpad += [message, *await self._arun_tools(calls, config)]
+        return {"output": MAX_ITERATIONS_OUTPUT}
+
+    def invoke(self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any) -> dict:
+        """
+        Run the agent to its final answer.
+
+        Args:
+            input: Prompt variables: "messages" and optionally "CURRENT_TIME"
+            config: Runnable config; its callbacks also see the model and tool runs
+
+        Returns:
+            {"output": final answer of the model}
+        """
+        return self._call_with_config(self._loop, input, config, run_type="chain")
+
+    async def ainvoke(self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any) -> dict:
+        """Async version of invoke; tool calls of a turn run as concurrent tasks."""
+        return await self._acall_with_config(self._aloop, input, config, run_type="chain")
@@ -2,20 +2,49 @@
 FastAPI application for LangManus.
 """
 
-import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Literal, Optional, Union
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 import asyncio
 from typing import AsyncGenerator, Dict, List, Any
+import uuid
 
 from src.graph import build_graph
-from src.config import TEAM_MEMBERS
-from src.service.workflow_service import run_agent_workflow
+from src.config import (
+    TEAM_MEMBERS,
+    SSE_COALESCE_WINDOW_MS,
+    SSE_COALESCE_MAX_CHARS,
+    SSE_DISCONNECT_CHECK_INTERVAL,
+    WORKFLOW_JOB_BUFFER_SIZE,
+    WORKFLOW_JOB_RETENTION_SECONDS,
+    WORKFLOW_MAX_CONCURRENT,
+    WORKFLOW_MAX_QUEUE,
+)
+from src.service.workflow_service import (
+    WorkflowConflictError,
+    check_workflow_id,
+    run_agent_workflow,
+    resume_agent_workflow,
+)
+from src.service.jobs import JobManager, JobConflictError, JobNotFoundError
+from src.service.scheduler import (
+    WorkflowScheduler,
+    QueueFullError,
+    SchedulerClosedError,
+)
+from src.agents.http_pool import http_pool
+from src.agents.llm_cache import get_llm_response_cache
+from src.agents.llm_router import llm_backend_stats
+from src.agents.rate_limit import rate_limiter_stats
+from src.metrics import coordinator_intent_stats, prompt_cache_stats, registry
+from src.tools.cancellation import cancellation_stats
+from src.tools.search import search_stats
+from .sse import coalesce_message_deltas, dumps
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -39,10 +68,174 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# 所有工作流（流式、恢复和后台任务）都经过同一个调度器，限制同时运行的数量
+scheduler = WorkflowScheduler(
+    max_concurrent=WORKFLOW_MAX_CONCURRENT,
+    max_queue=WORKFLOW_MAX_QUEUE,
+)
+
+# 等待队列已满时，建议客户端重试前等待的秒数
+QUEUE_FULL_RETRY_AFTER = 5
+
+# 后台运行的工作流任务，生命周期与SSE连接无关
+job_manager = JobManager(
+    buffer_size=WORKFLOW_JOB_BUFFER_SIZE,
+    retention_seconds=WORKFLOW_JOB_RETENTION_SECONDS,
+)
+
+
+def _collect_service_stats() -> list:
+    """
+    在抓取/metrics时读取调度器、取消、搜索缓存和LLM响应缓存已有的统计。
+
+    @returns {list} (指标名, 类型, 说明, [(标签, 值), ...])列表。
+    """
+    scheduler_stats = scheduler.get_stats()
+    samples = [
+        (
+            "langmanus_scheduler_running",
+            "gauge",
+            "Workflows holding a scheduler slot",
+            [({}, scheduler_stats["running"])],
+        ),
+        (
+            "langmanus_scheduler_queue_depth",
+            "gauge",
+            "Workflows waiting for a slot",
+            [({}, scheduler_stats["queue_depth"])],
+        ),
+        (
+            "langmanus_scheduler_wait_seconds_avg",
+            "gauge",
+            "Average queue wait",
+            [({}, scheduler_stats["wait_seconds_avg"])],
+        ),
+        (
+            "langmanus_scheduler_wait_seconds_max",
+            "gauge",
+            "Longest queue wait",
+            [({}, scheduler_stats["wait_seconds_max"])],
+        ),
+        (
+            "langmanus_scheduler_requests_total",
+            "counter",
+            "Admission outcomes",
+            [
+                ({"outcome": outcome}, scheduler_stats.get(outcome, 0))
+                for outcome in ("admitted", "queued", "rejected")
+            ],
+        ),
+        (
+            "langmanus_cancellations_total",
+            "counter",
+            "Cancelled workflows and the work they aborted",
+            [
+                ({"kind": kind}, count)
+                for kind, count in sorted(cancellation_stats.get().items())
+            ],
+        ),
+        (
+            "langmanus_search_cache_total",
+            "counter",
+            "Search cache outcomes",
+            [
+                ({"outcome": outcome}, count)
+                for outcome, count in search_stats.get().items()
+            ],
+        ),
+    ]
+    http_stats = http_pool.get_stats()
+    samples.append(
+        (
+            "langmanus_http_pool_total",
+            "counter",
+            "LLM HTTP requests and new connections by origin",
+            [
+                ({"origin": origin, "kind": kind}, stats[kind])
+                for origin, stats in sorted(http_stats.items())
+                for kind in ("requests", "connections_opened", "tls_handshakes")
+            ],
+        )
+    )
+    limiter_stats = rate_limiter_stats()
+    samples += [
+        (
+            "langmanus_llm_rate_limit_total",
+            "counter",
+            "LLM calls, throttled calls and 429s by LLM type",
+            [
+                ({"llm_type": name, "kind": kind}, stats[kind])
+                for name, stats in sorted(limiter_stats.items())
+                for kind in ("requests", "throttled", "rate_limited")
+            ],
+        ),
+        (
+            "langmanus_llm_rate_limit_wait_seconds_total",
+            "counter",
+            "Time LLM calls waited for the rate limiter",
+            [
+                ({"llm_type": name}, stats["wait_seconds"])
+                for name, stats in sorted(limiter_stats.items())
+            ],
+        ),
+        (
+            "langmanus_llm_rate_limit_waiting",
+            "gauge",
+            "LLM calls waiting for the rate limiter",
+            [
+                ({"llm_type": name}, stats["waiting"])
+                for name, stats in sorted(limiter_stats.items())
+            ],
+        ),
+    ]
+    backend_stats = llm_backend_stats()
+    samples += [
+        (
+            "langmanus_llm_backend_calls_total",
+            "counter",
+            "Routed LLM calls by backend and outcome",
+            [
+                ({"backend": name, "outcome": outcome}, stats[outcome])
+                for name, stats in sorted(backend_stats.items())
+                for outcome in ("success", "error", "hedged", "hedge_won", "failover")
+            ],
+        ),
+        (
+            "langmanus_llm_backend_first_token_p95_seconds",
+            "gauge",
+            "p95 time to first token of routed calls",
+            [
+                ({"backend": name}, stats["first_token_p95"])
+                for name, stats in sorted(backend_stats.items())
+                if stats["first_token_p95"] is not None
+            ],
+        ),
+    ]
+    llm_cache = get_llm_response_cache()
+    if llm_cache is not None:
+        cache_stats = llm_cache.get_stats()
+        samples.append(
+            (
+                "langmanus_llm_cache_total",
+                "counter",
+                "LLM response cache outcomes by agent",
+                [
+                    ({"agent": agent, "outcome": outcome}, stats[outcome])
+                    for agent, stats in sorted(cache_stats.items())
+                    for outcome in ("hits", "misses")
+                ],
+            )
+        )
+    return samples
+
+
+registry.add_collector(_collect_service_stats)
+
 # Create the graph
 # 在应用启动时，构建并编译LangGraph工作流图
 graph = build_graph()
 
+
 # 根据 type 字段的值来决定是填充 text 字段还是 image_url 字段，从而支持多模态内容（如文本和图片）。
 class ContentItem(BaseModel):
     """定义了多模态内容项的数据结构。
@@ -62,6 +255,7 @@ class ContentItem(BaseModel):
         None, description="The image URL if type is 'image'"
     )
 
+
 # 单条聊天消息的数据结构
 class ChatMessage(BaseModel):
     """定义了单条聊天消息的数据结构。
@@ -79,11 +273,14 @@ class ChatMessage(BaseModel):
         description="The content of the message, either a string or a list of content items",
     )
 
+
+# 客户端可以订阅的事件类别，与src.service.event_transformer.EVENT_FAMILIES一致
+EventFamily = Literal["agents", "llm", "reasoning", "tools", "plan"]
+
+
 # 聊天请求的完整数据结构
 class ChatRequest(BaseModel):
-    """定义了聊天请求的完整数据结构。
-    
-    """
+    """定义了聊天请求的完整数据结构。"""
 
     messages: List[ChatMessage] = Field(..., description="The conversation history")
     debug: Optional[bool] = Field(False, description="Whether to enable debug logging")
@@ -93,6 +290,156 @@ class ChatRequest(BaseModel):
     search_before_planning: Optional[bool] = Field(
         False, description="Whether to search before planning"
     )
+    plan_driven_routing: Optional[bool] = Field(
+        False,
+        description=(
+            "Whether to route steps by the planner's plan "
+            "instead of asking the supervisor LLM at every hop"
+        ),
+    )
+    workflow_id: Optional[str] = Field(
+        None,
+        description=(
+            "Optional client-chosen id for a new workflow; rejected while a workflow "
+            "with this id runs or, with checkpointing, once it exists. "
+            "Use /api/chat/resume to continue an interrupted workflow"
+        ),
+    )
+    events: Optional[List[EventFamily]] = Field(
+        None,
+        description=(
+            "Event families to stream (default all); "
+            "start_of_workflow and end_of_workflow are always sent"
+        ),
+    )
+    token_budget: Optional[int] = Field(
+        None,
+        ge=0,
+        description=(
+            "Token budget for this run (0 = unlimited); "
+            "defaults to WORKFLOW_TOKEN_BUDGET"
+        ),
+    )
+
+
+class ResumeRequest(BaseModel):
+    """定义了恢复工作流请求的数据结构。"""
+
+    workflow_id: str = Field(..., description="The id of the workflow to resume")
+    debug: Optional[bool] = Field(False, description="Whether to enable debug logging")
+    events: Optional[List[EventFamily]] = Field(
+        None,
+        description=(
+            "Event families to stream (default all); "
+            "start_of_workflow and end_of_workflow are always sent"
+        ),
+    )
+
+
+# 定义一个异步生成器，用于从工作流服务中获取事件并推送到客户端
+async def _event_generator(
+    events: AsyncGenerator[dict, None], req: Request, coalesce: bool = True
+):
+    """
+    将工作流服务产生的事件转换为SSE帧，并在客户端断开时停止。
+    同一消息的连续增量先在短时间窗口内合并；是否断开连接按固定间隔检查，而不是每个事件都检查。
+
+    @param {AsyncGenerator} events - run_agent_workflow/resume_agent_workflow产生的事件。
+                                     带有id的事件会作为SSE的id发送。
+    @param {Request} req - FastAPI的请求对象，用于检查客户端连接状态。
+    @param {bool} coalesce - 是否合并消息增量；后台任务的事件在写入事件日志前已经合并过。
+    """
+    loop = asyncio.get_running_loop()
+    next_disconnect_check = loop.time()
+    if coalesce:
+        events = coalesce_message_deltas(
+            events, SSE_COALESCE_WINDOW_MS, SSE_COALESCE_MAX_CHARS
+        )
+    try:
+        # 异步迭代执行agent工作流，并获取返回的事件
+        async for event in events:
+            # 在发送事件前，定期检查客户端是否仍然连接
+            if loop.time() >= next_disconnect_check:
+                if await req.is_disconnected():
+                    logger.info("客户端已断开连接，停止工作流")
+                    break
+                next_disconnect_check = loop.time() + SSE_DISCONNECT_CHECK_INTERVAL
+            # 使用yield将事件发送给客户端
+            frame = {
+                "event": event["event"],
+                "data": dumps(event["data"]),
+            }
+            if "id" in event:
+                frame["id"] = event["id"]
+            yield frame
+    except asyncio.CancelledError:
+        logger.info("流处理被取消")
+        raise
+    finally:
+        # 立即关闭上游，而不是等垃圾回收：工作流随之被取消，进行中的LLM请求、工具线程、
+        # 子进程和浏览器会话都会被中止
+        await events.aclose()
+
+
+def _workflow_messages(request: ChatRequest) -> List[Dict[str, Any]]:
+    """
+    将Pydantic模型转换为字典，并处理多模态内容，以符合后端工作流的输入格式。
+
+    @param {ChatRequest} request - 聊天请求。
+    @returns {list} 工作流期望的消息列表。
+    """
+    messages = []
+    for msg in request.messages:
+        message_dict = {"role": msg.role}
+
+        # 处理字符串或内容项列表两种格式的内容
+        if isinstance(msg.content, str):
+            message_dict["content"] = msg.content
+        else:
+            # 将内容项列表转换为工作流期望的格式
+            content_items = []
+            for item in msg.content:
+                if item.type == "text" and item.text:
+                    content_items.append({"type": "text", "text": item.text})
+                elif item.type == "image" and item.image_url:
+                    content_items.append({"type": "image", "image_url": item.image_url})
+
+            message_dict["content"] = content_items
+
+        messages.append(message_dict)
+    return messages
+
+
+def _admit():
+    """
+    向调度器申请运行一个工作流，无法准入时转换为HTTP错误。
+
+    @returns {Admission} 准入凭证。
+    @raises {HTTPException} 等待队列已满时抛出429异常，服务正在停止时抛出503异常。
+    """
+    try:
+        return scheduler.admit()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)},
+        )
+    except SchedulerClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def _check_workflow_id(workflow_id: Optional[str]):
+    """
+    检查新工作流的workflow_id是否可用，冲突时转换为HTTP错误。
+
+    @param {str|None} workflow_id - 客户端指定的工作流ID。
+    @raises {HTTPException} 该ID的工作流正在运行或已有检查点时抛出409异常。
+    """
+    try:
+        await check_workflow_id(workflow_id)
+    except WorkflowConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 
 @app.post("/api/chat/stream")
@@ -103,61 +450,272 @@ async def chat_endpoint(request: ChatRequest, req: Request):
     @param {ChatRequest} request - 包含了对话历史和配置选项的请求体。
     @param {Request} req - FastAPI的请求对象，用于检查客户端连接状态。
     @returns {EventSourceResponse} 一个服务器发送事件（SSE）的流式响应。
-    @raises {HTTPException} 如果处理过程中发生错误，则抛出500异常。
+    @raises {HTTPException} workflow_id正在运行或已被使用时抛出409异常，等待队列已满时抛出429异常，
+        服务正在停止时抛出503异常，其他错误抛出500异常。
     """
+    await _check_workflow_id(request.workflow_id)
+    admission = _admit()
     try:
-        # 将Pydantic模型转换为字典，并处理多模态内容，以符合后端工作流的输入格式
-        messages = []
-        for msg in request.messages:
-            message_dict = {"role": msg.role}
-
-            # 处理字符串或内容项列表两种格式的内容
-            if isinstance(msg.content, str):
-                message_dict["content"] = msg.content
-            else:
-                # 将内容项列表转换为工作流期望的格式
-                content_items = []
-                for item in msg.content:
-                    if item.type == "text" and item.text:
-                        content_items.append({"type": "text", "text": item.text})
-                    elif item.type == "image" and item.image_url:
-                        content_items.append(
-                            {"type": "image", "image_url": item.image_url}
-                        )
-
-                message_dict["content"] = content_items
-
-            messages.append(message_dict)
-
-        # 定义一个异步生成器，用于从工作流服务中获取事件并推送到客户端
-        async def event_generator():
-            try:
-                # 异步迭代执行agent工作流，并获取返回的事件
-                async for event in run_agent_workflow(
-                    messages,
-                    request.debug,
-                    request.deep_thinking_mode,
-                    request.search_before_planning,
-                ):
-                    # 在发送事件前，检查客户端是否仍然连接
-                    if await req.is_disconnected():
-                        logger.info("客户端已断开连接，停止工作流")
-                        break
-                    # 使用yield将事件发送给客户端
-                    yield {
-                        "event": event["event"],
-                        "data": json.dumps(event["data"], ensure_ascii=False),
-                    }
-            except asyncio.CancelledError:
-                logger.info("流处理被取消")
-                raise
+        messages = _workflow_messages(request)
 
         # 返回一个EventSourceResponse，它会持续调用event_generator生成事件流
         return EventSourceResponse(
-            event_generator(),
+            _event_generator(
+                scheduler.run(
+                    admission,
+                    run_agent_workflow(
+                        messages,
+                        request.debug,
+                        request.deep_thinking_mode,
+                        request.search_before_planning,
+                        request.plan_driven_routing,
+                        request.workflow_id,
+                        request.events,
+                        request.token_budget,
+                    ),
+                ),
+                req,
+            ),
             media_type="text/event-stream",
             sep="\n",
         )
     except Exception as e:
+        admission.release()
         logger.error(f"聊天端点出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/chat/resume")
+async def resume_endpoint(request: ResumeRequest, req: Request):
+    """
+    从最后一个完成的节点恢复一个被中断的工作流，使用流式响应(SSE)。
+    需要服务端启用检查点(CHECKPOINT_ENABLED)。
+
+    @param {ResumeRequest} request - 包含要恢复的workflow_id。
+    @param {Request} req - FastAPI的请求对象，用于检查客户端连接状态。
+    @returns {EventSourceResponse} 与/api/chat/stream格式相同的事件流。
+    @raises {HTTPException} 工作流无法恢复时抛出404异常，该工作流正在运行时抛出409异常，
+        等待队列已满时抛出429异常，服务正在停止时抛出503异常。
+    """
+    events = resume_agent_workflow(request.workflow_id, request.debug, request.events)
+    try:
+        # 预先取出第一个事件，使无法恢复的情况能以HTTP错误返回，而不是空的事件流
+        first_event = await anext(events)
+    except WorkflowConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        admission = _admit()
+    except HTTPException:
+        await events.aclose()
+        raise
+
+    async def replay_first():
+        yield first_event
+        async for event in events:
+            yield event
+
+    return EventSourceResponse(
+        _event_generator(scheduler.run(admission, replay_first()), req),
+        media_type="text/event-stream",
+        sep="\n",
+    )
+
+
+@app.post("/api/workflows", status_code=202)
+async def create_workflow_endpoint(request: ChatRequest):
+    """
+    在后台启动一个工作流并立即返回其ID；与/api/chat/stream共用调度器的名额和等待队列。
+    工作流不依赖任何连接，事件通过/api/workflows/{workflow_id}/events获取，断开后可以随时重连。
+
+    @param {ChatRequest} request - 与/api/chat/stream相同的请求体。
+    @returns {dict} 任务的状态，其中workflow_id用于后续的查询、订阅和取消。
+    @raises {HTTPException} 同一workflow_id的工作流仍在运行或已被使用时抛出409异常，等待队列已满时抛出429异常，
+        服务正在停止时抛出503异常。
+    """
+    await _check_workflow_id(request.workflow_id)
+    workflow_id = request.workflow_id or str(uuid.uuid4())
+    admission = _admit()
+    events = run_agent_workflow(
+        _workflow_messages(request),
+        request.debug,
+        request.deep_thinking_mode,
+        request.search_before_planning,
+        request.plan_driven_routing,
+        workflow_id,
+        request.events,
+        request.token_budget,
+    )
+    try:
+        # 消息增量在写入事件日志前合并，重放时帧数更少
+        job = job_manager.submit(
+            workflow_id,
+            coalesce_message_deltas(
+                scheduler.run(admission, events),
+                SSE_COALESCE_WINDOW_MS,
+                SSE_COALESCE_MAX_CHARS,
+            ),
+            admission,
+        )
+    except JobConflictError as e:
+        admission.release()
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
+
+
+def _get_job(workflow_id: str):
+    try:
+        return job_manager.get(workflow_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"找不到工作流: {workflow_id}")
+
+
+@app.get("/api/workflows/{workflow_id}")
+async def workflow_status_endpoint(workflow_id: str):
+    """
+    查询后台工作流的状态。
+
+    @param {str} workflow_id - 工作流ID。
+    @returns {dict} 任务的状态。
+    @raises {HTTPException} 找不到该工作流时抛出404异常。
+    """
+    return _get_job(workflow_id).to_dict()
+
+
+@app.get("/api/workflows/{workflow_id}/events")
+async def workflow_events_endpoint(workflow_id: str, req: Request):
+    """
+    订阅后台工作流的事件流(SSE)。每个事件带有递增的id；重连时浏览器会自动带上
+    Last-Event-ID请求头，只发送之后的事件。客户端断开不会影响工作流的执行。
+
+    @param {str} workflow_id - 工作流ID。
+    @param {Request} req - FastAPI的请求对象，用于读取Last-Event-ID和检查客户端连接状态。
+    @returns {EventSourceResponse} 与/api/chat/stream格式相同、带有id的事件流。
+    @raises {HTTPException} 找不到该工作流时抛出404异常，Last-Event-ID无效时抛出400异常。
+    """
+    job = _get_job(workflow_id)
+    try:
+        last_event_id = int(req.headers.get("last-event-id") or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID必须是整数")
+
+    async def events():
+        async for event_id, event in job.events(last_event_id):
+            yield {**event, "id": str(event_id)}
+
+    return EventSourceResponse(
+        _event_generator(events(), req, coalesce=False),
+        media_type="text/event-stream",
+        sep="\n",
+    )
+
+
+@app.post("/api/workflows/{workflow_id}/cancel")
+async def cancel_workflow_endpoint(workflow_id: str):
+    """
+    取消一个排队中或运行中的后台工作流。
+
+    @param {str} workflow_id - 工作流ID。
+    @returns {dict} 任务的状态，以及本次取消是否生效(cancelled)。
+    @raises {HTTPException} 找不到该工作流时抛出404异常。
+    """
+    job = _get_job(workflow_id)
+    cancelled = job.cancel()
+    return {**job.to_dict(), "cancelled": cancelled}
+
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats_endpoint():
+    """
+    查询调度器的指标：运行中的工作流数量、队列深度、累计的准入/排队/拒绝次数和等待时间。
+
+    @returns {dict} 指标字典。
+    """
+    return scheduler.get_stats()
+
+
+@app.get("/api/cancellation/stats")
+async def cancellation_stats_endpoint():
+    """
+    查询取消相关的指标：被取消的工作流数量，以及因此中止的LLM调用、工具调用、
+    线程、子进程和浏览器会话数量。
+
+    @returns {dict} 指标字典。
+    """
+    return cancellation_stats.get()
+
+
+@app.get("/api/http/stats")
+async def http_pool_stats_endpoint():
+    """
+    查询LLM共享连接池的指标：每个后端的请求数、新建连接数、TLS握手次数和连接复用率。
+
+    @returns {dict} 以后端地址(scheme://host:port)为键的指标字典。
+    """
+    return http_pool.get_stats()
+
+
+@app.get("/api/ratelimit/stats")
+async def rate_limit_stats_endpoint():
+    """
+    查询各LLM类型的限流指标：调用次数、被限流等待的次数和总时长、收到429的次数、
+    正在等待的调用数、剩余的退避时间和当前的速率比例。
+
+    @returns {dict} 以LLM类型为键的指标字典。
+    """
+    return rate_limiter_stats()
+
+
+@app.get("/api/llm/backends")
+async def llm_backends_endpoint():
+    """
+    查询AGENT_LLM_MAP中各LLM后端的路由指标：成功/失败次数、被对冲和对冲胜出的次数、
+    故障切换次数、首个token和完整响应耗时的p50/p95，以及当前是否健康。
+
+    @returns {dict} 以LLM类型为键的指标字典。
+    """
+    return llm_backend_stats()
+
+
+@app.get("/api/llm/prompt_cache")
+async def llm_prompt_cache_endpoint():
+    """
+    查询各Agent的服务商前缀缓存命中情况：输入token数、其中命中缓存的token数和命中率。
+
+    @returns {dict} 以Agent为键的指标字典。
+    """
+    return prompt_cache_stats()
+
+
+@app.get("/api/coordinator/intent")
+async def coordinator_intent_endpoint():
+    """
+    查询协调员预分类器的效果：各类决策次数、跳过LLM的比例、估算节省的时间和抽样比对的不一致率。
+
+    @returns {dict} 统计字典。
+    """
+    return coordinator_intent_stats()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    以Prometheus文本格式输出节点、工具、LLM的耗时与错误、各Agent的token用量、
+    运行中的工作流数量，以及调度器和缓存的统计。
+
+    @returns {PlainTextResponse} 文本格式的指标。
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("shutdown")
+async def close_scheduler():
+    """服务停止时不再接受新的工作流，已在运行或排队的工作流继续完成。"""
+    scheduler.close()
+
+
+@app.on_event("shutdown")
+async def close_http_pool():
+    """服务停止时关闭LLM连接池中的空闲连接。"""
+    await http_pool.aclose()
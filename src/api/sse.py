@@ -0,0 +1,175 @@
+"""
+SSE事件流的合并与序列化。
+
+推理模型每秒会产生成百上千个很小的message增量，逐个作为SSE帧发送时，
+序列化和发送的开销远大于内容本身。这里在发送前把同一消息的连续增量
+在一个很短的时间窗口内合并为一帧，并使用更快的JSON编码器序列化。
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncGenerator, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖，缺失时回退到标准库json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _Failure:
+    """上游事件流抛出的异常，经队列转交给消费方重新抛出。"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def dumps(data) -> str:
+    """
+    将事件数据序列化为JSON字符串，非ASCII字符原样输出（等价于ensure_ascii=False）。
+
+    @param {Any} data - 事件的data字段。
+    @returns {str} JSON字符串。
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            # orjson不支持的类型（如超过64位的整数），交给标准库处理
+            pass
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _delta_key(event: dict) -> Optional[tuple]:
+    """可以合并的message事件返回(message_id, 增量字段)，其他事件返回None。"""
+    if event.get("event") != "message":
+        return None
+    delta = event["data"].get("delta") or {}
+    if len(delta) != 1:
+        return None
+    field, value = next(iter(delta.items()))
+    if not isinstance(value, str):
+        return None
+    return event["data"].get("message_id"), field
+
+
+class _PendingDelta:
+    """正在合并中的message事件。"""
+
+    def __init__(self, event: dict, key: tuple, deadline: float):
+        self.event = event
+        self.key = key
+        self.deadline = deadline
+        self.parts = [event["data"]["delta"][key[1]]]
+        self.size = len(self.parts[0])
+
+    def add(self, event: dict):
+        part = event["data"]["delta"][self.key[1]]
+        self.parts.append(part)
+        self.size += len(part)
+
+    def flush(self) -> dict:
+        data = self.event["data"]
+        return {
+            **self.event,
+            "data": {**data, "delta": {self.key[1]: "".join(self.parts)}},
+        }
+
+
+async def coalesce_message_deltas(
+    events: AsyncGenerator[dict, None],
+    window_ms: float,
+    max_chars: int,
+    queue_size: int = 256,
+) -> AsyncGenerator[dict, None]:
+    """
+    合并同一消息的连续增量。
+
+    同一message_id、同一增量字段（content或reasoning_content）的连续message事件
+    会被合并为一个事件；遇到其他事件、其他消息的增量、合并内容达到max_chars，
+    或第一个增量到达后超过window_ms时，立即发出合并结果。事件的相对顺序保持不变。
+
+    上游在单独的任务中被消费并放入有界队列，这样等待时间窗口到期时不会中断上游的生成器。
+    关闭合并后的生成器时，会先停止该任务再关闭上游，返回时上游的清理已经完成。
+
+    @param {AsyncGenerator} events - 工作流服务产生的事件。
+    @param {float} window_ms - 合并的时间窗口（毫秒），0表示不合并。
+    @param {int} max_chars - 合并后单个增量的最大字符数。
+    @param {int} queue_size - 上游与合并之间的缓冲区大小。
+    @returns {AsyncGenerator} 合并后的事件。
+    """
+    if window_ms <= 0:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_Failure(e))
+            return
+        await queue.put(_END)
+
+    producer = asyncio.create_task(pump())
+    pending: Optional[_PendingDelta] = None
+    try:
+        while True:
+            if pending is None:
+                item = await queue.get()
+            else:
+                timeout = pending.deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        raise asyncio.TimeoutError
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    # 时间窗口到期，发出已合并的内容
+                    yield pending.flush()
+                    pending = None
+                    continue
+
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+
+            key = _delta_key(item)
+            if pending is not None and key == pending.key:
+                pending.add(item)
+                if pending.size >= max_chars:
+                    yield pending.flush()
+                    pending = None
+                continue
+            if pending is not None:
+                yield pending.flush()
+                pending = None
+            if key is None:
+                yield item
+                continue
+            pending = _PendingDelta(item, key, loop.time() + window)
+            if pending.size >= max_chars:
+                yield pending.flush()
+                pending = None
+
+        if pending is not None:
+            yield pending.flush()
+    finally:
+        # 等待任务结束后再关闭上游，上游的finally（取消工作流、释放调度名额等）在此之前就已执行
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        await events.aclose()
@@ -0,0 +1,5 @@
+from .store import SqliteTTLStore
+
+__all__ = [
+    "SqliteTTLStore",
+]
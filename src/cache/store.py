@@ -0,0 +1,175 @@
+"""
+Generic key-value cache in a local SQLite file, with TTL expiry and LRU eviction by total size.
+
+The LLM response cache and the search result cache use it as their storage.
+Values are bytes serialized by the caller. Expired entries are deleted when
+read, and once a write takes the total size over the limit the least recently
+used entries are evicted.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Entries read per query while evicting
+_EVICT_BATCH = 64
+
+
+class SqliteTTLStore:
+    """
+    SQLite key-value store with a TTL and an LRU size limit, safe to share between threads.
+
+    The total size of the values is read once when the store is opened and then
+    kept up to date on every write, so writes do not scan the table.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        max_bytes: int,
+        table: str = "entries",
+    ):
+        """
+        Args:
+            path: SQLite file path, ":memory:" to keep the entries in memory only
+            ttl_seconds: Time to live of an entry in seconds, 0 to never expire
+            max_bytes: Limit on the total size of the values in bytes, 0 for no limit
+            table: Table name, so several caches can share one file
+        """
+        if not _TABLE_NAME.match(table):
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at);
+            """
+        )
+        self.lock = threading.Lock()
+        with self.cursor() as cur:
+            cur.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}")
+            self.total_bytes = cur.fetchone()[0]
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                yield cur
+                self.conn.commit()
+            finally:
+                cur.close()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Read an entry and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if it is missing or expired
+        """
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute(f"SELECT value, size, created_at FROM {self.table} WHERE key = ?", (key,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            value, size, created_at = row
+            if self._expired(created_at, now):
+                cur.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.total_bytes -= size
+                return None
+            cur.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: bytes):
+        """
+        Write an entry, evicting the least recently used entries if the total size goes over the limit.
+
+        Args:
+            key: Cache key
+            value: Serialized value
+        """
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,))
+            replaced = cur.fetchone()
+            cur.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self.total_bytes += len(value) - (replaced[0] if replaced else 0)
+            if self.max_bytes > 0 and self.total_bytes > self.max_bytes:
+                self._evict(cur)
+
+    def _evict(self, cur: sqlite3.Cursor):
+        # Walk the accessed_at index from the oldest entry, a batch at a time, until enough space is free
+        evicted = 0
+        while self.total_bytes > self.max_bytes:
+            cur.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC LIMIT ?", (_EVICT_BATCH,)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            batch = []
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                batch.append((key,))
+                self.total_bytes -= size
+            cur.executemany(f"DELETE FROM {self.table} WHERE key = ?", batch)
+            evicted += len(batch)
+        logger.debug(f"Cache {self.table} is over its size limit, evicted {evicted} entries")
+
+    def purge_expired(self) -> int:
+        """
+        Delete every expired entry.
+
+        Returns:
+            Number of entries deleted
+        """
+        if self.ttl_seconds <= 0:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self.cursor() as cur:
+            cur.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table} WHERE created_at < ?", (cutoff,)
+            )
+            self.total_bytes -= cur.fetchone()[0]
+            cur.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (cutoff,))
+            return cur.rowcount
+
+    def clear(self):
+        with self.cursor() as cur:
+            cur.execute(f"DELETE FROM {self.table}")
+            self.total_bytes = 0
@@ -11,8 +11,68 @@ from .env import (
     VL_MODEL,
     VL_BASE_URL,
     VL_API_KEY,
+    # Cheaper LLM
+    CHEAP_MODEL,
+    CHEAP_BASE_URL,
+    CHEAP_API_KEY,
     # Other configurations
     CHROME_INSTANCE_PATH,
+    TAVILY_BASE_URL,
+    JINA_BASE_URL,
+    # Workflow configuration
+    FAN_OUT_ENABLED,
+    MAX_PARALLEL_STEPS,
+    PLANNER_EARLY_DISPATCH,
+    SUPERVISOR_STREAM_ROUTING,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_SUMMARIZE,
+    CHECKPOINT_ENABLED,
+    CHECKPOINT_DB_PATH,
+    CHECKPOINT_RETENTION_HOURS,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_HOURS,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_AGENTS,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL_HOURS,
+    SEARCH_CACHE_MAX_MB,
+    SSE_COALESCE_WINDOW_MS,
+    SSE_COALESCE_MAX_CHARS,
+    SSE_DISCONNECT_CHECK_INTERVAL,
+    WORKFLOW_JOB_BUFFER_SIZE,
+    WORKFLOW_JOB_RETENTION_SECONDS,
+    WORKFLOW_MAX_CONCURRENT,
+    WORKFLOW_MAX_QUEUE,
+    WORKFLOW_TOKEN_BUDGET,
+    AGENT_TOKEN_BUDGETS,
+    TOKEN_BUDGET_DEGRADE_RATIO,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    REASONING_RPM,
+    REASONING_TPM,
+    BASIC_RPM,
+    BASIC_TPM,
+    VL_RPM,
+    VL_TPM,
+    CHEAP_RPM,
+    CHEAP_TPM,
+    LLM_RATE_LIMIT_MAX_BACKOFF,
+    LLM_HEDGE_DELAY,
+    LLM_HEDGE_MIN_DELAY,
+    AGENT_MAX_ITERATIONS,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_CONCURRENCY_LIMITS,
+    TOOL_SEQUENTIAL,
+    COORDINATOR_CLASSIFIER_PATH,
+    COORDINATOR_CLASSIFIER_THRESHOLD,
+    COORDINATOR_CLASSIFIER_SHADOW_RATE,
+    COORDINATOR_DECISION_LOG,
 )
 from .tools import TAVILY_MAX_RESULTS
 
@@ -32,8 +92,67 @@ __all__ = [
     "VL_MODEL",
     "VL_BASE_URL",
     "VL_API_KEY",
+    # Cheaper LLM
+    "CHEAP_MODEL",
+    "CHEAP_BASE_URL",
+    "CHEAP_API_KEY",
     # Other configurations
     "TEAM_MEMBERS",
     "TAVILY_MAX_RESULTS",
     "CHROME_INSTANCE_PATH",
+    "TAVILY_BASE_URL",
+    "JINA_BASE_URL",
+    "FAN_OUT_ENABLED",
+    "MAX_PARALLEL_STEPS",
+    "PLANNER_EARLY_DISPATCH",
+    "SUPERVISOR_STREAM_ROUTING",
+    "CONTEXT_TOKEN_BUDGET",
+    "CONTEXT_SUMMARIZE",
+    "CHECKPOINT_ENABLED",
+    "CHECKPOINT_DB_PATH",
+    "CHECKPOINT_RETENTION_HOURS",
+    "LLM_CACHE_ENABLED",
+    "LLM_CACHE_PATH",
+    "LLM_CACHE_TTL_HOURS",
+    "LLM_CACHE_MAX_MB",
+    "LLM_CACHE_AGENTS",
+    "SEARCH_CACHE_ENABLED",
+    "SEARCH_CACHE_PATH",
+    "SEARCH_CACHE_TTL_HOURS",
+    "SEARCH_CACHE_MAX_MB",
+    "SSE_COALESCE_WINDOW_MS",
+    "SSE_COALESCE_MAX_CHARS",
+    "SSE_DISCONNECT_CHECK_INTERVAL",
+    "WORKFLOW_JOB_BUFFER_SIZE",
+    "WORKFLOW_JOB_RETENTION_SECONDS",
+    "WORKFLOW_MAX_CONCURRENT",
+    "WORKFLOW_MAX_QUEUE",
+    "WORKFLOW_TOKEN_BUDGET",
+    "AGENT_TOKEN_BUDGETS",
+    "TOKEN_BUDGET_DEGRADE_RATIO",
+    "HTTP_MAX_CONNECTIONS",
+    "HTTP_MAX_KEEPALIVE_CONNECTIONS",
+    "HTTP_KEEPALIVE_EXPIRY",
+    "HTTP2_ENABLED",
+    "HTTP_CONNECT_TIMEOUT",
+    "HTTP_READ_TIMEOUT",
+    "REASONING_RPM",
+    "REASONING_TPM",
+    "BASIC_RPM",
+    "BASIC_TPM",
+    "VL_RPM",
+    "VL_TPM",
+    "CHEAP_RPM",
+    "CHEAP_TPM",
+    "LLM_RATE_LIMIT_MAX_BACKOFF",
+    "LLM_HEDGE_DELAY",
+    "LLM_HEDGE_MIN_DELAY",
+    "AGENT_MAX_ITERATIONS",
+    "TOOL_MAX_CONCURRENCY",
+    "TOOL_CONCURRENCY_LIMITS",
+    "TOOL_SEQUENTIAL",
+    "COORDINATOR_CLASSIFIER_PATH",
+    "COORDINATOR_CLASSIFIER_THRESHOLD",
+    "COORDINATOR_CLASSIFIER_SHADOW_RATE",
+    "COORDINATOR_DECISION_LOG",
 ]
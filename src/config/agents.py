@@ -1,15 +1,38 @@
 from typing import Literal
 
 # Define available LLM types
-LLMType = Literal["basic", "reasoning", "vision"]
+LLMType = Literal["basic", "reasoning", "vision", "cheap"]
 
 # Define agent-LLM mapping
-AGENT_LLM_MAP: dict[str, LLMType] = {
-    "coordinator": "basic",  # 协调默认使用basic llm
-    "planner": "reasoning",  # 计划默认使用basic llm
-    "supervisor": "basic",  # 决策使用basic llm
-    "researcher": "basic",  # 简单搜索任务使用basic llm
-    "coder": "basic",  # 编程任务使用basic llm
-    "browser": "vision",  # 浏览器操作使用vision llm
-    "reporter": "basic",  # 编写报告使用basic llm
+# 每个Agent按顺序配置一组LLM：第一个是主模型，出错时依次切换到后面的模型；
+# 设置了LLM_HEDGE_DELAY时，主模型迟迟没有返回首个token会并发请求下一个（对冲请求，
+# reasoning不参与对冲），见src/agents/llm_router.py。与前面模型和地址相同的类型会被忽略
+AGENT_LLM_MAP: dict[str, list[LLMType]] = {
+    "coordinator": ["basic", "cheap"],  # 协调默认使用basic llm
+    "planner": ["reasoning", "basic"],  # 深度思考模式使用reasoning llm，否则去掉reasoning
+    "supervisor": ["basic", "cheap"],  # 决策使用basic llm
+    "researcher": ["basic", "cheap"],  # 简单搜索任务使用basic llm
+    "coder": ["basic", "cheap"],  # 编程任务使用basic llm
+    "browser": ["vision"],  # 浏览器操作使用vision llm
+    "reporter": ["basic", "cheap"],  # 编写报告使用basic llm
 }
+
+# 用量接近Token预算时Agent改用的更便宜的模型；vision没有替代，保持不变
+DEGRADED_LLM_MAP: dict[LLMType, LLMType] = {
+    "reasoning": "basic",
+    "basic": "cheap",
+}
+
+# 限流排队时各Agent的LLM调用优先级，数值越小越先发送：
+# 协调员和监督员的调用决定用户多快看到进展，报告撰写等批量调用可以稍后
+AGENT_PRIORITIES: dict[str, int] = {
+    "coordinator": 0,
+    "supervisor": 0,
+    "planner": 1,
+    "researcher": 2,
+    "coder": 2,
+    "browser": 2,
+    "reporter": 3,
+}
+# 不在图节点中或未列出的调用使用的优先级
+DEFAULT_PRIORITY = 2
@@ -19,5 +19,133 @@ VL_MODEL = os.getenv("VL_MODEL", "gpt-4o")
 VL_BASE_URL = os.getenv("VL_BASE_URL")
 VL_API_KEY = os.getenv("VL_API_KEY")
 
+# Cheaper LLM configuration (used once a workflow nears its token budget; defaults to the basic LLM settings)
+CHEAP_MODEL = os.getenv("CHEAP_MODEL") or BASIC_MODEL
+CHEAP_BASE_URL = os.getenv("CHEAP_BASE_URL") or BASIC_BASE_URL
+CHEAP_API_KEY = os.getenv("CHEAP_API_KEY") or BASIC_API_KEY
+
 # Chrome Instance configuration
 CHROME_INSTANCE_PATH = os.getenv("CHROME_INSTANCE_PATH")
+
+# Tool provider endpoints (point them at benchmarks/mock_providers.py to run offline)
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+JINA_BASE_URL = os.getenv("JINA_BASE_URL", "https://r.jina.ai/")
+
+# Workflow configuration
+# Dispatch independent researcher/browser plan steps concurrently (plan-driven routing only)
+FAN_OUT_ENABLED = os.getenv("FAN_OUT_ENABLED", "false").lower() == "true"
+MAX_PARALLEL_STEPS = int(os.getenv("MAX_PARALLEL_STEPS", "3"))
+# Start a researcher/browser first plan step while the planner is still streaming later steps
+PLANNER_EARLY_DISPATCH = os.getenv("PLANNER_EARLY_DISPATCH", "false").lower() == "true"
+# Stream the supervisor's decision and route as soon as its `next` value is unambiguous,
+# cancelling the rest of the generation
+SUPERVISOR_STREAM_ROUTING = os.getenv("SUPERVISOR_STREAM_ROUTING", "false").lower() == "true"
+
+# Per-agent context window: token budget for the history passed to each agent (0 disables)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+# Replace history that does not fit the budget with an incremental LLM summary
+CONTEXT_SUMMARIZE = os.getenv("CONTEXT_SUMMARIZE", "false").lower() == "true"
+
+# Durable checkpointing: persist workflow state per workflow_id so runs can be resumed
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "false").lower() == "true"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+CHECKPOINT_RETENTION_HOURS = float(os.getenv("CHECKPOINT_RETENTION_HOURS", "72"))
+
+# Opt-in LLM response cache for deterministic (temperature=0) calls
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "24"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+# Graph nodes whose LLM calls may be served from the cache
+LLM_CACHE_AGENTS = [
+    agent.strip()
+    for agent in os.getenv("LLM_CACHE_AGENTS", "coordinator,supervisor,planner").split(",")
+    if agent.strip()
+]
+
+# Opt-in search result cache with request coalescing for the Tavily search tool
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "false").lower() == "true"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite")
+SEARCH_CACHE_TTL_HOURS = float(os.getenv("SEARCH_CACHE_TTL_HOURS", "1"))
+SEARCH_CACHE_MAX_MB = float(os.getenv("SEARCH_CACHE_MAX_MB", "64"))
+
+# SSE streaming: merge consecutive message deltas within a time window (0 disables)
+SSE_COALESCE_WINDOW_MS = float(os.getenv("SSE_COALESCE_WINDOW_MS", "30"))
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "2048"))
+# Seconds between client disconnect checks while streaming
+SSE_DISCONNECT_CHECK_INTERVAL = float(os.getenv("SSE_DISCONNECT_CHECK_INTERVAL", "0.5"))
+
+# Background workflow jobs (/api/workflows): per-run event buffer and retention.
+# Concurrent runs are bounded by WORKFLOW_MAX_CONCURRENT, shared with /api/chat/stream.
+WORKFLOW_JOB_BUFFER_SIZE = int(os.getenv("WORKFLOW_JOB_BUFFER_SIZE", "4096"))
+WORKFLOW_JOB_RETENTION_SECONDS = float(os.getenv("WORKFLOW_JOB_RETENTION_SECONDS", "900"))
+
+# Admission control: concurrently running workflows (0 = unlimited) and the bounded wait queue
+WORKFLOW_MAX_CONCURRENT = int(os.getenv("WORKFLOW_MAX_CONCURRENT", "0"))
+WORKFLOW_MAX_QUEUE = int(os.getenv("WORKFLOW_MAX_QUEUE", "32"))
+
+# Token budgets: per request (0 = unlimited) and per agent ("researcher=50000,coder=30000")
+WORKFLOW_TOKEN_BUDGET = int(os.getenv("WORKFLOW_TOKEN_BUDGET", "0"))
+AGENT_TOKEN_BUDGETS = {
+    agent.strip(): int(limit)
+    for agent, _, limit in (
+        item.partition("=") for item in os.getenv("AGENT_TOKEN_BUDGETS", "").split(",")
+    )
+    if agent.strip() and limit.strip()
+}
+# Switch agents to cheaper models once this share of a budget is used (1 disables)
+TOKEN_BUDGET_DEGRADE_RATIO = float(os.getenv("TOKEN_BUDGET_DEGRADE_RATIO", "0.8"))
+
+# Shared HTTP connection pools of the LLM clients, one per backend origin
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+# Read/write/pool timeout; reasoning models may think for minutes before the first token
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "600"))
+
+# Process-wide rate limits per LLM type: requests and prompt tokens per minute (0 = unlimited)
+REASONING_RPM = float(os.getenv("REASONING_RPM", "0"))
+REASONING_TPM = float(os.getenv("REASONING_TPM", "0"))
+BASIC_RPM = float(os.getenv("BASIC_RPM", "0"))
+BASIC_TPM = float(os.getenv("BASIC_TPM", "0"))
+VL_RPM = float(os.getenv("VL_RPM", "0"))
+VL_TPM = float(os.getenv("VL_TPM", "0"))
+CHEAP_RPM = float(os.getenv("CHEAP_RPM", "0"))
+CHEAP_TPM = float(os.getenv("CHEAP_TPM", "0"))
+# Longest pause of an LLM type's calls after its backend answers 429
+LLM_RATE_LIMIT_MAX_BACKOFF = float(os.getenv("LLM_RATE_LIMIT_MAX_BACKOFF", "60"))
+
+# Hedged LLM requests (opt-in): seconds without a first token before the next backend in
+# AGENT_LLM_MAP is called as well. 0 disables hedging; failover on errors stays on.
+# Once enough calls are measured the delay drops to the backend's p95, but not below the minimum.
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "0"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+
+# Agent tool loop: model turns per agent step, and concurrent calls per tool within one turn.
+# Calls to the sequential tools (side effects) run alone, in the order the model issued them.
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "15"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+# Per-tool overrides of TOOL_MAX_CONCURRENCY ("tavily_search=2,read_file=8")
+TOOL_CONCURRENCY_LIMITS = {
+    tool.strip(): int(limit)
+    for tool, _, limit in (
+        item.partition("=") for item in os.getenv("TOOL_CONCURRENCY_LIMITS", "").split(",")
+    )
+    if tool.strip() and limit.strip()
+}
+TOOL_SEQUENTIAL = [
+    tool.strip()
+    for tool in os.getenv("TOOL_SEQUENTIAL", "write_file,python_repl_tool,browser").split(",")
+    if tool.strip()
+]
+
+# Coordinator intent pre-classifier (python -m src.graph.train_intent train): model path (empty disables),
+# confidence threshold, and the share of confident decisions still checked against the LLM
+COORDINATOR_CLASSIFIER_PATH = os.getenv("COORDINATOR_CLASSIFIER_PATH", "")
+COORDINATOR_CLASSIFIER_THRESHOLD = float(os.getenv("COORDINATOR_CLASSIFIER_THRESHOLD", "0.9"))
+COORDINATOR_CLASSIFIER_SHADOW_RATE = float(os.getenv("COORDINATOR_CLASSIFIER_SHADOW_RATE", "0.05"))
+# JSON Lines log of the coordinator LLM's decisions, the classifier's training data (empty disables)
+COORDINATOR_DECISION_LOG = os.getenv("COORDINATOR_DECISION_LOG", "")
@@ -3,6 +3,8 @@ import os
 
 import requests
 
+from src.config import JINA_BASE_URL
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,5 +21,5 @@ class JinaClient:
                 "Jina API key is not set. Provide your own key to access a higher rate limit. See https://jina.ai/reader for more information."
             )
         data = {"url": url}
-        response = requests.post("https://r.jina.ai/", headers=headers, json=data)
+        response = requests.post(JINA_BASE_URL, headers=headers, json=data)
         return response.text
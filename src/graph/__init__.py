@@ -1,5 +1,7 @@
 from .builder import build_graph
+from .checkpoint import SqliteCheckpointSaver
 
 __all__ = [
     "build_graph",
+    "SqliteCheckpointSaver",
 ]
@@ -0,0 +1,151 @@
+"""
+单次工作流的Token用量统计与预算控制。
+
+TokenBudget作为回调挂在工作流的config上，读取图中每一次LLM调用返回的用量，
+按所在的节点(Agent)累计；同时放在config["configurable"]中，节点可以随时查询：
+
+1. 用量超过预算的一定比例后，Agent改用更便宜的模型（见DEGRADED_LLM_MAP）；
+2. 整个请求的预算用尽后，监督员不再调用LLM，直接交给reporter总结已有结果，随后结束；
+3. 某个Agent的预算用尽后，监督员不再派发给它，改为交给reporter或结束。
+"""
+
+import threading
+from typing import Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import ensure_config
+
+from src.metrics import closed_stream_usage, estimate_prompt_tokens, llm_token_usage
+
+# 工作流的TokenBudget在config["configurable"]中的键
+CONFIG_KEY_TOKEN_BUDGET = "token_budget"
+
+
+def _empty_usage() -> dict:
+    return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+class TokenBudget(BaseCallbackHandler):
+    """
+    累计一个工作流的Token用量，并判断请求和各Agent的预算是否即将或已经用尽。
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        limit: int = 0,
+        agent_limits: Optional[dict[str, int]] = None,
+        degrade_ratio: float = 0.8,
+        usage: Optional[dict] = None,
+    ):
+        """
+        @param {int} limit - 整个请求的Token预算，0表示不限制。
+        @param {dict|None} agent_limits - 各Agent的Token预算，未列出的Agent不限制。
+        @param {float} degrade_ratio - 用量达到预算的该比例后改用更便宜的模型，1及以上表示不降级。
+        @param {dict|None} usage - 之前累计的用量（usage()的返回值），恢复工作流时传入。
+        """
+        self.limit = limit
+        self.agent_limits = dict(agent_limits or {})
+        self.degrade_ratio = degrade_ratio
+        self.total = _empty_usage()
+        self.agents: dict[str, dict] = {}
+        self.actions: list[str] = []
+        if usage:
+            self.total.update({key: usage.get(key, 0) for key in self.total})
+            self.agents = {agent: dict(counts) for agent, counts in usage.get("agents", {}).items()}
+            self.actions = list(usage.get("budget_actions", []))
+        # run_id -> (Agent, 估算的提示词token数)
+        self._runs: dict[UUID, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[dict], prompts: list):
+        agent = (metadata or {}).get("langgraph_node", "unknown")
+        prompt_tokens = estimate_prompt_tokens(prompts)
+        with self._lock:
+            self._runs[run_id] = (agent, prompt_tokens)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata, [message for batch in messages for message in batch])
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata, prompts)
+
+    def _add(self, agent: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            for counts in (self.total, self.agents.setdefault(agent, _empty_usage())):
+                counts["input_tokens"] += input_tokens
+                counts["output_tokens"] += output_tokens
+                counts["total_tokens"] += input_tokens + output_tokens
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        with self._lock:
+            agent, _ = self._runs.pop(run_id, ("unknown", 0))
+        self._add(agent, *llm_token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        # 提前关闭的流（如监督员提前路由）没有返回用量，按估算值计入预算
+        if run is not None and isinstance(error, GeneratorExit):
+            agent, prompt_tokens = run
+            self._add(agent, *closed_stream_usage(prompt_tokens, kwargs.get("response")))
+
+    def used(self, agent: Optional[str] = None) -> int:
+        """@returns {int} 整个请求或某个Agent已经使用的Token数。"""
+        with self._lock:
+            counts = self.total if agent is None else self.agents.get(agent, _empty_usage())
+            return counts["total_tokens"]
+
+    def _limit(self, agent: Optional[str]) -> int:
+        return self.limit if agent is None else self.agent_limits.get(agent, 0)
+
+    def exhausted(self, agent: Optional[str] = None) -> bool:
+        """
+        @param {str|None} agent - Agent名称，None表示整个请求。
+        @returns {bool} 预算是否已经用尽。
+        """
+        limit = self._limit(agent)
+        return limit > 0 and self.used(agent) >= limit
+
+    def degraded(self, agent: str) -> bool:
+        """
+        @param {str} agent - Agent名称。
+        @returns {bool} 请求或该Agent的用量是否已达到降级比例，应改用更便宜的模型。
+        """
+        if self.degrade_ratio >= 1:
+            return False
+        return any(
+            limit > 0 and self.used(scope) >= limit * self.degrade_ratio
+            for scope, limit in ((None, self.limit), (agent, self._limit(agent)))
+        )
+
+    def record_action(self, action: str):
+        """记录一次因预算而采取的动作（降级、改派、结束），同一动作只记录一次。"""
+        with self._lock:
+            if action not in self.actions:
+                self.actions.append(action)
+
+    def usage(self) -> dict:
+        """
+        @returns {dict} 用量快照：请求的输入/输出/总Token数、各Agent的用量、预算和已采取的预算动作。
+        """
+        with self._lock:
+            return {
+                **self.total,
+                "agents": {agent: dict(counts) for agent, counts in self.agents.items()},
+                "limit": self.limit,
+                "agent_limits": dict(self.agent_limits),
+                "budget_actions": list(self.actions),
+            }
+
+
+def current_budget() -> Optional[TokenBudget]:
+    """
+    获取调用方所在工作流的TokenBudget，不在工作流中或未启用统计时返回None。
+
+    @returns {TokenBudget|None} 当前工作流的预算。
+    """
+    return ensure_config().get("configurable", {}).get(CONFIG_KEY_TOKEN_BUDGET)
@@ -1,26 +1,69 @@
-from langgraph.graph import StateGraph, START
+from functools import partial
+from typing import Callable, Optional
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.utils.runnable import RunnableCallable
+
+from src.config import TEAM_MEMBERS, MAX_PARALLEL_STEPS
 from .types import State
 from .nodes import (
     supervisor_node,
+    asupervisor_node,
     research_node,
+    aresearch_node,
     code_node,
+    acode_node,
     coordinator_node,
+    acoordinator_node,
     browser_node,
+    abrowser_node,
     reporter_node,
+    areporter_node,
     planner_node,
+    aplanner_node,
 )
+from src.tools.decorators import track_node
+
+
+def _dual_node(name: str, func: Callable, afunc: Callable) -> RunnableCallable:
+    """
+    将同步与异步两个版本的节点函数合并为一个节点。
+
+    graph.invoke()（src/workflow.py）走同步版本；graph.astream_events()/ainvoke()
+    （FastAPI服务）走异步版本，不再占用线程池中的工作线程。
+    两个版本都经过track_node包装，记录节点耗时与错误次数。
+
+    @param {str} name - 节点名称。
+    @param {Callable} func - 同步节点函数。
+    @param {Callable} afunc - 异步节点函数。
+    @returns {RunnableCallable} 同时支持同步和异步调用的节点。
+    """
+    tracker = track_node(name)
+    return RunnableCallable(tracker(func), tracker(afunc), name=name, trace=False)
+
 
 # 构建工作流图
-def build_graph():
+def build_graph(
+    fan_out: bool = False,
+    max_parallel_steps: int = MAX_PARALLEL_STEPS,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
     """
     构建并返回Agent工作流图。
 
     这个函数定义了整个Agent团队的工作流程结构，包括所有成员（节点）
     以及他们之间的基本连接关系。
 
+    @param {bool} fan_out - 是否启用并发派发。启用后，在计划路由模式下监督员会把
+                            计划中连续、相互独立的researcher/browser步骤同时派发执行。
+    @param {int} max_parallel_steps - 并发派发时一次最多同时执行的步骤数。
+    @param {BaseCheckpointSaver|None} checkpointer - 检查点保存器。提供时每次运行都需要在
+                            config中指定thread_id（即workflow_id），中断后可按该id恢复。
     @returns {CompiledGraph} 编译好的、可执行的LangGraph图实例。
     """
+    parallel = max(max_parallel_steps, 1) if fan_out else 1
+
     # 初始化一个状态图，状态的结构由State类定义
     builder = StateGraph(State)
 
@@ -28,15 +71,47 @@ def build_graph():
     builder.add_edge(START, "coordinator")
 
     # 向图中添加各个Agent节点
-    # 每个节点都对应一个在nodes.py中定义的函数
-    builder.add_node("coordinator", coordinator_node)  # 协调员：与用户初步沟通，决定是否启动规划
-    builder.add_node("planner", planner_node)  # 规划师：制定详细的行动计划
-    builder.add_node("supervisor", supervisor_node)  # 监督员：决策中枢，决定下一步由谁执行
-    builder.add_node("researcher", research_node)  # 研究员：执行研究任务
-    builder.add_node("coder", code_node)  # 程序员：编写和执行代码
-    builder.add_node("browser", browser_node)  # 浏览器：执行网页浏览任务
-    builder.add_node("reporter", reporter_node)  # 报告员：撰写最终报告
+    # 每个节点都同时注册了同步和异步两个实现，destinations用于绘制图中的跳转关系
+    builder.add_node(
+        "coordinator",
+        _dual_node("coordinator", coordinator_node, acoordinator_node),
+        destinations=("planner", END),
+    )  # 协调员：与用户初步沟通，决定是否启动规划
+    builder.add_node(
+        "planner",
+        _dual_node("planner", planner_node, aplanner_node),
+        destinations=("supervisor", END),
+    )  # 规划师：制定详细的行动计划
+    builder.add_node(
+        "supervisor",
+        _dual_node(
+            "supervisor",
+            partial(supervisor_node, max_parallel_steps=parallel),
+            partial(asupervisor_node, max_parallel_steps=parallel),
+        ),
+        destinations=(*TEAM_MEMBERS, END),
+    )  # 监督员：决策中枢，决定下一步由谁执行
+    builder.add_node(
+        "researcher",
+        _dual_node("researcher", research_node, aresearch_node),
+        destinations=("supervisor",),
+    )  # 研究员：执行研究任务
+    builder.add_node(
+        "coder",
+        _dual_node("coder", code_node, acode_node),
+        destinations=("supervisor",),
+    )  # 程序员：编写和执行代码
+    builder.add_node(
+        "browser",
+        _dual_node("browser", browser_node, abrowser_node),
+        destinations=("supervisor",),
+    )  # 浏览器：执行网页浏览任务
+    builder.add_node(
+        "reporter",
+        _dual_node("reporter", reporter_node, areporter_node),
+        destinations=("supervisor",),
+    )  # 报告员：撰写最终报告
 
     # 编译图，使其成为一个可执行的对象
     # 注意：这里的路由逻辑是隐式的，在每个节点函数内部通过返回的Command对象的goto字段来指定，每个节点之间的跳转关系。
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
@@ -0,0 +1,397 @@
+"""
+基于本地SQLite文件的持久化Checkpointer。
+
+每个工作流以workflow_id作为LangGraph的thread_id保存检查点。进程重启或某个节点
+崩溃后，可以从最后一个完成的节点继续执行，已经完成的LLM和工具调用不会重复付费。
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from src.config import CHECKPOINT_DB_PATH, CHECKPOINT_RETENTION_HOURS
+
+logger = logging.getLogger(__name__)
+
+# 序列化结果超过该字节数时使用zlib压缩
+COMPRESS_THRESHOLD = 1024
+_ZLIB_SUFFIX = "+zlib"
+
+# 每写入多少个检查点执行一次过期清理
+GC_EVERY_PUTS = 200
+
+_SCHEMA = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS workflow_runs (
+    thread_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workflow_runs_updated_at ON workflow_runs (updated_at);
+"""
+
+_SELECT_CHECKPOINT = (
+    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+    "metadata_type, metadata FROM checkpoints "
+)
+_WRITES_INSERT = (
+    "INTO writes "
+    "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph检查点保存器，数据保存在本地SQLite文件中。
+
+    - 检查点和中间写入使用图默认的序列化器，较大的数据再经zlib压缩；
+    - 元数据中冗余的`writes`字段不保存（它们已经包含在检查点的通道值里）；
+    - workflow_runs表记录每个工作流的最后更新时间，超过保留期的工作流会被定期清理。
+
+    同步方法直接访问数据库；异步方法在线程中执行，避免阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        retention_hours: float = CHECKPOINT_RETENTION_HOURS,
+    ):
+        """
+        @param {str} path - SQLite文件路径，":memory:"表示仅保存在内存中。
+        @param {float} retention_hours - 工作流检查点的保留时长（小时），0表示永久保留。
+        """
+        super().__init__()
+        self.path = path
+        self.retention_hours = retention_hours
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.Lock()
+        self._puts = 0
+        self.gc()
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                yield cur
+                self.conn.commit()
+            finally:
+                cur.close()
+
+    def _dumps(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) > COMPRESS_THRESHOLD:
+            return type_ + _ZLIB_SUFFIX, zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.endswith(_ZLIB_SUFFIX):
+            type_, data = type_.removesuffix(_ZLIB_SUFFIX), zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.cursor() as cur:
+            if checkpoint_id := get_checkpoint_id(config):
+                cur.execute(
+                    _SELECT_CHECKPOINT
+                    + "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cur.execute(
+                    _SELECT_CHECKPOINT + "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(cur, thread_id, checkpoint_ns, *row)
+
+    def _to_tuple(
+        self,
+        cur: sqlite3.Cursor,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        type_: str,
+        checkpoint: bytes,
+        metadata_type: str,
+        metadata: bytes,
+    ) -> CheckpointTuple:
+        cur.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        pending_writes = [
+            (task_id, channel, self._loads(value_type, value))
+            for task_id, channel, value_type, value in cur.fetchall()
+        ]
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            self._loads(type_, checkpoint),
+            self._loads(metadata_type, metadata),
+            (
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes,
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                item = self._to_tuple(cur, thread_id, checkpoint_ns, *row)
+                if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                results.append(item)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        metadata = get_checkpoint_metadata(config, metadata)
+        # 通道值已经包含了这些写入，不再重复保存
+        metadata.pop("writes", None)
+        type_, data = self._dumps(checkpoint)
+        metadata_type, metadata_data = self._dumps(metadata)
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, "
+                "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, "
+                "metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                ),
+            )
+            cur.execute(
+                "INSERT INTO workflow_runs (thread_id, created_at, updated_at) "
+                "VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (thread_id, now, now),
+            )
+        self._puts += 1
+        if self._puts % GC_EVERY_PUTS == 0:
+            self.gc()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # 特殊通道（如错误、中断）的写入覆盖旧值，普通写入只保留第一次
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        verb = "INSERT OR REPLACE " if replace else "INSERT OR IGNORE "
+        query = verb + _WRITES_INSERT
+        with self.cursor() as cur:
+            cur.executemany(
+                query,
+                [
+                    (
+                        str(config["configurable"]["thread_id"]),
+                        config["configurable"].get("checkpoint_ns", ""),
+                        str(config["configurable"]["checkpoint_id"]),
+                        task_id,
+                        WRITES_IDX_MAP.get(channel, idx),
+                        channel,
+                        *self._dumps(value),
+                    )
+                    for idx, (channel, value) in enumerate(writes)
+                ],
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.cursor() as cur:
+            for table in ("checkpoints", "writes", "workflow_runs"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),)
+                )
+
+    def gc(self, retention_hours: Optional[float] = None) -> int:
+        """
+        删除超过保留期没有更新的工作流的所有检查点。
+
+        @param {float|None} retention_hours - 保留时长（小时），None时使用实例配置，0表示不清理。
+        @returns {int} 被删除的工作流数量。
+        """
+        retention_hours = (
+            self.retention_hours if retention_hours is None else retention_hours
+        )
+        if not retention_hours or retention_hours <= 0:
+            return 0
+        cutoff = time.time() - retention_hours * 3600
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT thread_id FROM workflow_runs WHERE updated_at < ?", (cutoff,)
+            )
+            expired = [(thread_id,) for (thread_id,) in cur.fetchall()]
+            for table in ("checkpoints", "writes", "workflow_runs"):
+                cur.executemany(f"DELETE FROM {table} WHERE thread_id = ?", expired)
+        if expired:
+            logger.info(f"清理了{len(expired)}个过期工作流的检查点")
+        return len(expired)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
@@ -0,0 +1,238 @@
+"""
+按Token预算为每个Agent构建历史消息视图。
+
+State.messages只会不断增长，越到后面的步骤，发给Agent的历史越长，而其中大部分
+与当前Agent无关。这里在不修改共享状态的前提下，为每个Agent生成一份精简的历史：
+
+1. 固定保留用户请求和规划师的计划；
+2. 只保留与当前Agent相关的其他Agent的输出；
+3. 最近的几条输出完整保留，更早的输出截断；
+4. 预算仍然不够时，丢弃最早的输出，并可选地用增量摘要代替它们。
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.agents.llm import get_llm_by_type
+from src.config import CONTEXT_TOKEN_BUDGET, CONTEXT_SUMMARIZE
+
+logger = logging.getLogger(__name__)
+
+# 每个Agent需要看到哪些Agent的输出
+RELEVANT_SOURCES: dict[str, set[str]] = {
+    "researcher": {"researcher", "browser"},
+    "browser": {"researcher", "browser"},
+    "coder": {"researcher", "browser", "coder"},
+    "reporter": {"researcher", "browser", "coder", "reporter"},
+    "supervisor": {"researcher", "browser", "coder", "reporter"},
+}
+
+# 始终保留的消息来源（规划师的计划）
+PINNED_SOURCES = {"planner"}
+
+# 最近的几条相关输出完整保留
+RECENT_FULL_MESSAGES = 2
+
+# 更早的输出截断后保留的Token数
+TRUNCATED_MESSAGE_TOKENS = 400
+
+# 剩余预算少于该值时不再截断塞入，直接丢弃
+MIN_PARTIAL_TOKENS = 64
+
+TRUNCATION_NOTICE = "\n\n[... truncated ...]"
+
+SUMMARY_PROMPT = (
+    "Summarize the following outputs of other agents for a teammate who will continue "
+    "the task. Keep facts, numbers, URLs and conclusions; drop formatting.\n\n{}"
+)
+
+# 摘要缓存：key为被摘要消息序列的哈希，value为摘要文本。用于增量摘要，
+# 新溢出的消息只需与上一次的摘要合并，而不必从头重新摘要。
+_SUMMARY_CACHE_SIZE = 256
+_summary_cache: OrderedDict[str, str] = OrderedDict()
+
+
+def _name(message) -> Optional[str]:
+    if isinstance(message, BaseMessage):
+        return message.name
+    if isinstance(message, dict):
+        return message.get("name")
+    return None
+
+
+def _text(message) -> str:
+    content = message.content if isinstance(message, BaseMessage) else message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return "\n".join(
+        item.get("text", "") for item in content if isinstance(item, dict)
+    )
+
+
+def estimate_tokens(message) -> int:
+    """
+    粗略估算一条消息的Token数（约4个字符一个Token，另加消息本身的开销）。
+    只用于预算分配，不需要精确。
+
+    @param {BaseMessage|dict} message - 消息对象或字典。
+    @returns {int} 估算的Token数。
+    """
+    return len(_text(message)) // 4 + 4
+
+
+def _truncate(message, max_tokens: int):
+    """返回截断后的消息副本；消息本身不超过限制时原样返回。"""
+    text = _text(message)
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return message
+    return HumanMessage(content=text[:max_chars] + TRUNCATION_NOTICE, name=_name(message))
+
+
+def _digest(messages: list) -> str:
+    sha = hashlib.sha256()
+    for message in messages:
+        sha.update((_name(message) or "").encode())
+        sha.update(_text(message).encode())
+    return sha.hexdigest()
+
+
+def _select(messages: list, agent_name: str, token_budget: int) -> tuple[list, list, list]:
+    """
+    在预算内挑选消息。
+
+    @returns {tuple} (pinned, kept, overflow)。pinned为用户请求和计划；kept为按原顺序
+                     保留（可能已截断）的相关输出；overflow为因预算不足被丢弃的相关输出。
+    """
+    sources = RELEVANT_SOURCES.get(agent_name)
+    pinned, candidates = [], []
+    for message in messages:
+        name = _name(message)
+        if name is None or name in PINNED_SOURCES:
+            # 没有name的消息来自用户的原始输入
+            pinned.append(message)
+        elif sources is None or name in sources:
+            candidates.append(message)
+
+    remaining = token_budget - sum(estimate_tokens(m) for m in pinned)
+    kept = []
+    overflow_end = 0
+    for position in range(len(candidates) - 1, -1, -1):
+        message = candidates[position]
+        if len(kept) >= RECENT_FULL_MESSAGES:
+            message = _truncate(message, TRUNCATED_MESSAGE_TOKENS)
+        cost = estimate_tokens(message)
+        if cost > remaining and remaining >= MIN_PARTIAL_TOKENS:
+            # 剩余预算不足以放下整条消息时，截断到剩余预算内
+            message = _truncate(message, remaining - MIN_PARTIAL_TOKENS // 4)
+            cost = estimate_tokens(message)
+        if cost > remaining:
+            overflow_end = position + 1
+            break
+        remaining -= cost
+        kept.append(message)
+    kept.reverse()
+    return pinned, kept, candidates[:overflow_end]
+
+
+def _summary_inputs(overflow: list) -> tuple[str, Optional[str], list]:
+    """
+    找到已经摘要过的最长前缀，返回(完整key, 前缀摘要, 尚未摘要的消息)。
+    """
+    key = _digest(overflow)
+    if key in _summary_cache:
+        return key, _summary_cache[key], []
+    for end in range(len(overflow) - 1, 0, -1):
+        prefix_key = _digest(overflow[:end])
+        if prefix_key in _summary_cache:
+            return key, _summary_cache[prefix_key], overflow[end:]
+    return key, None, overflow
+
+
+def _summary_prompt(previous: Optional[str], pending: list) -> str:
+    parts = [f"Summary so far:\n{previous}"] if previous else []
+    parts += [f"{_name(m)}:\n{_text(m)}" for m in pending]
+    return SUMMARY_PROMPT.format("\n\n".join(parts))
+
+
+def _remember(key: str, summary: str) -> str:
+    _summary_cache[key] = summary
+    _summary_cache.move_to_end(key)
+    while len(_summary_cache) > _SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+    return summary
+
+
+def _summary_message(summary: str) -> HumanMessage:
+    return HumanMessage(
+        content=f"Summary of earlier agent outputs:\n\n{summary}", name="context_summary"
+    )
+
+
+def _resolve(token_budget: Optional[int], summarize: Optional[bool]) -> tuple[int, bool]:
+    return (
+        CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget,
+        CONTEXT_SUMMARIZE if summarize is None else summarize,
+    )
+
+
+def build_agent_context(
+    state: dict,
+    agent_name: str,
+    token_budget: Optional[int] = None,
+    summarize: Optional[bool] = None,
+) -> list:
+    """
+    为指定Agent构建预算内的历史消息。
+
+    @param {State} state - 当前工作流的共享状态。
+    @param {str} agent_name - 将要接收这些消息的Agent。
+    @param {int|None} token_budget - Token预算，None时使用CONTEXT_TOKEN_BUDGET，0表示不限制。
+    @param {bool|None} summarize - 是否用摘要代替被丢弃的输出，None时使用CONTEXT_SUMMARIZE。
+    @returns {list} 可直接作为Agent输入的消息列表。
+    """
+    token_budget, summarize = _resolve(token_budget, summarize)
+    if token_budget <= 0:
+        return state["messages"]
+
+    pinned, kept, overflow = _select(state["messages"], agent_name, token_budget)
+    if overflow:
+        logger.debug(f"{agent_name}的上下文超出预算，丢弃了{len(overflow)}条较早的输出")
+    if not (overflow and summarize):
+        return pinned + kept
+
+    key, previous, pending = _summary_inputs(overflow)
+    summary = previous
+    if pending:
+        response = get_llm_by_type("basic").invoke(_summary_prompt(previous, pending))
+        summary = _remember(key, response.content)
+    return pinned + [_summary_message(summary)] + kept
+
+
+async def abuild_agent_context(
+    state: dict,
+    agent_name: str,
+    token_budget: Optional[int] = None,
+    summarize: Optional[bool] = None,
+) -> list:
+    """build_agent_context的异步版本，摘要时不阻塞事件循环。"""
+    token_budget, summarize = _resolve(token_budget, summarize)
+    if token_budget <= 0:
+        return state["messages"]
+
+    pinned, kept, overflow = _select(state["messages"], agent_name, token_budget)
+    if overflow:
+        logger.debug(f"{agent_name}的上下文超出预算，丢弃了{len(overflow)}条较早的输出")
+    if not (overflow and summarize):
+        return pinned + kept
+
+    key, previous, pending = _summary_inputs(overflow)
+    summary = previous
+    if pending:
+        response = await get_llm_by_type("basic").ainvoke(_summary_prompt(previous, pending))
+        summary = _remember(key, response.content)
+    return pinned + [_summary_message(summary)] + kept
@@ -0,0 +1,336 @@
+"""
+协调员的本地意图预分类器。
+
+协调员的LLM调用只为判断是否输出handoff_to_planner。大部分请求一眼就能分辨：
+问候和闲聊，或者需要调研、编程的任务。IntentClassifier在CPU上用哈希n-gram特征和
+逻辑回归给出移交规划师的概率，足够确定时直接跳转到planner或用模板回复，
+不确定时仍交给LLM。模型从协调员LLM的历史决策日志中训练：
+
+    python -m src.graph.train_intent train \
+        --log coordinator_decisions.jsonl --out coordinator_intent.npz
+    python -m src.graph.train_intent evaluate \
+        --log coordinator_decisions.jsonl --model coordinator_intent.npz
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.config import (
+    COORDINATOR_CLASSIFIER_PATH,
+    COORDINATOR_CLASSIFIER_THRESHOLD,
+    COORDINATOR_DECISION_LOG,
+)
+
+logger = logging.getLogger(__name__)
+
+# 预分类器的两种结论：移交规划师，或由协调员直接回复
+INTENT_PLANNER = "planner"
+INTENT_REPLY = "reply"
+
+# 特征哈希空间的默认维度
+DEFAULT_DIM = 1 << 18
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_CJK = re.compile(r"[㐀-鿿]")
+
+# 置信地判断为直接回复时使用的模板，按用户的语言选择。
+# 只做自我介绍并询问任务，问候、闲聊和需要婉拒的请求都适用。
+REPLY_TEMPLATES = {
+    "zh": (
+        "你好！我是 Langmanus，可以帮你调研资料、编写和运行代码、浏览网页。"
+        "请告诉我你想完成什么任务？"
+    ),
+    "en": (
+        "Hello! I'm Langmanus. I can research topics, write and run code, "
+        "and browse the web for you. What would you like me to do?"
+    ),
+}
+
+
+def template_reply(text: str) -> str:
+    """
+    @param {str} text - 用户的消息。
+    @returns {str} 与用户语言一致的模板回复。
+    """
+    return REPLY_TEMPLATES["zh" if _CJK.search(text) else "en"]
+
+
+def text_features(text: str, dim: int = DEFAULT_DIM) -> dict[int, float]:
+    """
+    把文本转换为哈希后的稀疏特征：字符1~3-gram（中文不分词也能用）和单词1~2-gram，L2归一化。
+    使用crc32而不是hash()，保证不同进程中的特征一致。
+
+    @param {str} text - 用户的消息。
+    @param {int} dim - 哈希空间的维度。
+    @returns {dict} 特征下标 -> 特征值。
+    """
+    text = " ".join(text.lower().split())
+    words = _WORD.findall(text)
+    grams = [f"c:{text[i:i + n]}" for n in (1, 2, 3) for i in range(len(text) - n + 1)]
+    grams += [f"w:{word}" for word in words]
+    grams += [f"w:{a} {b}" for a, b in zip(words, words[1:])]
+    features: dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % dim
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = sum(value * value for value in features.values()) ** 0.5
+    if not norm:
+        return features
+    return {index: value / norm for index, value in features.items()}
+
+
+def _feature_arrays(features: dict[int, float]) -> tuple[np.ndarray, np.ndarray]:
+    """@returns {tuple} 稀疏特征的(下标数组, 特征值数组)。"""
+    count = len(features)
+    indexes = np.fromiter(features.keys(), dtype=np.int64, count=count)
+    return indexes, np.fromiter(features.values(), dtype=float, count=count)
+
+
+class IntentClassifier:
+    """哈希特征上的逻辑回归，输出用户消息需要移交规划师的概率。"""
+
+    def __init__(
+        self,
+        dim: int = DEFAULT_DIM,
+        threshold: float = COORDINATOR_CLASSIFIER_THRESHOLD,
+    ):
+        """
+        @param {int} dim - 哈希空间的维度。
+        @param {float} threshold - 置信阈值：概率不低于它时移交规划师，不高于1-threshold时直接回复。
+        """
+        self.dim = dim
+        self.threshold = threshold
+        self.weights = np.zeros(dim)
+        self.bias = 0.0
+
+    def probability(self, text: str) -> float:
+        """
+        @param {str} text - 用户的消息。
+        @returns {float} 需要移交规划师的概率。
+        """
+        return float(1.0 / (1.0 + np.exp(-self._score(text_features(text, self.dim)))))
+
+    def _score(self, features: dict[int, float]) -> float:
+        indexes, values = _feature_arrays(features)
+        return self.bias + float(self.weights[indexes] @ values)
+
+    def classify(self, text: str) -> Optional[str]:
+        """
+        @param {str} text - 用户的消息。
+        @returns {str|None} INTENT_PLANNER或INTENT_REPLY；不够确定时为None，应交给LLM判断。
+        """
+        probability = self.probability(text)
+        if probability >= self.threshold:
+            return INTENT_PLANNER
+        if probability <= 1 - self.threshold:
+            return INTENT_REPLY
+        return None
+
+    def fit(
+        self,
+        examples: list[tuple[str, bool]],
+        epochs: int = 20,
+        learning_rate: float = 2.0,
+        l2: float = 1e-6,
+        seed: int = 0,
+    ) -> "IntentClassifier":
+        """
+        用随机梯度下降训练。
+
+        @param {list} examples - (用户消息, LLM是否移交规划师)。
+        @param {int} epochs - 训练轮数。
+        @param {float} learning_rate - 初始学习率，随轮数衰减。
+        @param {float} l2 - L2正则系数。
+        @param {int} seed - 打乱样本顺序的随机种子。
+        @returns {IntentClassifier} 自身。
+        """
+        rng = random.Random(seed)
+        samples = [
+            (text_features(text, self.dim), 1.0 if handoff else 0.0)
+            for text, handoff in examples
+        ]
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch)
+            for features, label in samples:
+                indexes, values = _feature_arrays(features)
+                gradient = 1.0 / (1.0 + np.exp(-self._score(features))) - label
+                self.weights[indexes] -= rate * (
+                    gradient * values + l2 * self.weights[indexes]
+                )
+                self.bias -= rate * gradient
+        return self
+
+    def save(self, path: str):
+        """保存为npz文件，只保存非零权重。"""
+        indexes = np.flatnonzero(self.weights)
+        np.savez_compressed(
+            path,
+            dim=self.dim,
+            threshold=self.threshold,
+            bias=self.bias,
+            indexes=indexes,
+            values=self.weights[indexes],
+        )
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "IntentClassifier":
+        """
+        @param {str} path - save保存的npz文件。
+        @param {float|None} threshold - 覆盖训练时保存的置信阈值。
+        @returns {IntentClassifier} 加载的分类器。
+        """
+        with np.load(path) as data:
+            classifier = cls(
+                int(data["dim"]),
+                float(data["threshold"] if threshold is None else threshold),
+            )
+            classifier.bias = float(data["bias"])
+            classifier.weights[data["indexes"]] = data["values"]
+        return classifier
+
+
+def user_text(state: dict) -> str:
+    """
+    @param {dict} state - 工作流状态。
+    @returns {str} 最后一条用户消息的文本，预分类器据此判断。
+    """
+    for message in reversed(state.get("messages", [])):
+        if isinstance(message, dict):
+            role, content = message.get("role"), message.get("content")
+        else:
+            role = getattr(message, "type", None)
+            content = getattr(message, "content", None)
+        if role in ("user", "human") and isinstance(content, str):
+            return content
+    return ""
+
+
+class DecisionLog:
+    """以JSON Lines格式追加记录协调员LLM的决策，作为预分类器的训练数据。"""
+
+    def __init__(self, path: str):
+        """@param {str} path - 日志文件路径。"""
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, text: str, handoff: bool, latency: float):
+        """
+        @param {str} text - 用户的消息。
+        @param {bool} handoff - LLM是否移交规划师。
+        @param {float} latency - LLM调用耗时（秒）。
+        """
+        line = json.dumps(
+            {
+                "text": text,
+                "handoff": handoff,
+                "latency": round(latency, 4),
+                "time": time.time(),
+            },
+            ensure_ascii=False,
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as log:
+            log.write(line + "\n")
+
+
+def read_decisions(path: str) -> list[dict]:
+    """
+    @param {str} path - DecisionLog的日志文件。
+    @returns {list} 日志中的决策记录，跳过无法解析的行。
+    """
+    decisions = []
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            try:
+                decision = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(decision, dict) and decision.get("text"):
+                decisions.append(decision)
+    return decisions
+
+
+def evaluate(classifier: IntentClassifier, decisions: Iterable[dict]) -> dict:
+    """
+    以LLM的决策为准评估预分类器。
+
+    @param {IntentClassifier} classifier - 预分类器。
+    @param {Iterable} decisions - read_decisions返回的决策记录。
+    @returns {dict} 覆盖率（置信判断的比例）、置信判断中与LLM不一致的比例、
+                    分类耗时、LLM平均耗时以及平均每个请求节省的时间。
+    """
+    total = covered = disagreements = 0
+    classify_seconds = llm_seconds = 0.0
+    llm_calls = 0
+    for decision in decisions:
+        started = time.perf_counter()
+        intent = classifier.classify(decision["text"])
+        classify_seconds += time.perf_counter() - started
+        total += 1
+        if decision.get("latency") is not None:
+            llm_seconds += decision["latency"]
+            llm_calls += 1
+        if intent is None:
+            continue
+        covered += 1
+        disagreements += (intent == INTENT_PLANNER) != bool(decision["handoff"])
+    llm_latency = llm_seconds / llm_calls if llm_calls else 0.0
+    classify_latency = classify_seconds / total if total else 0.0
+    # 置信的请求省去LLM调用，每个请求都多花一次分类的时间
+    saved = (covered / total) * llm_latency - classify_latency if total else 0.0
+    return {
+        "examples": total,
+        "coverage": round(covered / total, 4) if total else 0.0,
+        "disagreement_rate": round(disagreements / covered, 4) if covered else 0.0,
+        "classify_ms": round(classify_latency * 1000, 3),
+        "llm_ms": round(llm_latency * 1000, 1),
+        "saved_ms_per_request": round(saved * 1000, 1),
+    }
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_loaded = False
+_decision_log: Optional[DecisionLog] = None
+_load_lock = threading.Lock()
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """
+    @returns {IntentClassifier|None} 按COORDINATOR_CLASSIFIER_PATH加载的预分类器；
+                                     未配置或加载失败时为None，协调员只使用LLM。
+    """
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        with _load_lock:
+            if not _classifier_loaded and COORDINATOR_CLASSIFIER_PATH:
+                try:
+                    _classifier = IntentClassifier.load(
+                        COORDINATOR_CLASSIFIER_PATH, COORDINATOR_CLASSIFIER_THRESHOLD
+                    )
+                    logger.info(f"已加载协调员预分类器: {COORDINATOR_CLASSIFIER_PATH}")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"协调员预分类器加载失败，只使用LLM: {e}")
+            _classifier_loaded = True
+    return _classifier
+
+
+def set_intent_classifier(classifier: Optional[IntentClassifier]):
+    """替换进程内的预分类器，None表示停用。"""
+    global _classifier, _classifier_loaded
+    _classifier, _classifier_loaded = classifier, True
+
+
+def get_decision_log() -> Optional[DecisionLog]:
+    """@returns {DecisionLog|None} 按COORDINATOR_DECISION_LOG创建的决策日志，未配置时为None。"""
+    global _decision_log
+    if _decision_log is None and COORDINATOR_DECISION_LOG:
+        _decision_log = DecisionLog(COORDINATOR_DECISION_LOG)
+    return _decision_log
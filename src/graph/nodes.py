@@ -1,49 +1,173 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import logging
 import json
+import random
+import time
+import uuid
 from copy import deepcopy
-from typing import Literal
+from typing import Literal, Optional
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config, var_child_runnable_config
 from langchain_core.messages import HumanMessage
-from langgraph.types import Command
+from langgraph.types import Command, Send
 from langgraph.graph import END
-
-from src.agents import research_agent, coder_agent, browser_agent
-from src.agents.llm import get_llm_by_type
-from src.config import TEAM_MEMBERS
-from src.config.agents import AGENT_LLM_MAP
+from langgraph.constants import TAG_NOSTREAM
+
+from src.agents import research_agent, coder_agent, browser_agent, get_agent_variant
+from src.agents.llm import LLM_ENDPOINTS, get_llm_by_types
+from src.config import (
+    TEAM_MEMBERS,
+    PLANNER_EARLY_DISPATCH,
+    SUPERVISOR_STREAM_ROUTING,
+    COORDINATOR_CLASSIFIER_SHADOW_RATE,
+)
+from src.config.agents import AGENT_LLM_MAP, DEGRADED_LLM_MAP, LLMType
+from src.metrics import (
+    coordinator_intent_checks,
+    coordinator_intent_decisions,
+    coordinator_time_saved,
+    llm_duration,
+)
 from src.prompts.template import apply_prompt_template
 from src.tools.search import tavily_tool
-from src.tools.decorators import track_node
-from .types import State, Router
+from .types import State, Router, OPTIONS
+from .plan import (
+    route_from_plan,
+    parse_plan,
+    parallel_step_group,
+    PlanStreamParser,
+    PlanParseError,
+    PARALLEL_AGENTS,
+)
+from .context import build_agent_context, abuild_agent_context
+from .budget import current_budget
+from .route_stream import StreamingRouter
+from .intent import (
+    INTENT_PLANNER,
+    get_decision_log,
+    get_intent_classifier,
+    template_reply,
+    user_text,
+)
 
 logger = logging.getLogger(__name__)
 
 # 定义一个标准的消息格式，用于将Agent的执行结果包装后添加到状态中
 RESPONSE_FORMAT = "Response from {}:\n\n<response>\n{}\n</response>\n\n*Please execute the next step.*"
 
+# 并发派发计划步骤时，告知每个Agent它负责的是哪一步
+STEP_FORMAT = "Execute only step {} of the plan: {}\n\n{}"
 
-def research_node(state: State) -> Command[Literal["supervisor"]]:
+
+def _agent_input(state: State, agent_name: str) -> dict:
     """
-    研究员Agent节点。负责执行研究任务。
+    构造Agent的输入：按Token预算裁剪后的历史消息。并发派发时state中带有plan_step，
+    需要明确告诉Agent只执行这一步，否则多个同类Agent看到相同的历史会重复执行同一个步骤。
 
-    @param {State} state - 当前工作流的共享状态。
-    @returns {Command} 一个命令对象，包含状态更新和下一个节点的名称。
-                       固定将流程交回给'supervisor'。
+    @param {State} state - 节点收到的状态（并发派发时为Send携带的状态）。
+    @param {str} agent_name - 接收输入的Agent。
+    @returns {dict} Agent的输入。
+    """
+    return {
+        "messages": _with_step(state, build_agent_context(state, agent_name)),
+        **_prompt_time(state),
+    }
+
+
+async def _aagent_input(state: State, agent_name: str) -> dict:
+    """_agent_input的异步版本。"""
+    return {
+        "messages": _with_step(state, await abuild_agent_context(state, agent_name)),
+        **_prompt_time(state),
+    }
+
+
+def _prompt_time(state: State) -> dict:
+    """工作流开始时固定的CURRENT_TIME，使Agent的系统Prompt在整个工作流中保持不变。"""
+    return {"CURRENT_TIME": state["CURRENT_TIME"]} if state.get("CURRENT_TIME") else {}
+
+
+def _with_step(state: State, messages: list) -> list:
+    step = state.get("plan_step")
+    if not step:
+        return messages
+    return messages + [
+        HumanMessage(
+            content=STEP_FORMAT.format(
+                step["index"] + 1, step.get("title", ""), step.get("description", "")
+            ),
+            name="supervisor",
+        )
+    ]
+
+
+def _degraded_llm_type(llm_type: LLMType) -> LLMType:
+    """
+    @param {LLMType} llm_type - 原来的LLM类型。
+    @returns {LLMType} 降级后的类型；降级后仍是同一个模型和地址（如未单独配置CHEAP_MODEL）时保持原类型。
+    """
+    degraded = DEGRADED_LLM_MAP.get(llm_type, llm_type)
+    if LLM_ENDPOINTS.get(degraded) == LLM_ENDPOINTS.get(llm_type):
+        return llm_type
+    return degraded
+
+
+def _llm_types(agent_name: str, llm_types: tuple[LLMType, ...] | None = None) -> tuple[LLMType, ...]:
+    """
+    Agent本次调用按顺序使用的LLM类型：用量接近请求或该Agent的Token预算时降级为更便宜的模型。
+
+    @param {str} agent_name - Agent名称。
+    @param {tuple|None} llm_types - 默认的LLM类型列表，不提供时取AGENT_LLM_MAP中的配置。
+    @returns {tuple} 实际使用的LLM类型，去掉了重复项。
+    """
+    llm_types = tuple(llm_types or AGENT_LLM_MAP[agent_name])
+    budget = current_budget()
+    if budget is None or not budget.degraded(agent_name):
+        return llm_types
+    degraded = tuple(dict.fromkeys(_degraded_llm_type(llm_type) for llm_type in llm_types))
+    if degraded != llm_types:
+        budget.record_action(f"degraded:{agent_name}")
+        logger.info(f"Token用量接近预算，{agent_name}改用{'/'.join(degraded)}模型")
+    return degraded
+
+
+def _agent_llm(agent_name: str):
+    """获取Agent本次调用使用的LLM，见_llm_types。"""
+    return get_llm_by_types(_llm_types(agent_name))
+
+
+def _agent_executor(agent_name: str, default):
+    """
+    获取Agent本次调用使用的ToolCallingAgent，需要降级时换成使用更便宜模型的版本。
+
+    @param {str} agent_name - Agent名称。
+    @param {ToolCallingAgent} default - 使用默认LLM的Agent。
+    @returns {ToolCallingAgent} 本次调用使用的Agent。
+    """
+    llm_types = _llm_types(agent_name)
+    if llm_types == tuple(AGENT_LLM_MAP[agent_name]):
+        return default
+    return get_agent_variant(agent_name, llm_types)
+
+
+def _agent_command(agent_name: str, output: str) -> Command[Literal["supervisor"]]:
+    """
+    将Agent的执行结果包装为标准消息，并把流程交回给'supervisor'。
+
+    @param {str} agent_name - Agent名称，同时作为消息的name。
+    @param {str} output - Agent返回的'output'字段。
+    @returns {Command} 包含状态更新并跳转到'supervisor'的命令对象。
     """
-    logger.info("研究员Agent开始执行任务")
-    result = research_agent.invoke({"messages": state["messages"]}) # 调用AgentExecutor的invoke方法执行Agent
-    logger.info("研究员Agent完成任务")
-    logger.debug(f"研究员Agent的响应: {result['output']}")
-    # 返回一个Command，更新messages状态，并将流程固定地交给supervisor
     return Command(
         update={
             "messages": [
                 HumanMessage(
-                    content=RESPONSE_FORMAT.format(
-                        "researcher", result["output"]
-                    ),
-                    name="researcher",
+                    content=RESPONSE_FORMAT.format(agent_name, output),
+                    name=agent_name,
                 )
             ]
         },
@@ -51,6 +175,33 @@ def research_node(state: State) -> Command[Literal["supervisor"]]:
     )
 
 
+def research_node(state: State) -> Command[Literal["supervisor"]]:
+    """
+    研究员Agent节点。负责执行研究任务。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {Command} 一个命令对象，包含状态更新和下一个节点的名称。
+                       固定将流程交回给'supervisor'。
+    """
+    logger.info("研究员Agent开始执行任务")
+    agent = _agent_executor("researcher", research_agent)
+    result = agent.invoke(_agent_input(state, "researcher")) # 调用Agent的invoke方法，执行模型与工具调用的循环
+    logger.info("研究员Agent完成任务")
+    logger.debug(f"研究员Agent的响应: {result['output']}")
+    # 返回一个Command，更新messages状态，并将流程固定地交给supervisor
+    return _agent_command("researcher", result["output"])
+
+
+async def aresearch_node(state: State) -> Command[Literal["supervisor"]]:
+    """research_node的异步版本，使用ainvoke避免阻塞事件循环。"""
+    logger.info("研究员Agent开始执行任务")
+    agent = _agent_executor("researcher", research_agent)
+    result = await agent.ainvoke(await _aagent_input(state, "researcher"))
+    logger.info("研究员Agent完成任务")
+    logger.debug(f"研究员Agent的响应: {result['output']}")
+    return _agent_command("researcher", result["output"])
+
+
 def code_node(state: State) -> Command[Literal["supervisor"]]:
     """
     程序员Agent节点。负责执行Python代码生成和执行任务。
@@ -60,22 +211,21 @@ def code_node(state: State) -> Command[Literal["supervisor"]]:
                        固定将流程交回给'supervisor'。
     """
     logger.info("程序员Agent开始执行任务")
-    result = coder_agent.invoke({"messages": state["messages"]})
+    agent = _agent_executor("coder", coder_agent)
+    result = agent.invoke(_agent_input(state, "coder"))
     logger.info("程序员Agent完成任务")
     logger.debug(f"程序员Agent的响应: {result['output']}")
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=RESPONSE_FORMAT.format(
-                        "coder", result["output"]
-                    ),
-                    name="coder",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    return _agent_command("coder", result["output"])
+
+
+async def acode_node(state: State) -> Command[Literal["supervisor"]]:
+    """code_node的异步版本。"""
+    logger.info("程序员Agent开始执行任务")
+    agent = _agent_executor("coder", coder_agent)
+    result = await agent.ainvoke(await _aagent_input(state, "coder"))
+    logger.info("程序员Agent完成任务")
+    logger.debug(f"程序员Agent的响应: {result['output']}")
+    return _agent_command("coder", result["output"])
 
 
 def browser_node(state: State) -> Command[Literal["supervisor"]]:
@@ -87,50 +237,240 @@ def browser_node(state: State) -> Command[Literal["supervisor"]]:
                        固定将流程交回给'supervisor'。
     """
     logger.info("浏览器Agent开始执行任务")
-    result = browser_agent.invoke({"messages": state["messages"]})
+    agent = _agent_executor("browser", browser_agent)
+    result = agent.invoke(_agent_input(state, "browser"))
     logger.info("浏览器Agent完成任务")
     logger.debug(f"浏览器Agent的响应: {result['output']}")
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=RESPONSE_FORMAT.format(
-                        "browser", result["output"]
-                    ),
-                    name="browser",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    return _agent_command("browser", result["output"])
 
 
-def supervisor_node(state: State) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
+async def abrowser_node(state: State) -> Command[Literal["supervisor"]]:
+    """browser_node的异步版本。"""
+    logger.info("浏览器Agent开始执行任务")
+    agent = _agent_executor("browser", browser_agent)
+    result = await agent.ainvoke(await _aagent_input(state, "browser"))
+    logger.info("浏览器Agent完成任务")
+    logger.debug(f"浏览器Agent的响应: {result['output']}")
+    return _agent_command("browser", result["output"])
+
+
+def supervisor_node(
+    state: State, max_parallel_steps: int = 1
+) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
     """
     监督员Agent节点，是整个工作流的决策中枢。
     它根据当前的状态决定下一步应该由哪个Agent执行，或者结束流程。
 
     @param {State} state - 当前工作流的共享状态。
+    @param {int} max_parallel_steps - 计划路由模式下最多并发派发的独立步骤数，1表示不并发。
     @returns {Command} 一个命令对象，不更新状态，但指定了下一个要跳转的节点名称。
     """
     logger.info("监督员正在评估下一步行动")
-    # 应用supervisor的prompt模板
-    messages = apply_prompt_template("supervisor", state)
+    # 请求的Token预算已用尽时不再调用LLM，交给reporter总结后结束
+    if command := _budget_stop_command(state):
+        return command
+    # 计划路由模式下，计划明确时直接按计划派发，跳过LLM调用
+    goto, fallback_reason = _plan_route(state)
+    if goto is not None:
+        return _plan_command(goto, state, max_parallel_steps)
+
+    # 应用supervisor的prompt模板，历史消息按Token预算裁剪
+    messages = apply_prompt_template(
+        "supervisor", {**state, "messages": build_agent_context(state, "supervisor")}
+    )
 
     # 调用一个具有结构化输出能力的LLM，强制其返回Router格式的决策
-    # .with_structured_output(Router) 是最关键的一步。它强制要求 LLM 的输出必须符合预定义的 Router Pydantic 模型格式。
+    # .with_structured_output(Router)（由_supervisor_llm构建并缓存）是最关键的一步。它强制要求 LLM 的输出必须符合预定义的 Router Pydantic 模型格式。
     # 这保证了决策结果的稳定性和可靠性，是构建健壮 Agent 的最佳实践。
     # .invoke(messages) 将准备好的 Prompt 发送给 LLM，并获取返回的、已经自动解析为 Router 对象的 response。
-    response = (
-        get_llm_by_type(AGENT_LLM_MAP["supervisor"])
-        .with_structured_output(Router)
-        .invoke(messages)
+    # 启用SUPERVISOR_STREAM_ROUTING时流式读取，next的取值一确定就返回并取消剩余的生成。
+    response = _supervisor_llm().invoke(messages)
+    logger.debug(f"当前状态的消息: {state['messages']}")
+    return _supervisor_command(response, state, fallback_reason=fallback_reason)
+
+
+async def asupervisor_node(
+    state: State, max_parallel_steps: int = 1
+) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
+    """supervisor_node的异步版本。"""
+    logger.info("监督员正在评估下一步行动")
+    if command := _budget_stop_command(state):
+        return command
+    goto, fallback_reason = _plan_route(state)
+    if goto is not None:
+        return _plan_command(goto, state, max_parallel_steps)
+
+    messages = apply_prompt_template(
+        "supervisor",
+        {**state, "messages": await abuild_agent_context(state, "supervisor")},
     )
-    # 获取决策结果
-    goto = response["next"]
+    response = await _supervisor_llm().ainvoke(messages)
     logger.debug(f"当前状态的消息: {state['messages']}")
+    return _supervisor_command(response, state, fallback_reason=fallback_reason)
+
+
+# 缓存监督员的结构化输出Runnable：id(llm) -> (llm, runnable)。LLM实例本身已被缓存，
+# 但with_structured_output每次都会重新生成工具Schema并构建新的Runnable。
+# 预算降级时监督员会换用另一个LLM，因此按LLM实例分别缓存。
+_supervisor_routers: dict[int, tuple] = {}
+
+
+def _supervisor_llm():
+    """
+    获取绑定了Router结构化输出的监督员LLM。底层LLM实例变化时重新构建。
+
+    @returns {Runnable|StreamingRouter} 输出Router的Runnable，启用SUPERVISOR_STREAM_ROUTING时为StreamingRouter。
+    """
+    llm = _agent_llm("supervisor")
+    cached = _supervisor_routers.get(id(llm))
+    if cached is None or cached[0] is not llm:
+        structured = llm.with_structured_output(Router)
+        # 监督员的输出是路由决策，不流式发送给前端；带上该标签后astream_events可直接过滤掉它的事件
+        if SUPERVISOR_STREAM_ROUTING:
+            router = StreamingRouter(structured, OPTIONS, tags=[TAG_NOSTREAM])
+        else:
+            router = structured.with_config(tags=[TAG_NOSTREAM])
+        cached = _supervisor_routers[id(llm)] = (llm, router)
+    return cached[1]
+
+
+def _budget_fallback(state: State, budget) -> str:
+    """
+    预算不允许继续派发时的去向：reporter还没有总结过就交给reporter，否则结束。
+
+    @param {State} state - 当前工作流的共享状态。
+    @param {TokenBudget} budget - 当前工作流的预算。
+    @returns {str} 'reporter'或'FINISH'。
+    """
+    messages = state.get("messages") or []
+    last_agent = getattr(messages[-1], "name", None) if messages else None
+    if last_agent == "reporter" or budget.exhausted("reporter"):
+        return "FINISH"
+    return "reporter"
+
+
+def _budget_stop_command(state: State) -> Command | None:
+    """
+    请求的Token预算已用尽时，直接生成交给reporter或结束的命令。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {Command|None} 预算未用尽时为None。
+    """
+    budget = current_budget()
+    if budget is None or not budget.exhausted():
+        return None
+    return _supervisor_command({"next": _budget_fallback(state, budget)}, state, budget_stop=True)
+
+
+def _budget_redirect(goto: str, state: State) -> str:
+    """
+    目标Agent的Token预算已用尽时改派给reporter或结束。
+
+    @param {str} goto - 监督员的决策。
+    @param {State} state - 当前工作流的共享状态。
+    @returns {str} 修正后的决策。
+    """
+    budget = current_budget()
+    if budget is None or goto == "FINISH" or not budget.exhausted(goto):
+        return goto
+    fallback = _budget_fallback(state, budget)
+    budget.record_action(f"redirected:{goto}->{fallback}")
+    logger.info(f"{goto}的Token预算已用尽，改派给{fallback}")
+    return fallback
+
+
+def _budget_limits(agents) -> bool:
+    """请求或其中某个Agent的Token预算是否已用尽。"""
+    budget = current_budget()
+    return budget is not None and (budget.exhausted() or any(map(budget.exhausted, agents)))
+
+
+def _plan_route(state: State) -> tuple:
+    """
+    计划路由模式下尝试按计划决定下一步。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {tuple} (next, fallback_reason)。不处于计划路由模式时两者均为None。
+    """
+    if state.get("routing_mode") != "plan":
+        return None, None
+    goto, fallback_reason = route_from_plan(state)
+    if fallback_reason:
+        logger.warning(f"无法按计划路由({fallback_reason})，回退到LLM监督员")
+    return goto, fallback_reason
+
+
+def _plan_command(
+    goto: str, state: State, max_parallel_steps: int
+) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
+    """
+    生成按计划路由的命令。允许并发时，会把从当前步骤开始的一组相互独立的
+    researcher/browser步骤通过Send同时派发出去。LangGraph按Send的顺序合并各分支
+    写入的消息，因此结果总是按计划顺序追加到State.messages中。
+
+    @param {str} goto - route_from_plan给出的下一个Agent或'FINISH'。
+    @param {State} state - 当前工作流的共享状态。
+    @param {int} max_parallel_steps - 最多并发派发的步骤数。
+    @returns {Command} 路由命令。
+    """
+    group = []
+    # 预算受限时逐步派发，以便每一步都经过预算检查
+    if goto != "FINISH" and max_parallel_steps > 1 and not _budget_limits(PARALLEL_AGENTS):
+        group = parallel_step_group(state, max_parallel_steps)
+    if len(group) <= 1:
+        return _supervisor_command({"next": goto}, state, routed_steps=1)
+
+    steps = parse_plan(state["full_plan"])
+    logger.info(f"监督员并发派发计划步骤: {[i + 1 for i in group]}")
+    command = _supervisor_command({"next": goto}, state, routed_steps=len(group))
+    return Command(
+        goto=[
+            Send(steps[i]["agent_name"], {**state, "plan_step": {**steps[i], "index": i}})
+            for i in group
+        ],
+        update=command.update,
+    )
+
+
+def _supervisor_command(
+    response: Router,
+    state: State,
+    routed_steps: int = 0,
+    fallback_reason: str | None = None,
+    budget_stop: bool = False,
+) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
+    """
+    将监督员的Router决策转换为路由命令，并更新本次运行的路由统计和Token用量。
+
+    @param {Router} response - 路由决策（来自LLM结构化输出或计划）。
+    @param {State} state - 当前工作流的共享状态。
+    @param {int} routed_steps - 决策直接来自计划时（即省去了一次LLM调用），本次派发的计划步骤数。
+    @param {str|None} fallback_reason - 计划路由回退到LLM的原因，回退后本次运行不再使用计划路由。
+    @param {bool} budget_stop - 决策是因为请求的Token预算用尽而做出的，没有调用LLM。
+    @returns {Command} 只包含路由指令的命令对象。
+    """
+    # 获取决策结果，目标Agent的预算已用尽时改派
+    goto = _budget_redirect(response["next"], state)
     logger.debug(f"监督员的决策: {response}")
 
+    routing_stats = {"llm_calls": 0, "llm_calls_avoided": 0, **(state.get("routing_stats") or {})}
+    update = {"routing_stats": routing_stats}
+    budget = current_budget()
+    if budget is not None:
+        if budget_stop:
+            budget.record_action(f"workflow_budget_exhausted:{goto}")
+            logger.info(f"请求的Token预算已用尽({budget.used()}/{budget.limit})，转到: {goto}")
+        update["token_usage"] = budget.usage()
+    if routed_steps:
+        routing_stats["llm_calls_avoided"] += 1
+        update["plan_step_index"] = (state.get("plan_step_index") or 0) + routed_steps
+        update["plan_dispatch_size"] = routed_steps
+    elif not budget_stop:
+        routing_stats["llm_calls"] += 1
+    if fallback_reason:
+        routing_stats["fallback_reason"] = fallback_reason
+        update["routing_mode"] = "llm"
+
     # 如果决策是'FINISH'，则将流程导向结束节点'__end__'
     if goto == "FINISH":
         goto = "__end__"
@@ -139,14 +479,11 @@ def supervisor_node(state: State) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
         logger.info(f"监督员指派任务给: {goto}")
 
     # 返回只包含路由指令的Command
-    return Command(goto=goto, update={"next": goto})
+    return Command(goto=goto, update={"next": goto, **update})
 
 # 规划师Agent节点，负责将用户的模糊意图或高级目标，转换成一个详细、具体、结构化的行动计划。
 # 根据用户的初始请求，并可选地结合实时搜索结果和更强的思考模型，生成一个机器可读的、分步的 JSON 格式行动计划。
 # 它是将用户需求转化为具体执行步骤的关键第一步。
-
-# @track_node("planner"): 一个自定义装饰器，可能用于日志记录、性能监控或调试，以追踪此节点的执行情况。
-@track_node("planner")
 def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
     """
     规划师Agent节点。负责根据用户意图生成详细的、结构化的行动计划。
@@ -155,12 +492,7 @@ def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
     @returns {Command} 一个命令对象，更新状态（添加计划），并指定下一步跳转到'supervisor'或'__end__'。
     """
     logger.info("规划师正在生成完整计划")
-    messages = apply_prompt_template("planner", state)
-
-    # 根据是否启用'deep_thinking_mode'选择不同能力的LLM，(basic, reasoning，vision三种llm模型)
-    llm = get_llm_by_type("basic")
-    if state.get("deep_thinking_mode"):
-        llm = get_llm_by_type("reasoning")
+    llm, messages = _planner_inputs(state)
 
     # 如果需要，在规划前先进行网络搜索
     # 这是另一个强大的可选功能。如果启用了该选项，节点会先调用搜索引擎工具 `tavily_tool`。
@@ -168,36 +500,186 @@ def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
     # 而不是仅仅依赖其内部知识，从而大大提高了计划的相关性和准确性。
     if state.get("search_before_planning"):
         searched_content = tavily_tool.invoke({"query": state["messages"][-1]["content"]})
-        messages = deepcopy(messages)
-        messages[-1]["content"] += f"\n\n# Relative Search Results\n\n{json.dumps([{'title': elem['title'], 'content': elem['content']} for elem in searched_content if elem.get('content')], ensure_ascii=False)}"
-    
-    #  调用LLM，生成计划
-    stream = llm.stream(messages)
-    full_response = ""
-    for chunk in stream:
-        full_response += chunk.content
+        messages = _with_search_results(messages, searched_content)
+
+    #  调用LLM，生成计划。边接收边增量解析，结构出错时立即停止生成
+    parser = PlanStreamParser()
+    try:
+        for chunk in llm.stream(messages):
+            for step in parser.feed(chunk.content):
+                _dispatch_plan_step(parser, step)
+    except PlanParseError as e:
+        return _planner_abort(parser, e)
     logger.debug(f"当前状态的消息: {state['messages']}")
-    logger.debug(f"规划师的响应: {full_response}")
+    return _planner_command(parser)
+
+
+async def aplanner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
+    """planner_node的异步版本，搜索与LLM流式输出均不阻塞事件循环。"""
+    logger.info("规划师正在生成完整计划")
+    llm, messages = _planner_inputs(state)
+
+    if state.get("search_before_planning"):
+        searched_content = await tavily_tool.ainvoke(
+            {"query": state["messages"][-1]["content"]}
+        )
+        messages = _with_search_results(messages, searched_content)
+
+    parser = PlanStreamParser()
+    early_step = None
+    try:
+        async for chunk in llm.astream(messages):
+            for step in parser.feed(chunk.content):
+                await _adispatch_plan_step(parser, step)
+                if early_step is None and _can_dispatch_early(state, parser):
+                    early_step = _start_early_step(state, step)
+        logger.debug(f"当前状态的消息: {state['messages']}")
+        return await _planner_acommand(parser, early_step)
+    except PlanParseError as e:
+        return _planner_abort(parser, e)
+    finally:
+        # 规划师出错、计划无效或节点被取消时，提前执行的步骤不再需要，等它真正停下
+        if early_step is not None and not early_step.done():
+            early_step.cancel()
+            await asyncio.gather(early_step, return_exceptions=True)
+
+
+def _planner_inputs(state: State) -> tuple:
+    """
+    准备规划师使用的LLM和Prompt消息。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {tuple} (llm, messages)
+    """
+    messages = apply_prompt_template("planner", state)
+
+    # 根据是否启用'deep_thinking_mode'选择不同能力的LLM，(basic, reasoning，vision三种llm模型)
+    # 未启用时从配置的模型列表中去掉reasoning
+    llm_types = tuple(AGENT_LLM_MAP["planner"])
+    if not state.get("deep_thinking_mode"):
+        llm_types = tuple(llm_type for llm_type in llm_types if llm_type != "reasoning") or ("basic",)
+    return get_llm_by_types(_llm_types("planner", llm_types)), messages
+
+
+def _with_search_results(messages: list, searched_content: list) -> list:
+    """将搜索结果追加到最后一条消息中，返回新的消息列表，不修改原始状态。"""
+    messages = deepcopy(messages)
+    messages[-1]["content"] += f"\n\n# Relative Search Results\n\n{json.dumps([{'title': elem['title'], 'content': elem['content']} for elem in searched_content if elem.get('content')], ensure_ascii=False)}"
+    return messages
+
+
+def _plan_step_event(parser: PlanStreamParser, step: dict) -> dict:
+    return {"index": len(parser.steps) - 1, "step": step}
+
+
+def _dispatch_plan_step(parser: PlanStreamParser, step: dict):
+    """计划中的一个步骤刚生成完毕，以自定义事件的形式通知前端。"""
+    logger.debug(f"规划师完成了第{len(parser.steps)}步: {step}")
+    dispatch_custom_event("plan_step", _plan_step_event(parser, step))
+
+
+async def _adispatch_plan_step(parser: PlanStreamParser, step: dict):
+    """_dispatch_plan_step的异步版本。"""
+    logger.debug(f"规划师完成了第{len(parser.steps)}步: {step}")
+    await adispatch_custom_event("plan_step", _plan_step_event(parser, step))
+
+
+def _can_dispatch_early(state: State, parser: PlanStreamParser) -> bool:
+    """
+    判断计划的第一步能否在规划师仍在生成后续步骤时提前执行。
+    只有启用PLANNER_EARLY_DISPATCH、处于计划路由模式，且第一步是只读的
+    researcher/browser步骤时才提前执行，否则监督员会按自己的判断重复派发该步骤。
+    """
+    return (
+        PLANNER_EARLY_DISPATCH
+        and state.get("routing_mode") == "plan"
+        and len(parser.steps) == 1
+        and parser.steps[0].get("agent_name") in PARALLEL_AGENTS
+    )
 
-    # 清理LLM可能返回的多余格式
-    if full_response.startswith("```json"):
-        full_response = full_response.removeprefix("```json")
 
-    if full_response.endswith("```"):
-        full_response = full_response.removesuffix("```")
+def _start_early_step(state: State, step: dict) -> asyncio.Task:
+    """
+    在后台开始执行计划的第一步。
+
+    任务在当前上下文的副本中运行，并带上TAG_NOSTREAM标签：它的LLM和工具调用
+    仍计入本次运行的Token预算、指标和取消令牌，但不会被当作规划师的流式输出推送给前端；
+    结果在规划结束后作为该Agent的消息写入状态。
+    """
+    agent_name = step["agent_name"]
+    logger.info(f"规划师仍在生成计划，提前开始执行第1步: {agent_name}")
+    node = {"researcher": aresearch_node, "browser": abrowser_node}[agent_name]
+    context = contextvars.copy_context()
+    context.run(var_child_runnable_config.set, _early_step_config(agent_name))
+    return asyncio.create_task(node({**state, "plan_step": {**step, "index": 0}}), context=context)
+
+
+def _early_step_config(agent_name: str) -> RunnableConfig:
+    """
+    @param {str} agent_name - 提前执行的Agent。
+    @returns {RunnableConfig} 规划师的config，带有TAG_NOSTREAM标签，事件流按该标签过滤掉
+                              其中的所有运行；用量按该Agent而不是规划师统计。
+    """
+    config = ensure_config()
+    return {
+        **config,
+        "tags": [*config.get("tags", []), TAG_NOSTREAM],
+        "metadata": {**config.get("metadata", {}), "langgraph_node": agent_name},
+    }
+
+
+def _planner_abort(parser: PlanStreamParser, error: PlanParseError) -> Command[Literal["__end__"]]:
+    """规划师的输出在流式接收过程中已被判定为非法，提前结束流程。"""
+    logger.warning(f"规划师的响应不是一个有效的JSON，已提前停止生成: {error}")
+    return _planner_update(parser.text, "__end__")
+
+
+def _planner_command(parser: PlanStreamParser) -> Command[Literal["supervisor", "__end__"]]:
+    """
+    校验规划师完整的输出，生成对应的命令。
+
+    @param {PlanStreamParser} parser - 已接收完LLM全部流式输出的解析器。
+    @returns {Command} 计划有效时跳转到'supervisor'，否则结束流程。
+    """
+    full_response = parser.text
+    logger.debug(f"规划师的响应: {full_response}")
 
     goto = "supervisor"
     # 验证计划是否为有效的JSON，如果不是，则异常结束流程
     try:
-        json.loads(full_response)
-    except json.JSONDecodeError:
+        parser.close()
+    except PlanParseError:
         logger.warning("规划师的响应不是一个有效的JSON")
         goto = "__end__"
+    return _planner_update(full_response, goto)
 
+
+async def _planner_acommand(
+    parser: PlanStreamParser, early_step: asyncio.Task | None
+) -> Command[Literal["supervisor", "__end__"]]:
+    """
+    _planner_command的异步版本。提前执行的第一步完成后，其结果与计划一起写入状态，
+    并将plan_step_index前移一步；计划无效或该步骤失败时丢弃结果，由监督员照常派发。
+    """
+    command = _planner_command(parser)
+    if early_step is None or command.goto == "__end__":
+        return command
+    try:
+        result = await early_step
+    except Exception as e:
+        logger.warning(f"提前执行的第1步失败，交由监督员重新派发: {e}")
+        return command
+    command.update["messages"] += result.update["messages"]
+    command.update["plan_step_index"] = 1
+    command.update["plan_dispatch_size"] = 1
+    return command
+
+
+def _planner_update(full_plan: str, goto: str) -> Command[Literal["supervisor", "__end__"]]:
     return Command(
         update={
-            "messages": [HumanMessage(content=full_response, name="planner")],
-            "full_plan": full_response,
+            "messages": [HumanMessage(content=full_plan, name="planner")],
+            "full_plan": full_plan,
         },
         goto=goto,
     )
@@ -213,9 +695,102 @@ def coordinator_node(state: State) -> Command[Literal["planner", "__end__"]]:
     @returns {Command} 一个命令对象，不更新状态，但指定下一步跳转到'planner'或'__end__'。
     """
     logger.info("协调员正在与用户沟通")
+    intent, checked = _coordinator_intent(state)
+    if intent is not None:
+        if intent != INTENT_PLANNER:
+            dispatch_custom_event("coordinator_reply", _coordinator_reply(state))
+        return _intent_command(intent)
+    messages = apply_prompt_template("coordinator", state)
+    started = time.monotonic()
+    response = _agent_llm("coordinator").invoke(messages)
+    logger.debug(f"当前状态的消息: {state['messages']}")
+    _record_coordinator_decision(state, response, time.monotonic() - started, checked)
+    return _coordinator_command(response)
+
+
+async def acoordinator_node(state: State) -> Command[Literal["planner", "__end__"]]:
+    """coordinator_node的异步版本。"""
+    logger.info("协调员正在与用户沟通")
+    intent, checked = _coordinator_intent(state)
+    if intent is not None:
+        if intent != INTENT_PLANNER:
+            await adispatch_custom_event("coordinator_reply", _coordinator_reply(state))
+        return _intent_command(intent)
     messages = apply_prompt_template("coordinator", state)
-    response = get_llm_by_type(AGENT_LLM_MAP["coordinator"]).invoke(messages)
+    started = time.monotonic()
+    response = await _agent_llm("coordinator").ainvoke(messages)
     logger.debug(f"当前状态的消息: {state['messages']}")
+    _record_coordinator_decision(state, response, time.monotonic() - started, checked)
+    return _coordinator_command(response)
+
+
+def _coordinator_intent(state: State) -> tuple[Optional[str], Optional[str]]:
+    """
+    先用本地预分类器判断协调员的决策，足够确定时跳过LLM调用。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {tuple} (直接采用的决策, 需要与LLM决策比对的决策)；前者为None时调用LLM。
+    """
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return None, None
+    intent = classifier.classify(user_text(state))
+    if intent is None:
+        coordinator_intent_decisions.inc(decision="llm")
+        return None, None
+    if random.random() < COORDINATOR_CLASSIFIER_SHADOW_RATE:
+        # 抽样的置信决策仍交给LLM，用于统计预分类器与LLM的不一致率
+        coordinator_intent_decisions.inc(decision="llm")
+        return None, intent
+    coordinator_intent_decisions.inc(decision=intent)
+    # 按协调员LLM调用的平均耗时估算节省的时间
+    llm_seconds, llm_calls = llm_duration.get(agent="coordinator")
+    if llm_calls:
+        coordinator_time_saved.inc(llm_seconds / llm_calls)
+    logger.info(f"协调员预分类器判断为{intent}，跳过LLM调用")
+    return intent, None
+
+
+def _coordinator_reply(state: State) -> dict:
+    """预分类器判断为直接回复时，推送给前端的模板回复。"""
+    return {
+        "message_id": f"coordinator-{uuid.uuid4().hex}",
+        "content": template_reply(user_text(state)),
+    }
+
+
+def _intent_command(intent: str) -> Command[Literal["planner", "__end__"]]:
+    """预分类器决策对应的跳转命令。"""
+    return Command(goto="planner" if intent == INTENT_PLANNER else "__end__")
+
+
+def _record_coordinator_decision(
+    state: State, response, latency: float, checked: Optional[str]
+):
+    """
+    记录协调员LLM的决策：与抽样的预分类器决策比对，并写入训练预分类器用的决策日志。
+
+    @param {State} state - 当前工作流的共享状态。
+    @param {AIMessage} response - 协调员LLM的回复。
+    @param {float} latency - LLM调用耗时（秒）。
+    @param {str|None} checked - 需要比对的预分类器决策。
+    """
+    handoff = "handoff_to_planner" in response.content
+    if checked is not None:
+        agree = (checked == INTENT_PLANNER) == handoff
+        coordinator_intent_checks.inc(result="agree" if agree else "disagree")
+    decision_log = get_decision_log()
+    if decision_log is not None:
+        decision_log.record(user_text(state), handoff, latency)
+
+
+def _coordinator_command(response) -> Command[Literal["planner", "__end__"]]:
+    """
+    根据协调员的回复决定是否移交给规划师。
+
+    @param {AIMessage} response - 协调员LLM的回复。
+    @returns {Command} 跳转到'planner'或'__end__'的命令对象。
+    """
     logger.debug(f"协调员的响应: {response}")
 
     goto = "__end__"
@@ -243,19 +818,27 @@ def reporter_node(state: State) -> Command[Literal["supervisor"]]:
                        固定将流程交回给'supervisor'。
     """
     logger.info("报告员正在撰写最终报告")
-    messages = apply_prompt_template("reporter", state)
-    response = get_llm_by_type(AGENT_LLM_MAP["reporter"]).invoke(messages)
+    messages = apply_prompt_template(
+        "reporter", {**state, "messages": build_agent_context(state, "reporter")}
+    )
+    response = _agent_llm("reporter").invoke(messages)
     logger.debug(f"当前状态的消息: {state['messages']}")
-    logger.debug(f"报告员的响应: {response}")
+    return _reporter_command(response)
 
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=RESPONSE_FORMAT.format("reporter", response.content),
-                    name="reporter",
-                )
-            ]
-        },
-        goto="supervisor",
+
+async def areporter_node(state: State) -> Command[Literal["supervisor"]]:
+    """reporter_node的异步版本。"""
+    logger.info("报告员正在撰写最终报告")
+    messages = apply_prompt_template(
+        "reporter",
+        {**state, "messages": await abuild_agent_context(state, "reporter")},
     )
+    response = await _agent_llm("reporter").ainvoke(messages)
+    logger.debug(f"当前状态的消息: {state['messages']}")
+    return _reporter_command(response)
+
+
+def _reporter_command(response) -> Command[Literal["supervisor"]]:
+    """将报告员的回复包装为标准消息，并交回给'supervisor'。"""
+    logger.debug(f"报告员的响应: {response}")
+    return _agent_command("reporter", response.content)
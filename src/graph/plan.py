@@ -0,0 +1,326 @@
+"""
+规划师(Planner)输出的计划解析，以及基于计划的确定性路由。
+
+当计划明确时，监督员可以直接按计划逐步派发任务，而不必在每一跳前都调用LLM。
+"""
+
+import json
+import logging
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+
+from src.config import TEAM_MEMBERS
+
+logger = logging.getLogger(__name__)
+
+# Agent在无法按计划完成当前步骤时，在回复中输出该标记
+PLAN_DEVIATION_MARKER = "PLAN_DEVIATION"
+
+# 只读取外部信息、互不依赖的步骤可以并发执行
+PARALLEL_AGENTS = ("researcher", "browser")
+
+# 出现这些内容时，认为当前步骤执行失败，需要交回LLM监督员判断
+STEP_FAILURE_MARKERS = (
+    PLAN_DEVIATION_MARKER,
+    "Agent stopped due to iteration limit or time limit.",
+    "Agent stopped due to max iterations.",
+)
+
+
+def parse_plan(full_plan: Optional[str]) -> Optional[list[dict]]:
+    """
+    解析规划师生成的JSON计划，返回其中的步骤列表。
+
+    @param {str|None} full_plan - state["full_plan"]中的JSON字符串。
+    @returns {list|None} 步骤列表；计划缺失、不是合法JSON、没有步骤，
+                         或某一步的agent_name不属于团队成员时返回None。
+    """
+    if not full_plan:
+        return None
+    try:
+        plan = json.loads(full_plan)
+    except json.JSONDecodeError:
+        return None
+    steps = plan.get("steps") if isinstance(plan, dict) else None
+    if not isinstance(steps, list) or not steps:
+        return None
+    for step in steps:
+        if not isinstance(step, dict) or step.get("agent_name") not in TEAM_MEMBERS:
+            return None
+    return steps
+
+
+def _message_name(message) -> Optional[str]:
+    if isinstance(message, BaseMessage):
+        return message.name
+    if isinstance(message, dict):
+        return message.get("name")
+    return None
+
+
+def _message_content(message) -> str:
+    if isinstance(message, BaseMessage):
+        content = message.content
+    elif isinstance(message, dict):
+        content = message.get("content", "")
+    else:
+        content = ""
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+
+def step_failed(messages: list, agent_names: list[str]) -> bool:
+    """
+    判断刚刚执行完的步骤是否失败或偏离了计划。
+
+    @param {list} messages - 当前的消息历史。
+    @param {list} agent_names - 上一跳被派发的Agent（并行派发时按计划顺序有多个）。
+    @returns {bool} 最后几条消息不是这些Agent按顺序给出的回复，或回复中带有失败/偏离标记时返回True。
+    """
+    if len(messages) < len(agent_names):
+        return True
+    for message, agent_name in zip(messages[-len(agent_names):], agent_names):
+        if _message_name(message) != agent_name:
+            return True
+        content = _message_content(message)
+        if any(marker in content for marker in STEP_FAILURE_MARKERS):
+            return True
+    return False
+
+
+def route_from_plan(state: dict) -> tuple[Optional[str], Optional[str]]:
+    """
+    按计划确定下一步要执行的Agent。
+
+    @param {State} state - 当前工作流的共享状态。
+    @returns {tuple} (next, fallback_reason)。可以按计划路由时next为Agent名称或'FINISH'，
+                     fallback_reason为None；否则next为None，fallback_reason说明需要
+                     回退到LLM监督员的原因。
+    """
+    steps = parse_plan(state.get("full_plan"))
+    if steps is None:
+        return None, "malformed_plan"
+
+    index = state.get("plan_step_index") or 0
+    if index > 0:
+        dispatched = steps[max(index - (state.get("plan_dispatch_size") or 1), 0):index]
+        if step_failed(state["messages"], [step["agent_name"] for step in dispatched]):
+            return None, "step_failed"
+    if index >= len(steps):
+        return "FINISH", None
+    return steps[index]["agent_name"], None
+
+
+def parallel_step_group(state: dict, max_parallel_steps: int) -> list[int]:
+    """
+    从下一个待执行步骤开始，找出可以并发执行的一组相互独立的步骤。
+
+    只有连续的、由PARALLEL_AGENTS执行的步骤会被归为一组；某一步如果在
+    `depends_on`中引用了同组内更早的步骤（按下标或标题），分组在它之前截止。
+
+    @param {State} state - 当前工作流的共享状态，计划必须已通过route_from_plan校验。
+    @param {int} max_parallel_steps - 一组内最多并发执行的步骤数。
+    @returns {list} 按计划顺序排列的步骤下标，至少包含下一个待执行步骤。
+    """
+    steps = parse_plan(state.get("full_plan")) or []
+    index = state.get("plan_step_index") or 0
+    group = [index]
+    if steps[index]["agent_name"] not in PARALLEL_AGENTS:
+        return group
+    for candidate in range(index + 1, min(index + max_parallel_steps, len(steps))):
+        step = steps[candidate]
+        if step["agent_name"] not in PARALLEL_AGENTS:
+            break
+        depends_on = step.get("depends_on") or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        group_refs = set(group) | {steps[i].get("title") for i in group}
+        if any(ref in group_refs for ref in depends_on):
+            break
+        group.append(candidate)
+    return group
+
+
+class PlanParseError(ValueError):
+    """规划师的流式输出在结构上不是合法的JSON计划。"""
+
+
+# 计划开头允许出现的代码块标记，如 ```json
+_FENCE = "```"
+_FENCE_LANGUAGES = ("", "json")
+# JSON字符串以外允许出现的字符（字面量true/false/null与数字）
+_SCALAR_CHARS = frozenset("0123456789+-.eEtrufalsn")
+
+
+class PlanStreamParser:
+    """
+    规划师输出的增量JSON解析器。
+
+    按块喂入LLM的流式输出，边接收边校验结构：开头的```json代码块标记会被剥离，
+    括号不匹配、出现非法字符、根节点不是对象或根对象结束后仍有多余内容时，
+    立即抛出PlanParseError，调用方可以提前中止生成。`steps`数组中的每个步骤
+    在其右括号出现时即被解析并返回，不必等整个计划生成完毕。
+
+    所有输入只被扫描一次，已接收的内容保存在列表中，结束时一次性拼接，
+    避免长计划逐块拼接字符串带来的平方级开销。
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []  # 剥离代码块标记后的JSON文本
+        self._preamble = ""  # 根对象开始之前的内容
+        self._trailer = ""  # 根对象结束之后的内容
+        self._started = False
+        self._finished = False
+        # 容器栈，每一项为[括号, 当前键, 是否在等待键]
+        self._stack: list[list] = []
+        self._in_string = False
+        self._escaped = False
+        self._key_parts: Optional[list[str]] = None  # 正在读取的对象键
+        self._step_parts: Optional[list[str]] = None  # 正在读取的步骤
+        self._step_from = 0
+        self.steps: list[dict] = []
+
+    @property
+    def text(self) -> str:
+        """到目前为止收到的JSON文本（不含代码块标记）。"""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> list[dict]:
+        """
+        喂入一段流式输出。
+
+        @param {str} chunk - LLM本次输出的内容片段。
+        @returns {list} 本次输入中新完成的步骤，按计划顺序排列。
+        @throws {PlanParseError} 输出在结构上已不可能构成合法的JSON计划时抛出。
+        """
+        if not chunk:
+            return []
+        if self._finished:
+            self._check_trailer(chunk)
+            return []
+        if not self._started:
+            chunk = self._consume_preamble(chunk)
+            if chunk is None:
+                return []
+        return self._scan(chunk)
+
+    def close(self) -> dict:
+        """
+        结束输入并返回完整的计划。
+
+        @returns {dict} 解析后的计划对象。
+        @throws {PlanParseError} 输出不完整或不是合法JSON时抛出。
+        """
+        if not self._finished:
+            raise PlanParseError("plan ended before the root object was closed")
+        try:
+            return json.loads(self.text)
+        except json.JSONDecodeError as e:
+            raise PlanParseError(str(e)) from e
+
+    def _consume_preamble(self, chunk: str) -> Optional[str]:
+        """剥离根对象之前的空白和代码块标记，返回从根对象'{'开始的剩余内容。"""
+        self._preamble += chunk
+        stripped = self._preamble.lstrip()
+        if not stripped:
+            return None
+        if stripped[0] == "{":
+            self._started = True
+            return stripped
+        if not stripped.startswith(_FENCE[: len(stripped)]):
+            raise PlanParseError("plan does not start with a JSON object")
+        brace = stripped.find("{")
+        header = stripped[len(_FENCE) : brace if brace >= 0 else None].strip()
+        if not any(language.startswith(header) for language in _FENCE_LANGUAGES):
+            raise PlanParseError(f"unexpected code fence language: {header!r}")
+        if brace < 0:
+            return None
+        if header not in _FENCE_LANGUAGES:
+            raise PlanParseError(f"unexpected code fence language: {header!r}")
+        self._started = True
+        return stripped[brace:]
+
+    def _check_trailer(self, chunk: str):
+        """根对象结束后只允许出现空白和结尾的代码块标记。"""
+        self._trailer += chunk
+        trailer = self._trailer.strip()
+        if trailer and not _FENCE.startswith(trailer):
+            raise PlanParseError("unexpected content after the plan")
+
+    def _scan(self, chunk: str) -> list[dict]:
+        completed = []
+        stack = self._stack
+        for position, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        stack[-1][1] = "".join(self._key_parts)
+                        stack[-1][2] = False
+                        self._key_parts = None
+                    continue
+                if self._key_parts is not None:
+                    self._key_parts.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if stack and stack[-1][0] == "{" and stack[-1][2]:
+                    self._key_parts = []
+            elif char in "{[":
+                if char == "{" and self._at_step_start():
+                    self._step_parts = []
+                    self._step_from = position
+                key = stack[-1][1] if stack and stack[-1][0] == "{" else None
+                stack.append([char, key, char == "{"])
+            elif char in "}]":
+                opening = "{" if char == "}" else "["
+                if not stack or stack[-1][0] != opening:
+                    raise PlanParseError(f"unbalanced '{char}'")
+                stack.pop()
+                if char == "}" and self._step_parts is not None and self._at_step_start():
+                    self._step_parts.append(chunk[self._step_from : position + 1])
+                    completed.append(self._close_step())
+                if not stack:
+                    self._parts.append(chunk[: position + 1])
+                    self._finished = True
+                    self._check_trailer(chunk[position + 1 :])
+                    return completed
+            elif char == ",":
+                if not stack:
+                    raise PlanParseError("unexpected ','")
+                if stack[-1][0] == "{":
+                    stack[-1][2] = True
+            elif char == ":":
+                if not stack or stack[-1][0] != "{":
+                    raise PlanParseError("unexpected ':'")
+            elif not char.isspace() and char not in _SCALAR_CHARS:
+                raise PlanParseError(f"unexpected character {char!r}")
+
+        self._parts.append(chunk)
+        if self._step_parts is not None:
+            self._step_parts.append(chunk[self._step_from :])
+            self._step_from = 0
+        return completed
+
+    def _at_step_start(self) -> bool:
+        """当前是否正位于根对象的`steps`数组中（即下一个对象就是一个步骤）。"""
+        return (
+            len(self._stack) == 2
+            and self._stack[1][0] == "["
+            and self._stack[1][1] == "steps"
+        )
+
+    def _close_step(self) -> dict:
+        text = "".join(self._step_parts)
+        self._step_parts = None
+        try:
+            step = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise PlanParseError(f"invalid step {len(self.steps) + 1}: {e}") from e
+        self.steps.append(step)
+        return step
@@ -0,0 +1,155 @@
+"""
+监督员路由决策的流式解析。
+
+监督员只需要Router中的next值。StreamingRouter流式读取结构化输出，一旦next的取值
+唯一确定（已读到的前缀只匹配一个选项，或已读到结束引号），立即采用该决策并关闭流，
+取消剩余的生成；流结束时仍无法确定的，按完整响应正常解析。
+"""
+
+import logging
+import re
+import time
+from contextlib import aclosing, closing
+from typing import Optional, Sequence
+
+from langchain_core.messages import BaseMessageChunk
+from langchain_core.runnables import Runnable, RunnableBinding, RunnableSequence
+from langchain_core.runnables.config import ensure_config
+
+from src.agents.llm_cache import get_llm_response_cache
+from src.metrics import supervisor_decision_duration, supervisor_time_saved
+
+logger = logging.getLogger(__name__)
+
+# JSON中next字段的取值，以及取值之后的结束引号（尚未读到时为空）
+_NEXT_VALUE = re.compile(r'"next"\s*:\s*"([^"\\]*)("?)')
+
+
+class RouteScanner:
+    """累积流式输出的文本，判断next的取值是否已经唯一确定。"""
+
+    def __init__(self, options: Sequence[str]):
+        """
+        @param {Sequence} options - next的所有合法取值。
+        """
+        self.options = list(options)
+        self.text = ""
+
+    def feed(self, chunk: BaseMessageChunk) -> Optional[str]:
+        """
+        读入一个流式分块。JSON可能在content中（json_schema/json_mode），
+        也可能在工具调用的参数中（function_calling）。
+
+        @param {BaseMessageChunk} chunk - LLM的流式分块。
+        @returns {str|None} 已确定的next取值，尚不能确定时为None。
+        """
+        self.text += chunk.text()
+        for tool_call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+            self.text += tool_call_chunk.get("args") or ""
+        return self.decision()
+
+    def decision(self) -> Optional[str]:
+        """@returns {str|None} 已确定的next取值，尚不能确定时为None。"""
+        match = _NEXT_VALUE.search(self.text)
+        if match is None:
+            return None
+        value, closed = match.groups()
+        if closed:
+            return value if value in self.options else None
+        candidates = [option for option in self.options if option.startswith(value)]
+        return candidates[0] if value and len(candidates) == 1 else None
+
+    def remaining(self, option: str) -> int:
+        """
+        @param {str} option - 已确定的next取值。
+        @returns {int} 最简回答{"next": "<option>"}中还没有读到的字符数。
+        """
+        match = _NEXT_VALUE.search(self.text)
+        value, closed = match.groups()
+        tail = len(option) - len(value) + (0 if closed else 1)
+        return tail + (0 if "}" in self.text[match.end():] else 1)
+
+
+def split_structured_output(structured: Runnable) -> tuple[Optional[Runnable], Optional[Runnable]]:
+    """
+    把with_structured_output生成的Runnable拆成绑定了输出格式的LLM和解析器。
+
+    @param {Runnable} structured - with_structured_output的返回值。
+    @returns {tuple} (LLM, 解析器)；结构无法识别时均为None。
+    """
+    if not (isinstance(structured, RunnableSequence) and isinstance(structured.first, RunnableBinding)):
+        return None, None
+    rest = structured.steps[1:]
+    return structured.first, rest[0] if len(rest) == 1 else RunnableSequence(*rest)
+
+
+def _response_cached() -> bool:
+    """当前节点的LLM调用是否走响应缓存。缓存只保存完整的响应，此时不能提前关闭流。"""
+    cache = get_llm_response_cache()
+    return cache is not None and cache.enabled_for(ensure_config().get("metadata", {}).get("langgraph_node"))
+
+
+class StreamingRouter:
+    """
+    与结构化输出Runnable的invoke/ainvoke用法相同，但在next取值确定后立即返回，
+    并关闭LLM的流以取消剩余的生成。无法流式解析，或调用走响应缓存时退回完整调用。
+    """
+
+    def __init__(self, structured: Runnable, options: Sequence[str], tags: Sequence[str] = ()):
+        """
+        @param {Runnable} structured - llm.with_structured_output(Router)的返回值。
+        @param {Sequence} options - next的所有合法取值。
+        @param {Sequence} tags - 附加到LLM调用上的标签。
+        """
+        self.options = list(options)
+        self.structured = structured.with_config(tags=list(tags))
+        model, self.parser = split_structured_output(structured)
+        self.model = model.with_config(tags=list(tags)) if model is not None else None
+
+    def _early(self, scanner: RouteScanner, route: str, started: float, first: float, first_chars: int) -> dict:
+        now = time.monotonic()
+        supervisor_decision_duration.observe(now - started, mode="early")
+        # 按已观察到的输出速度，估算读完剩余回答还需要的时间
+        streamed = len(scanner.text) - first_chars
+        if now > first and streamed > 0:
+            saved = scanner.remaining(route) * (now - first) / streamed
+            supervisor_time_saved.observe(saved)
+            logger.debug(f"监督员提前确定路由{route}，预计节省{saved:.3f}秒")
+        return {"next": route}
+
+    def invoke(self, messages) -> dict:
+        """
+        @param {list} messages - 监督员的Prompt消息。
+        @returns {dict} Router格式的决策。
+        """
+        if self.model is None or _response_cached():
+            return self.structured.invoke(messages)
+        scanner, message = RouteScanner(self.options), None
+        started, first, first_chars = time.monotonic(), None, 0
+        with closing(self.model.stream(messages)) as stream:
+            for chunk in stream:
+                message = chunk if message is None else message + chunk
+                route = scanner.feed(chunk)
+                if first is None:
+                    first, first_chars = time.monotonic(), len(scanner.text)
+                if route is not None:
+                    return self._early(scanner, route, started, first, first_chars)
+        supervisor_decision_duration.observe(time.monotonic() - started, mode="full")
+        return self.parser.invoke(message)
+
+    async def ainvoke(self, messages) -> dict:
+        """invoke的异步版本。"""
+        if self.model is None or _response_cached():
+            return await self.structured.ainvoke(messages)
+        scanner, message = RouteScanner(self.options), None
+        started, first, first_chars = time.monotonic(), None, 0
+        async with aclosing(self.model.astream(messages)) as stream:
+            async for chunk in stream:
+                message = chunk if message is None else message + chunk
+                route = scanner.feed(chunk)
+                if first is None:
+                    first, first_chars = time.monotonic(), len(scanner.text)
+                if route is not None:
+                    return self._early(scanner, route, started, first, first_chars)
+        supervisor_decision_duration.observe(time.monotonic() - started, mode="full")
+        return await self.parser.ainvoke(message)
@@ -0,0 +1,53 @@
+"""
+训练和评估协调员的意图预分类器（见src/graph/intent.py）。
+
+用法:
+    python -m src.graph.train_intent train --log coordinator_decisions.jsonl --out coordinator_intent.npz
+    python -m src.graph.train_intent evaluate --log coordinator_decisions.jsonl --model coordinator_intent.npz
+
+train在留出的样本上、evaluate在整个日志上，以LLM的决策为准报告覆盖率、不一致率、
+分类耗时、LLM平均耗时和平均每个请求节省的时间。
+"""
+
+import argparse
+import json
+import random
+
+from src.config import COORDINATOR_CLASSIFIER_THRESHOLD
+from .intent import DEFAULT_DIM, IntentClassifier, evaluate, read_decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练和评估协调员的意图预分类器")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="从决策日志训练，并在留出的样本上评估")
+    train.add_argument("--log", required=True, help="COORDINATOR_DECISION_LOG记录的决策日志")
+    train.add_argument("--out", required=True, help="模型输出路径(.npz)")
+    train.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    train.add_argument("--epochs", type=int, default=20)
+    train.add_argument("--threshold", type=float, default=COORDINATOR_CLASSIFIER_THRESHOLD)
+    train.add_argument("--holdout", type=float, default=0.2, help="留作评估的样本比例")
+    evaluate_command = commands.add_parser("evaluate", help="在决策日志上评估已训练的模型")
+    evaluate_command.add_argument("--log", required=True)
+    evaluate_command.add_argument("--model", required=True)
+    evaluate_command.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    decisions = read_decisions(args.log)
+    if args.command == "evaluate":
+        print(json.dumps(evaluate(IntentClassifier.load(args.model, args.threshold), decisions), indent=2))
+        return
+
+    random.Random(0).shuffle(decisions)
+    split = int(len(decisions) * (1 - args.holdout))
+    classifier = IntentClassifier(args.dim, args.threshold).fit(
+        [(d["text"], bool(d["handoff"])) for d in decisions[:split]], epochs=args.epochs
+    )
+    classifier.save(args.out)
+    print(f"训练样本 {split}，留出样本 {len(decisions) - split}，模型已保存到 {args.out}")
+    if split < len(decisions):
+        print(json.dumps(evaluate(classifier, decisions[split:]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
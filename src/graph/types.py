@@ -1,4 +1,4 @@
-from typing import Literal, TypedDict, Annotated, List, Union
+from typing import Literal, TypedDict, Annotated, List, Optional, Union
 from langchain_core.messages import BaseMessage
 import operator
 from langgraph.graph import MessagesState
@@ -34,6 +34,10 @@ class State(TypedDict):
     # TEAM_MEMBERS: 当前团队所有成员的列表。
     TEAM_MEMBERS: List[str]
 
+    # CURRENT_TIME: 工作流开始的时间，填入各Agent Prompt末尾的<<CURRENT_TIME>>。
+    # 整个工作流使用同一个值，系统Prompt保持不变，服务商的前缀缓存才能命中。
+    CURRENT_TIME: str
+
     # full_plan: 由规划师(Planner)生成的完整JSON格式计划。
     full_plan: Union[str, None]
 
@@ -43,6 +47,27 @@ class State(TypedDict):
     # search_before_planning: 在规划前是否进行网络搜索。
     search_before_planning: bool
 
+    # routing_mode: 监督员的路由模式。"llm"表示每一跳都调用LLM决策；
+    # "plan"表示按规划师的计划逐步派发，仅在计划异常、步骤失败或Agent报告偏离时回退到LLM。
+    routing_mode: str
+
+    # plan_step_index: 计划路由模式下，下一个待派发步骤在计划中的下标。
+    plan_step_index: int
+
+    # plan_dispatch_size: 上一跳按计划派发的步骤数，并发派发时大于1。
+    plan_dispatch_size: int
+
+    # plan_step: 并发派发时通过Send传给单个Agent的计划步骤（含index），不会写回共享状态。
+    plan_step: Optional[dict]
+
+    # routing_stats: 本次运行的路由统计，llm_calls为实际的路由LLM调用次数，
+    # llm_calls_avoided为按计划路由而省去的调用次数。
+    routing_stats: dict
+
+    # token_usage: 本次运行的Token用量快照（见src/graph/budget.py的TokenBudget.usage()），
+    # 由监督员在每一跳写入，恢复工作流时据此继续累计。
+    token_usage: dict
+
     # intermediate_steps: 用于存储Agent在执行任务过程中的中间步骤（例如工具调用和其返回结果）。
     # 这对于调试和让Agent拥有短期记忆至关重要。但是其它地方好像都没有用的。
     intermediate_steps: Annotated[list, operator.add]
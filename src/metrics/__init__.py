@@ -0,0 +1,56 @@
+from .registry import Counter, Gauge, Histogram, MetricsRegistry
+from .instruments import (
+    registry,
+    node_duration,
+    node_errors,
+    tool_duration,
+    tool_errors,
+    llm_time_to_first_token,
+    llm_duration,
+    llm_tokens,
+    llm_errors,
+    llm_cached_tokens,
+    supervisor_decision_duration,
+    supervisor_time_saved,
+    coordinator_intent_decisions,
+    coordinator_time_saved,
+    coordinator_intent_checks,
+    active_workflows,
+    LLMMetricsCallback,
+    llm_token_usage,
+    llm_cached_token_usage,
+    estimate_prompt_tokens,
+    closed_stream_usage,
+    prompt_cache_stats,
+    coordinator_intent_stats,
+)
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "registry",
+    "node_duration",
+    "node_errors",
+    "tool_duration",
+    "tool_errors",
+    "llm_time_to_first_token",
+    "llm_duration",
+    "llm_tokens",
+    "llm_errors",
+    "llm_cached_tokens",
+    "supervisor_decision_duration",
+    "supervisor_time_saved",
+    "coordinator_intent_decisions",
+    "coordinator_time_saved",
+    "coordinator_intent_checks",
+    "active_workflows",
+    "LLMMetricsCallback",
+    "llm_token_usage",
+    "llm_cached_token_usage",
+    "estimate_prompt_tokens",
+    "closed_stream_usage",
+    "prompt_cache_stats",
+    "coordinator_intent_stats",
+]
@@ -0,0 +1,305 @@
+"""
+工作流的各项指标：节点、工具和LLM调用的耗时与错误次数，各Agent的token用量，以及运行中的工作流数量。
+"""
+
+import threading
+import time
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .registry import MetricsRegistry
+
+# LLM首个token的耗时分桶（秒）
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 20, 30, 60)
+# 监督员提前做出路由决策所省下的生成时间分桶（秒）
+TIME_SAVED_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+
+registry = MetricsRegistry()
+
+node_duration = registry.histogram(
+    "langmanus_node_duration_seconds", "Graph node latency", ["node"]
+)
+node_errors = registry.counter(
+    "langmanus_node_errors_total", "Graph node executions that raised", ["node"]
+)
+tool_duration = registry.histogram(
+    "langmanus_tool_duration_seconds", "Tool call latency", ["tool"]
+)
+tool_errors = registry.counter(
+    "langmanus_tool_errors_total", "Tool calls that raised", ["tool"]
+)
+llm_time_to_first_token = registry.histogram(
+    "langmanus_llm_time_to_first_token_seconds",
+    "Time from LLM request to first streamed token (total latency when not streaming)",
+    ["agent"],
+    TTFT_BUCKETS,
+)
+llm_duration = registry.histogram(
+    "langmanus_llm_duration_seconds", "LLM call latency", ["agent"]
+)
+llm_tokens = registry.counter(
+    "langmanus_llm_tokens_total", "LLM tokens by agent and direction", ["agent", "type"]
+)
+llm_errors = registry.counter(
+    "langmanus_llm_errors_total", "LLM calls that raised", ["agent"]
+)
+llm_cached_tokens = registry.counter(
+    "langmanus_llm_cached_tokens_total",
+    "Input tokens served from the provider's prompt prefix cache",
+    ["agent"],
+)
+supervisor_decision_duration = registry.histogram(
+    "langmanus_supervisor_decision_seconds",
+    "Time from supervisor LLM request to routing decision, "
+    "by whether the stream was cut early",
+    ["mode"],
+    TTFT_BUCKETS,
+)
+supervisor_time_saved = registry.histogram(
+    "langmanus_supervisor_time_saved_seconds",
+    "Estimated generation time skipped per supervisor decision "
+    "taken on a partial answer",
+    buckets=TIME_SAVED_BUCKETS,
+)
+coordinator_intent_decisions = registry.counter(
+    "langmanus_coordinator_intent_decisions_total",
+    "Coordinator decisions by who made them: "
+    "the pre-classifier (planner/reply) or the LLM (llm)",
+    ["decision"],
+)
+coordinator_time_saved = registry.counter(
+    "langmanus_coordinator_time_saved_seconds_total",
+    "Estimated coordinator LLM time skipped by confident pre-classifier decisions",
+)
+coordinator_intent_checks = registry.counter(
+    "langmanus_coordinator_intent_checks_total",
+    "Sampled confident pre-classifier decisions checked against the LLM, "
+    "by result (agree/disagree)",
+    ["result"],
+)
+active_workflows = registry.gauge(
+    "langmanus_active_workflows", "Workflows currently running"
+)
+
+
+def llm_token_usage(response: LLMResult) -> tuple[int, int]:
+    """从LLM的响应中读取(输入token数, 输出token数)。"""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not input_tokens and not output_tokens:
+        # 部分模型只在llm_output中返回用量
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0) or 0
+        output_tokens = usage.get("completion_tokens", 0) or 0
+    return input_tokens, output_tokens
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """按约4个字符一个token粗略估算提示词（消息或字符串列表）的token数。"""
+    return (
+        sum(len(str(getattr(message, "content", message))) for message in messages) // 4
+    )
+
+
+def closed_stream_usage(
+    prompt_tokens: int, response: Optional[LLMResult]
+) -> tuple[int, int]:
+    """
+    调用方读到需要的内容后提前关闭流时（如监督员提前路由），服务商不会再返回用量，
+    按估算的提示词token数和已收到的输出估算用量。
+
+    @param {int} prompt_tokens - estimate_prompt_tokens估算的提示词token数。
+    @param {LLMResult|None} response - on_llm_error收到的已生成部分。
+    @returns {tuple} (输入token数, 输出token数)。
+    """
+    output_chars = sum(
+        len(generation.text)
+        for generations in (response.generations if response else [])
+        for generation in generations
+    )
+    return prompt_tokens, output_chars // 4
+
+
+def llm_cached_token_usage(response: LLMResult) -> int:
+    """从LLM的响应中读取命中服务商前缀缓存的输入token数。"""
+    cached = 0
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                details = usage.get("input_token_details") or {}
+                cached += details.get("cache_read", 0) or 0
+    if not cached:
+        # OpenAI在prompt_tokens_details.cached_tokens中返回，
+        # DeepSeek在prompt_cache_hit_tokens中返回
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        cached = (
+            (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            or usage.get("prompt_cache_hit_tokens")
+            or 0
+        )
+    return cached
+
+
+def prompt_cache_stats() -> dict[str, dict]:
+    """
+    各Agent的输入token数、其中命中服务商前缀缓存的token数和命中率。
+
+    @returns {dict} 以Agent为键的统计字典。
+    """
+    stats = {}
+    for labels in llm_tokens.label_sets():
+        if labels["type"] != "input":
+            continue
+        agent = labels["agent"]
+        input_tokens = llm_tokens.get(agent=agent, type="input")
+        cached_tokens = llm_cached_tokens.get(agent=agent)
+        stats[agent] = {
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "hit_rate": round(cached_tokens / input_tokens, 4) if input_tokens else 0.0,
+        }
+    return stats
+
+
+def coordinator_intent_stats() -> dict:
+    """
+    协调员预分类器的效果：各类决策次数、跳过LLM的比例、估算节省的时间，
+    以及抽样与LLM比对时的不一致率。
+
+    @returns {dict} 统计字典。
+    """
+    decisions = {
+        decision: coordinator_intent_decisions.get(decision=decision)
+        for decision in ("planner", "reply", "llm")
+    }
+    total = sum(decisions.values())
+    agree = coordinator_intent_checks.get(result="agree")
+    disagree = coordinator_intent_checks.get(result="disagree")
+    return {
+        "decisions": decisions,
+        "shortcut_rate": (
+            round((decisions["planner"] + decisions["reply"]) / total, 4)
+            if total
+            else 0.0
+        ),
+        "time_saved_seconds": round(coordinator_time_saved.get(), 3),
+        "checks": {"agree": agree, "disagree": disagree},
+        "disagreement_rate": (
+            round(disagree / (agree + disagree), 4) if agree + disagree else 0.0
+        ),
+    }
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    记录LLM调用的首个token耗时、总耗时、token用量和错误次数，按调用所在的图节点(Agent)分类。
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        # run_id -> [agent, 开始时间, 是否已收到首个token, 估算的提示词token数]
+        self._runs: dict[UUID, list] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[dict], prompts: list):
+        agent = (metadata or {}).get("langgraph_node", "unknown")
+        prompt_tokens = estimate_prompt_tokens(prompts)
+        with self._lock:
+            self._runs[run_id] = [agent, time.monotonic(), False, prompt_tokens]
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        self._start(
+            run_id, metadata, [message for batch in messages for message in batch]
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata, prompts)
+
+    def _count_tokens(self, agent: str, input_tokens: int, output_tokens: int):
+        if input_tokens:
+            llm_tokens.inc(input_tokens, agent=agent, type="input")
+        if output_tokens:
+            llm_tokens.inc(output_tokens, agent=agent, type="output")
+
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run[2]:
+                return
+            run[2] = True
+        llm_time_to_first_token.observe(time.monotonic() - run[1], agent=run[0])
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs: Any):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        agent, started, streamed, _ = run
+        elapsed = time.monotonic() - started
+        llm_duration.observe(elapsed, agent=agent)
+        if not streamed:
+            # 非流式调用的首个token随完整响应一起到达
+            llm_time_to_first_token.observe(elapsed, agent=agent)
+        self._count_tokens(agent, *llm_token_usage(response))
+        cached_tokens = llm_cached_token_usage(response)
+        if cached_tokens:
+            llm_cached_tokens.inc(cached_tokens, agent=agent)
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs: Any):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        # GeneratorExit表示调用方读到需要的内容后主动关闭了流（如监督员提前路由），不算错误，
+        # 但已经消耗的token仍要计入
+        if isinstance(error, GeneratorExit):
+            self._count_tokens(
+                run[0], *closed_stream_usage(run[3], kwargs.get("response"))
+            )
+        else:
+            llm_errors.inc(agent=run[0])
+
+
+def _process_stats() -> list:
+    """进程累计使用的CPU时间，用于计算每个工作流的CPU开销。"""
+    return [
+        (
+            "process_cpu_seconds_total",
+            "counter",
+            "Total user and system CPU time spent in seconds",
+            [({}, time.process_time())],
+        ),
+    ]
+
+
+def _prompt_cache_stats() -> list:
+    """各Agent输入token中命中服务商前缀缓存的比例。"""
+    return [
+        (
+            "langmanus_llm_prompt_cache_hit_rate",
+            "gauge",
+            "Share of input tokens served from the provider's prompt prefix cache",
+            [
+                ({"agent": agent}, stats["hit_rate"])
+                for agent, stats in prompt_cache_stats().items()
+            ],
+        ),
+    ]
+
+
+registry.add_collector(_process_stats)
+registry.add_collector(_prompt_cache_stats)
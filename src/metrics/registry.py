@@ -0,0 +1,239 @@
+"""
+进程内的指标注册表，以Prometheus文本格式(0.0.4)输出。
+
+计数器、仪表和直方图在热路径上只做一次字典查找和一次加锁的加法；
+其他模块已有的统计（缓存命中率、调度器队列等）通过采集函数在抓取时读取，
+不需要在每次操作时额外记录。
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Iterable, Optional
+
+# 默认的耗时分桶（秒），覆盖从毫秒级的工具调用到数分钟的Agent节点
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# 采集函数返回的样本：(指标名, 类型, 说明, [(标签, 值), ...])
+Sample = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def label_sets(self) -> list[dict]:
+        """@returns {list} 已经记录过数值的所有标签组合。"""
+        with self._lock:
+            keys = sorted(self._values)
+        return [self._labels(key) for key in keys]
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            # 没有标签的指标在首次记录前也输出零值
+            items = [((), self._empty())]
+        for key, value in items:
+            lines.extend(self._sample_lines(self._labels(key), value))
+        return lines
+
+    def _empty(self):
+        return 0
+
+    def _sample_lines(self, labels: dict, value) -> list[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数器。"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值。"""
+
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """按分桶统计观测值的分布，同时记录总和与次数。"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        @param {str} name - 指标名。
+        @param {str} documentation - 指标说明。
+        @param {Iterable} labelnames - 标签名。
+        @param {Iterable} buckets - 分桶上界（升序），+Inf桶会自动加上。
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 每个桶只记录落在该桶内的次数，输出时再累加
+                state = self._values[key] = self._empty()
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, **labels) -> tuple[float, int]:
+        """@returns {tuple} (观测值总和, 观测次数)。"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state[1], state[2]) if state else (0.0, 0)
+
+    def _empty(self):
+        return [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+    def _sample_lines(self, labels: dict, state) -> list[str]:
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+            cumulative += bucket_count
+            bucket_labels = {**labels, "le": _format_value(float(bound))}
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    指标注册表。除了注册的指标外，还可以注册采集函数，在抓取时读取已有的统计。
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """
+        注册一个采集函数，每次抓取时调用。
+
+        @param {Callable} collector - 返回(指标名, 类型, 说明, [(标签, 值), ...])列表的函数。
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        以Prometheus文本格式输出所有指标。
+
+        @returns {str} 文本格式的指标。
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        for collector in collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -1,6 +1,7 @@
-from .template import apply_prompt_template, get_prompt_template
+from .template import apply_prompt_template, current_time, get_prompt_template
 
 __all__ = [
     "apply_prompt_template",
+    "current_time",
     "get_prompt_template",
 ]
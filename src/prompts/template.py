@@ -1,23 +1,107 @@
 import os
 import re
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 
-from langchain_core.prompts import PromptTemplate
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
+PROMPTS_DIR = os.path.dirname(__file__)
+
+# `<<VAR>>` placeholders in the markdown prompt files
+_VARIABLE_PATTERN = re.compile(r"<<([^>>]+)>>")
+
+CURRENT_TIME_FORMAT = "%a %b %d %Y %H:%M:%S %z"
+
+
+def current_time() -> str:
+    """Return the current time as rendered into the prompts' CURRENT_TIME."""
+    return datetime.now().strftime(CURRENT_TIME_FORMAT)
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """
+    A prompt file parsed once into literal segments and variable names.
+
+    The prompt files keep their variables (time, team members) in a block at
+    the end, so everything before the first variable is the same for every
+    call. Providers cache prompt prefixes, and only a byte-identical prefix
+    can be served from that cache.
+    """
+
+    mtime_ns: int
+    template: str
+    # Alternating literal text and variable names: literals at even indexes
+    parts: tuple[str, ...]
+
+    @classmethod
+    def compile(cls, text: str, mtime_ns: int) -> "CompiledPrompt":
+        # Escape curly braces using backslash
+        template = text.replace("{", "{{").replace("}", "}}")
+        # Replace `<<VAR>>` with `{VAR}`
+        template = _VARIABLE_PATTERN.sub(r"{\1}", template)
+        return cls(mtime_ns, template, tuple(_VARIABLE_PATTERN.split(text)))
+
+    @property
+    def static_prefix(self) -> str:
+        """The literal text before the first variable."""
+        return self.parts[0]
+
+    def format(self, **kwargs) -> str:
+        """Substitute variables, equivalent to PromptTemplate(template).format(**kwargs)."""
+        parts = self.parts
+        pieces = [parts[0]]
+        for i in range(1, len(parts), 2):
+            pieces.append(str(kwargs[parts[i]]))
+            pieces.append(parts[i + 1])
+        return "".join(pieces)
+
+
+class PromptRegistry:
+    """
+    Cache of compiled prompt templates.
+
+    Each prompt file is read and parsed once. Every lookup stats the file and
+    recompiles it when its mtime changes, so edits to the markdown prompts are
+    picked up without restarting the server.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._prompts: dict[str, CompiledPrompt] = {}
+        self._lock = threading.Lock()
+
+    def get(self, prompt_name: str) -> CompiledPrompt:
+        path = os.path.join(self.prompts_dir, f"{prompt_name}.md")
+        mtime_ns = os.stat(path).st_mtime_ns
+        prompt = self._prompts.get(prompt_name)
+        if prompt is not None and prompt.mtime_ns == mtime_ns:
+            return prompt
+        with self._lock:
+            prompt = self._prompts.get(prompt_name)
+            if prompt is None or prompt.mtime_ns != mtime_ns:
+                with open(path) as f:
+                    prompt = CompiledPrompt.compile(f.read(), mtime_ns)
+                self._prompts[prompt_name] = prompt
+        return prompt
+
+    def clear(self):
+        with self._lock:
+            self._prompts.clear()
+
+
+prompt_registry = PromptRegistry()
+
 
 def get_prompt_template(prompt_name: str) -> str:
-    template = open(os.path.join(os.path.dirname(__file__), f"{prompt_name}.md")).read()
-    # Escape curly braces using backslash
-    template = template.replace("{", "{{").replace("}", "}}")
-    # Replace `<<VAR>>` with `{VAR}`
-    template = re.sub(r"<<([^>>]+)>>", r"{\1}", template)
-    return template
+    return prompt_registry.get(prompt_name).template
 
 
 def apply_prompt_template(prompt_name: str, state: AgentState) -> list:
-    system_prompt = PromptTemplate(
-        input_variables=["CURRENT_TIME"],
-        template=get_prompt_template(prompt_name),
-    ).format(CURRENT_TIME=datetime.now().strftime("%a %b %d %Y %H:%M:%S %z"), **state)
+    # A workflow pins CURRENT_TIME in its state when it starts, so all of its calls
+    # render the same system prompt and the provider can cache the history after it too
+    system_prompt = prompt_registry.get(prompt_name).format(
+        **{**state, "CURRENT_TIME": state.get("CURRENT_TIME") or current_time()}
+    )
     return [{"role": "system", "content": system_prompt}] + state["messages"]
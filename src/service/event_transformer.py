@@ -0,0 +1,314 @@
+"""
+将LangGraph的原生事件(astream_events v2)转换为前端事件。
+
+每次工作流运行创建一个独立的WorkflowEventTransformer，协调员的handoff检测等
+状态都保存在实例上，因此同一进程内并发的多个SSE请求互不干扰。
+"""
+
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_community.adapters.openai import convert_message_to_dict
+from langgraph.constants import TAG_NOSTREAM
+
+from src.config import TEAM_MEMBERS
+
+# 协调员的前几个消息片段先缓存起来，用于识别"handoff"指令
+MAX_CACHE_SIZE = 2
+
+# 定义哪些Agent的LLM调用需要被流式传输，TEAM_MEMBERS包括了四种Agent：researcher、coder、browser、reporter，
+# 另外，planner和coordinator也需要被流式传输，因为它们是工作流的入口和出口。
+# 那为什么supervisor不需要被流式传输呢？
+STREAMING_LLM_AGENTS = [*TEAM_MEMBERS, "planner", "coordinator"]
+
+# 客户端可以订阅的事件类别。start_of_workflow和end_of_workflow总是会发送。
+#   agents    - start_of_agent / end_of_agent
+#   llm       - start_of_llm / end_of_llm，以及message事件中的content增量
+#   reasoning - message事件中的reasoning_content增量
+#   tools     - tool_call / tool_call_result
+#   plan      - plan_step
+EVENT_FAMILIES = ("agents", "llm", "reasoning", "tools", "plan")
+
+# 前端事件所属的类别；message事件按增量字段区分
+_EVENT_FAMILY = {
+    "start_of_agent": "agents",
+    "end_of_agent": "agents",
+    "start_of_llm": "llm",
+    "end_of_llm": "llm",
+    "tool_call": "tools",
+    "tool_call_result": "tools",
+    "plan_step": "plan",
+}
+
+
+def astream_event_filters(event_families: Optional[list[str]], root_name: str) -> dict:
+    """
+    将订阅的事件类别转换为astream_events的include/exclude参数，在事件产生处就丢弃不需要的事件，
+    而不是全部接收后再在转换时丢弃。
+
+    @param {list|None} event_families - 订阅的事件类别，None表示全部。
+    @param {str} root_name - 图的名称；图本身的结束事件中包含最终输出，必须保留。
+    @returns {dict} 传给graph.astream_events的关键字参数。
+    """
+    families = set(EVENT_FAMILIES if event_families is None else event_families)
+    # planner节点的开始事件同时标志着工作流的开始
+    include_names = [root_name, "planner"]
+    include_types = []
+    if "agents" in families:
+        include_names += STREAMING_LLM_AGENTS
+    if families & {"llm", "reasoning"}:
+        include_types.append("chat_model")
+    if "llm" in families:
+        # 协调员预分类器给出的模板回复
+        include_types.append("coordinator_reply")
+    if "tools" in families:
+        include_types.append("tool")
+    if "plan" in families:
+        # 自定义事件的类型即事件名称
+        include_types.append("plan_step")
+    return {
+        "include_names": include_names,
+        "include_types": include_types,
+        # 监督员等不需要流式输出的LLM调用带有该标签
+        "exclude_tags": [TAG_NOSTREAM],
+    }
+
+
+class WorkflowEventTransformer:
+    """
+    单次工作流运行的事件转换器。
+    """
+
+    def __init__(
+        self,
+        workflow_id: str,
+        user_input_messages: list,
+        event_families: Optional[list[str]] = None,
+    ):
+        """
+        @param {str} workflow_id - 工作流ID。
+        @param {list} user_input_messages - 用户的请求消息列表。
+        @param {list|None} event_families - 订阅的事件类别（见EVENT_FAMILIES），None表示全部。
+        """
+        self.workflow_id = workflow_id
+        self.user_input_messages = user_input_messages
+        self.event_families = set(EVENT_FAMILIES if event_families is None else event_families)
+        # 协调员消息片段的缓存，以及本次运行是否识别到了handoff
+        self.coordinator_cache: list[str] = []
+        self.is_handoff_case = False
+        # 最后一个事件的data，图结束时其中包含图的最终输出
+        self.last_data: dict = {}
+        # 按LangGraph事件类型分派的处理函数
+        self._handlers = {
+            "on_chain_start": self._on_chain_start,
+            "on_chain_end": self._on_chain_end,
+            "on_chat_model_start": self._on_chat_model_start,
+            "on_chat_model_end": self._on_chat_model_end,
+            "on_chat_model_stream": self._on_chat_model_stream,
+            "on_custom_event": self._on_custom_event,
+            "on_tool_start": self._on_tool_start,
+            "on_tool_end": self._on_tool_end,
+        }
+
+    def transform(self, event: dict) -> list[dict]:
+        """
+        转换一个LangGraph事件。
+
+        @param {dict} event - astream_events产生的原生事件。
+        @returns {list} 需要发送给前端的事件（可能为空，也可能有多个）。
+        """
+        self.last_data = event.get("data")
+        handler = self._handlers.get(event.get("event"))
+        if handler is None:
+            # 忽略其他不关心的事件
+            return []
+        metadata = event.get("metadata") or {}
+        checkpoint_ns = metadata.get("checkpoint_ns")
+        node = "" if checkpoint_ns is None else checkpoint_ns.split(":")[0]
+        return [
+            ydata
+            for ydata in handler(event, node, metadata)
+            if self._subscribed(ydata)
+        ]
+
+    def _subscribed(self, ydata: dict) -> bool:
+        family = _EVENT_FAMILY.get(ydata["event"])
+        if ydata["event"] == "message":
+            family = "reasoning" if "reasoning_content" in ydata["data"]["delta"] else "llm"
+        return family is None or family in self.event_families
+
+    def _agent_id(self, name: str, metadata: dict) -> str:
+        langgraph_step = metadata.get("langgraph_step")
+        return f"{self.workflow_id}_{name}_{'' if langgraph_step is None else langgraph_step}"
+
+    def _on_chain_start(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        name = event.get("name")
+        if name not in STREAMING_LLM_AGENTS:
+            return []
+        events = []
+        if name == "planner":
+            # 当planner开始时，认为是整个工作流的开始
+            events.append(
+                {
+                    "event": "start_of_workflow",
+                    "data": {"workflow_id": self.workflow_id, "input": self.user_input_messages},
+                }
+            )
+        events.append(
+            {
+                "event": "start_of_agent",
+                "data": {"agent_name": name, "agent_id": self._agent_id(name, metadata)},
+            }
+        )
+        return events
+
+    def _on_chain_end(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        name = event.get("name")
+        if name not in STREAMING_LLM_AGENTS:
+            return []
+        return [
+            {
+                "event": "end_of_agent",
+                "data": {"agent_name": name, "agent_id": self._agent_id(name, metadata)},
+            }
+        ]
+
+    def _on_chat_model_start(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if node not in STREAMING_LLM_AGENTS:
+            return []
+        return [{"event": "start_of_llm", "data": {"agent_name": node}}]
+
+    def _on_chat_model_end(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if node not in STREAMING_LLM_AGENTS:
+            return []
+        return [{"event": "end_of_llm", "data": {"agent_name": node}}]
+
+    def _on_chat_model_stream(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if node not in STREAMING_LLM_AGENTS:
+            return []
+        ydata = self._message_event(node, event["data"]["chunk"])
+        return [] if ydata is None else [ydata]
+
+    def _on_custom_event(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if event.get("name") == "coordinator_reply":
+            # 与协调员LLM的流式回复一样，以message事件发送
+            data = event["data"]
+            return [
+                {
+                    "event": "message",
+                    "data": {
+                        "message_id": data["message_id"],
+                        "delta": {"content": data["content"]},
+                    },
+                }
+            ]
+        if event.get("name") != "plan_step":
+            return []
+        # 规划师每生成完一个步骤就推送给前端，不必等待整个计划
+        return [{"event": "plan_step", "data": {"agent_name": "planner", **event["data"]}}]
+
+    def _tool_call_id(self, event: dict, node: str) -> str:
+        run_id = "" if event.get("run_id") is None else str(event["run_id"])
+        return f"{self.workflow_id}_{node}_{event.get('name')}_{run_id}"
+
+    def _on_tool_start(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if node not in TEAM_MEMBERS:
+            return []
+        return [
+            {
+                "event": "tool_call",
+                "data": {
+                    "tool_call_id": self._tool_call_id(event, node),
+                    "tool_name": event.get("name"),
+                    "tool_input": event["data"].get("input"),
+                },
+            }
+        ]
+
+    def _on_tool_end(self, event: dict, node: str, metadata: dict) -> list[dict]:
+        if node not in TEAM_MEMBERS:
+            return []
+        return [
+            {
+                "event": "tool_call_result",
+                "data": {
+                    "tool_call_id": self._tool_call_id(event, node),
+                    "tool_name": event.get("name"),
+                    # "tool_result": data["output"].content if data.get("output") else "",
+                    "tool_result": event["data"].get("output", ""),
+                },
+            }
+        ]
+
+    def _message_event(self, node: str, chunk) -> Optional[dict]:
+        """
+        将LLM的流式片段转换为message事件；需要跳过该片段时返回None。
+        """
+        content = chunk.content
+        if content is None or content == "":
+            if not chunk.additional_kwargs.get("reasoning_content"):
+                # 跳过空消息或不包含推理内容的消息
+                return None
+            return {
+                "event": "message",
+                "data": {
+                    "message_id": chunk.id,
+                    "delta": {"reasoning_content": chunk.additional_kwargs["reasoning_content"]},
+                },
+            }
+
+        # 对coordinator的特殊处理，用于识别"handoff"指令
+        if node == "coordinator":
+            if len(self.coordinator_cache) < MAX_CACHE_SIZE:
+                self.coordinator_cache.append(content)
+                cached_content = "".join(self.coordinator_cache)
+                if cached_content.startswith("handoff"):
+                    self.is_handoff_case = True
+                    return None
+                if len(self.coordinator_cache) < MAX_CACHE_SIZE:
+                    return None
+                # 缓存满了，发送缓存的消息
+                content = cached_content
+            elif self.is_handoff_case:
+                # handoff指令本身不发送给前端
+                return None
+
+        return {
+            "event": "message",
+            "data": {
+                "message_id": chunk.id,
+                "delta": {"content": content},
+            },
+        }
+
+    def end_of_workflow(self, token_usage: Optional[dict] = None) -> dict:
+        """
+        生成工作流结束事件，其中包含图最终输出中的消息、路由统计和Token用量。
+
+        @param {dict|None} token_usage - 本次运行的Token用量，不提供时取最终状态中的快照。
+        @returns {dict} end_of_workflow事件。
+        """
+        final_messages = []
+        # 从最终的输出中提取消息
+        # 最后一个事件(图本身的on_chain_end)的data中包含了图的最终输出
+        final_output = (self.last_data or {}).get("output", {})
+        messages_to_process = final_output.get("messages", [])
+        for msg in messages_to_process:
+            if isinstance(msg, BaseMessage):
+                # 如果是LangChain的消息对象，则进行转换
+                final_messages.append(convert_message_to_dict(msg))
+            elif isinstance(msg, dict) and "role" in msg and "content" in msg:
+                # 如果已经是我们期望的字典格式，则直接使用
+                final_messages.append(msg)
+
+        return {
+            "event": "end_of_workflow",
+            "data": {
+                "workflow_id": self.workflow_id,
+                "messages": final_messages,
+                "routing_stats": final_output.get("routing_stats", {}),
+                "token_usage": (
+                    token_usage if token_usage is not None else final_output.get("token_usage", {})
+                ),
+            },
+        }
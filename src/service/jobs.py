@@ -0,0 +1,218 @@
+"""
+后台工作流任务。
+
+工作流在后台任务中运行，生命周期与SSE连接无关：客户端断开后工作流继续执行，
+产生的事件写入每个任务的有界环形缓冲区，客户端重连时通过Last-Event-ID
+只接收断开期间错过的事件，不需要重新提交工作流、重复支付LLM调用的费用。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncGenerator, Optional
+
+from .scheduler import Admission
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobNotFoundError(KeyError):
+    """找不到指定的任务（不存在或已过了保留时间）。"""
+
+
+class JobConflictError(ValueError):
+    """同一ID的任务仍在运行。"""
+
+
+class WorkflowJob:
+    """
+    一个后台运行的工作流及其事件日志。
+
+    每个事件被分配一个从1开始递增的序号作为SSE的id；缓冲区满时丢弃最早的事件。
+    """
+
+    def __init__(self, job_id: str, buffer_size: int):
+        """
+        @param {str} job_id - 任务ID，同时也是工作流ID。
+        @param {int} buffer_size - 事件环形缓冲区的容量。
+        """
+        self.id = job_id
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_event_id = 0
+        self._events: deque[tuple[int, dict]] = deque(maxlen=buffer_size)
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def append(self, event: dict):
+        """追加一个事件并唤醒等待中的订阅者。"""
+        self.last_event_id += 1
+        self._events.append((self.last_event_id, event))
+        self._notify()
+
+    def finish(self, status: str, error: Optional[str] = None):
+        """将任务标记为结束并唤醒所有订阅者。"""
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        # 每次变化都换一个新的Event，订阅者等待的是它检查状态时的那一个
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def events(self, last_event_id: int = 0) -> AsyncGenerator[tuple[int, dict], None]:
+        """
+        订阅任务的事件：先重放缓冲区中序号大于last_event_id的事件，再实时推送新事件，
+        任务结束且事件全部发出后停止。
+
+        @param {int} last_event_id - 客户端已收到的最后一个事件序号，0表示从头开始。
+        @returns {AsyncGenerator} (序号, 事件)的异步生成器。
+        """
+        cursor = last_event_id
+        while True:
+            if self._events and self._events[0][0] > cursor + 1:
+                # 错过的事件已经被挤出缓冲区，告知客户端缺失的范围
+                first_id = self._events[0][0]
+                yield first_id - 1, {
+                    "event": "events_dropped",
+                    "data": {"from_id": cursor + 1, "to_id": first_id - 1},
+                }
+                cursor = first_id - 1
+            for event_id, event in list(self._events):
+                if event_id > cursor:
+                    cursor = event_id
+                    yield event_id, event
+            if cursor < self.last_event_id:
+                continue
+            if self.finished:
+                return
+            await self._changed.wait()
+
+    def cancel(self) -> bool:
+        """
+        取消任务。
+
+        @returns {bool} 任务是否仍在进行中（即本次取消是否生效）。
+        """
+        if self.finished or self._task is None:
+            return False
+        self._task.cancel()
+        return True
+
+    def to_dict(self) -> dict:
+        """任务的状态，用于状态查询接口。"""
+        return {
+            "workflow_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_event_id": self.last_event_id,
+            "first_buffered_event_id": self._events[0][0] if self._events else None,
+        }
+
+
+class JobManager:
+    """
+    管理后台工作流任务，并在任务结束一段时间后释放其事件日志。
+    同时运行的工作流数量只由WorkflowScheduler限制，与/api/chat/stream共用同一组名额。
+    """
+
+    def __init__(self, buffer_size: int, retention_seconds: float):
+        """
+        @param {int} buffer_size - 每个任务的事件缓冲区容量。
+        @param {float} retention_seconds - 任务结束后保留其状态和事件的秒数。
+        """
+        self.buffer_size = buffer_size
+        self.retention_seconds = retention_seconds
+        self._jobs: dict[str, WorkflowJob] = {}
+        # 任务 -> 准入凭证，任务结束（包括开始执行前就被取消）时归还
+        self._admissions: dict[WorkflowJob, Admission] = {}
+
+    def submit(
+        self, job_id: str, events: AsyncGenerator[dict, None], admission: Optional[Admission] = None
+    ) -> WorkflowJob:
+        """
+        提交一个工作流，在后台运行并记录其事件。必须在事件循环中调用。
+
+        @param {str} job_id - 任务ID。
+        @param {AsyncGenerator} events - 工作流的事件流（如run_agent_workflow的返回值），在后台被消费。
+        @param {Admission|None} admission - 工作流的准入凭证，任务结束时归还。
+        @returns {WorkflowJob} 新建的任务。
+        @raises {JobConflictError} 同一ID的任务仍在运行时抛出。
+        """
+        existing = self._jobs.get(job_id)
+        if existing is not None and not existing.finished:
+            raise JobConflictError(f"工作流仍在运行: {job_id}")
+        job = WorkflowJob(job_id, self.buffer_size)
+        self._jobs[job_id] = job
+        if admission is not None:
+            self._admissions[job] = admission
+        job._task = asyncio.create_task(self._run(job, events), name=f"workflow-{job_id}")
+        job._task.add_done_callback(lambda task: self._on_done(job, task))
+        return job
+
+    def get(self, job_id: str) -> WorkflowJob:
+        """
+        @raises {JobNotFoundError} 任务不存在时抛出。
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    async def _run(self, job: WorkflowJob, events: AsyncGenerator[dict, None]):
+        try:
+            async for event in events:
+                if job.status == PENDING and event.get("event") != "queued":
+                    # 获得调度器的名额后工作流才真正开始
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                job.append(event)
+        finally:
+            await events.aclose()
+
+    def _on_done(self, job: WorkflowJob, task: asyncio.Task):
+        # 在完成回调中处理结果：开始执行前就被取消的任务，其协程根本不会运行，
+        # 事件流的finally也不会执行，因此在这里归还准入名额
+        admission = self._admissions.pop(job, None)
+        if admission is not None:
+            admission.release()
+        if task.cancelled():
+            logger.info(f"工作流已取消: {job.id}")
+            job.append({"event": "workflow_cancelled", "data": {"workflow_id": job.id}})
+            job.finish(CANCELLED)
+        elif (error := task.exception()) is not None:
+            logger.error(f"工作流执行出错: {job.id}: {error}")
+            job.append(
+                {"event": "workflow_failed", "data": {"workflow_id": job.id, "error": str(error)}}
+            )
+            job.finish(FAILED, str(error))
+        else:
+            job.finish(COMPLETED)
+        asyncio.get_running_loop().call_later(self.retention_seconds, self._expire, job)
+
+    def _expire(self, job: WorkflowJob):
+        # 同一ID可能已经提交了新的任务，只移除这个已结束的任务
+        if self._jobs.get(job.id) is job:
+            del self._jobs[job.id]
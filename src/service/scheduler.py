@@ -0,0 +1,182 @@
+"""
+工作流的准入控制。
+
+同时运行的工作流数量有上限，超出的请求按先后顺序排队，排队中的客户端会收到
+queued事件告知其位置；队列也有上限，满了之后新请求直接被拒绝，而不是让所有
+工作流一起变慢、一起触发模型服务商的限流。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncGenerator, Optional
+
+
+class QueueFullError(RuntimeError):
+    """等待队列已满。"""
+
+
+class SchedulerClosedError(RuntimeError):
+    """调度器已关闭（服务正在停止），不再接受新的工作流。"""
+
+
+class Admission:
+    """
+    一个工作流的准入凭证：要么已获得运行名额，要么在等待队列中。
+    """
+
+    def __init__(self, scheduler: "WorkflowScheduler", granted: bool):
+        self._scheduler = scheduler
+        self.granted = granted
+        self.enqueued_at = time.monotonic()
+        self._released = False
+
+    @property
+    def position(self) -> Optional[int]:
+        """在等待队列中的位置（从1开始），已获得名额时为None。"""
+        if self.granted:
+            return None
+        return self._scheduler._position(self)
+
+    def release(self):
+        """归还名额，或者离开等待队列。可以重复调用。"""
+        if self._released:
+            return
+        self._released = True
+        self._scheduler._release(self)
+
+
+class WorkflowScheduler:
+    """
+    限制同时运行的工作流数量，并维护一个有界的先进先出等待队列。
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        """
+        @param {int} max_concurrent - 同时运行的工作流数量上限，0表示不限制。
+        @param {int} max_queue - 等待队列的长度上限。
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.closed = False
+        self._running = 0
+        self._waiters: deque[Admission] = deque()
+        # 队列每次变化都换一个新的Event，等待中的工作流据此更新自己的位置
+        self._changed = asyncio.Event()
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0}
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def admit(self) -> Admission:
+        """
+        申请运行一个工作流。有空闲名额时立即获得名额，否则进入等待队列。
+
+        @returns {Admission} 准入凭证，工作流结束后必须调用其release()。
+        @raises {QueueFullError} 等待队列已满时抛出。
+        @raises {SchedulerClosedError} 调度器已关闭时抛出。
+        """
+        if self.closed:
+            raise SchedulerClosedError("服务正在停止，不再接受新的工作流")
+        if not self._waiters and (
+            self.max_concurrent <= 0 or self._running < self.max_concurrent
+        ):
+            self._running += 1
+            self._record_wait(0.0)
+            return Admission(self, granted=True)
+        if len(self._waiters) >= self.max_queue:
+            self._count("rejected")
+            raise QueueFullError(f"等待队列已满（{self.max_queue}）")
+        admission = Admission(self, granted=False)
+        self._waiters.append(admission)
+        self._count("queued")
+        self._notify()
+        return admission
+
+    async def run(
+        self, admission: Admission, events: AsyncGenerator[dict, None]
+    ) -> AsyncGenerator[dict, None]:
+        """
+        在获得名额后运行工作流的事件流；排队期间，每当位置变化就产生一个queued事件。
+        无论正常结束、出错还是客户端断开，结束时都会归还名额。
+
+        @param {Admission} admission - admit()返回的准入凭证。
+        @param {AsyncGenerator} events - 工作流的事件流，获得名额后才开始消费。
+        @returns {AsyncGenerator} queued事件与工作流的事件。
+        """
+        try:
+            last_position = None
+            while not admission.granted:
+                changed = self._changed
+                position = admission.position
+                if position != last_position:
+                    last_position = position
+                    yield {
+                        "event": "queued",
+                        "data": {"position": position, "running": self._running},
+                    }
+                await changed.wait()
+            async for event in events:
+                yield event
+        finally:
+            admission.release()
+            await events.aclose()
+
+    def close(self):
+        """停止接受新的工作流；已经运行或排队的工作流不受影响。"""
+        self.closed = True
+
+    def get_stats(self) -> dict:
+        """
+        调度器的指标：运行中和排队中的工作流数量、累计的准入/排队/拒绝次数，以及等待时间。
+
+        @returns {dict} 指标字典。
+        """
+        with self._lock:
+            return {
+                "running": self._running,
+                "queue_depth": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                **self._stats,
+                "wait_seconds_avg": self._wait_total / self._wait_count if self._wait_count else 0.0,
+                "wait_seconds_max": self._wait_max,
+            }
+
+    def _position(self, admission: Admission) -> Optional[int]:
+        try:
+            return self._waiters.index(admission) + 1
+        except ValueError:
+            return None
+
+    def _release(self, admission: Admission):
+        if admission.granted:
+            self._running -= 1
+        else:
+            self._waiters.remove(admission)
+        # 按先后顺序把空出的名额交给排队中的工作流
+        while self._waiters and (
+            self.max_concurrent <= 0 or self._running < self.max_concurrent
+        ):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._running += 1
+            self._record_wait(time.monotonic() - waiter.enqueued_at)
+        self._notify()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_wait(self, seconds: float):
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._wait_count += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
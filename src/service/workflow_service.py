@@ -1,9 +1,26 @@
+import asyncio
 import logging
-import json # 确保导入json模块
-from src.config import TEAM_MEMBERS
-from src.graph import build_graph
-from langchain_core.messages import BaseMessage # 导入BaseMessage用于类型检查
-from langchain_community.adapters.openai import convert_message_to_dict
+from contextlib import contextmanager
+from typing import Optional
+from src.config import (
+    TEAM_MEMBERS,
+    FAN_OUT_ENABLED,
+    CHECKPOINT_ENABLED,
+    WORKFLOW_TOKEN_BUDGET,
+    AGENT_TOKEN_BUDGETS,
+    TOKEN_BUDGET_DEGRADE_RATIO,
+)
+from src.graph import build_graph, SqliteCheckpointSaver
+from src.graph.budget import CONFIG_KEY_TOKEN_BUDGET, TokenBudget
+from src.metrics import LLMMetricsCallback, active_workflows
+from src.prompts import current_time
+from src.tools.cancellation import (
+    CONFIG_KEY_CANCELLATION,
+    CancellationToken,
+    InflightWorkTracker,
+    cancellation_stats,
+)
+from .event_transformer import WorkflowEventTransformer, astream_event_filters
 import uuid
 
 # Configure logging
@@ -22,13 +39,55 @@ def enable_debug_logging():
 logger = logging.getLogger(__name__)
 
 # Create the graph
-# 在模块加载时构建并编译LangGraph图
-graph = build_graph()
+# 在模块加载时构建并编译LangGraph图；启用检查点时，每个工作流的状态按workflow_id持久化到SQLite
+graph = build_graph(
+    fan_out=FAN_OUT_ENABLED,
+    checkpointer=SqliteCheckpointSaver() if CHECKPOINT_ENABLED else None,
+)
+
+# 记录各Agent的LLM耗时与token用量，所有工作流共用同一个实例
+llm_metrics = LLMMetricsCallback()
+
+# 正在执行的工作流ID。流式、恢复和后台任务三条路径共用，同一个thread同时只有一次运行
+_running_workflows: set[str] = set()
+
 
-# Cache for coordinator messages
-# 为协调员(coordinator)的消息设置缓存，用于处理特殊的"handoff"逻辑
-coordinator_cache = []
-MAX_CACHE_SIZE = 2
+class WorkflowConflictError(ValueError):
+    """workflow_id已被占用：同一ID的工作流正在运行，或新的工作流使用了已有检查点的ID。"""
+
+
+async def check_workflow_id(workflow_id: Optional[str]):
+    """
+    在提交新的工作流前检查客户端指定的ID，使冲突能以HTTP错误返回；工作流开始执行时还会再检查一次。
+
+    @param {str|None} workflow_id - 客户端指定的工作流ID，None表示由服务端生成。
+    @raises {WorkflowConflictError} 该ID的工作流正在运行，或启用检查点时该ID已有检查点。
+    """
+    if workflow_id is None:
+        return
+    if workflow_id in _running_workflows:
+        raise WorkflowConflictError(f"工作流正在运行: {workflow_id}")
+    config = _workflow_config(workflow_id)
+    if config is not None and (await graph.aget_state(config)).values:
+        # 复用ID会接着该thread的历史和状态继续运行，继续执行应走/api/chat/resume
+        raise WorkflowConflictError(f"工作流ID已被使用: {workflow_id}，恢复该工作流请使用/api/chat/resume")
+
+
+@contextmanager
+def _claim_workflow(workflow_id: str):
+    """
+    在执行期间占用workflow_id，防止两次运行同时写入同一个thread。
+
+    @param {str} workflow_id - 工作流ID。
+    @raises {WorkflowConflictError} 同一ID的工作流正在运行时抛出。
+    """
+    if workflow_id in _running_workflows:
+        raise WorkflowConflictError(f"工作流正在运行: {workflow_id}")
+    _running_workflows.add(workflow_id)
+    try:
+        yield
+    finally:
+        _running_workflows.discard(workflow_id)
 
 
 async def run_agent_workflow(
@@ -36,6 +95,10 @@ async def run_agent_workflow(
     debug: bool = False,
     deep_thinking_mode: bool = False,
     search_before_planning: bool = False,
+    plan_driven_routing: bool = False,
+    workflow_id: Optional[str] = None,
+    event_families: Optional[list[str]] = None,
+    token_budget: Optional[int] = None,
 ):
     """
     根据给定的用户输入运行Agent工作流。
@@ -45,7 +108,13 @@ async def run_agent_workflow(
     @param {bool} debug - 如果为True，则启用DEBUG级别的日志记录。
     @param {bool} deep_thinking_mode - 是否启用深度思考模式。
     @param {bool} search_before_planning - 是否在规划前进行搜索。
+    @param {bool} plan_driven_routing - 是否按规划师的计划确定性地路由，跳过多余的监督员LLM调用。
+    @param {str|None} workflow_id - 工作流ID，不提供时自动生成。启用检查点时可用它恢复中断的工作流，
+                                    但不能用于新的工作流，见check_workflow_id。
+    @param {list|None} event_families - 订阅的事件类别（见EVENT_FAMILIES），None表示全部。
+    @param {int|None} token_budget - 本次请求的Token预算，0表示不限制，None表示使用WORKFLOW_TOKEN_BUDGET。
     @returns {AsyncGenerator} 一个异步生成器，持续产生符合SSE格式的事件字典。
+    @raises {WorkflowConflictError} 指定的workflow_id正在运行或已有检查点时抛出。
     """
     if not user_input_messages:
         raise ValueError("输入不能为空")
@@ -55,180 +124,157 @@ async def run_agent_workflow(
 
     logger.info(f"使用用户输入启动工作流: {user_input_messages}")
 
+    # 客户端指定的ID可能已被占用，排队期间也可能被其他请求用掉，开始执行时再检查一次
+    await check_workflow_id(workflow_id)
     # 为本次工作流生成一个唯一的ID
-    workflow_id = str(uuid.uuid4())
+    workflow_id = workflow_id or str(uuid.uuid4())
 
-    # 定义哪些Agent的LLM调用需要被流式传输，TEAM_MEMBERS包括了四种Agent：researcher、coder、browser、reporter，
-    # 另外，planner和coordinator也需要被流式传输，因为它们是工作流的入口和出口。
-    # 那为什么supervisor不需要被流式传输呢？
-    streaming_llm_agents = [*TEAM_MEMBERS, "planner", "coordinator"]
+    graph_input = {
+        # 传入图的常量
+        "TEAM_MEMBERS": TEAM_MEMBERS,
+        "CURRENT_TIME": current_time(),
+        # 传入图的运行时变量
+        "messages": user_input_messages,
+        "deep_thinking_mode": deep_thinking_mode,
+        "search_before_planning": search_before_planning,
+        "routing_mode": "plan" if plan_driven_routing else "llm",
+        "plan_step_index": 0,
+    }
+    budget = TokenBudget(
+        WORKFLOW_TOKEN_BUDGET if token_budget is None else token_budget,
+        AGENT_TOKEN_BUDGETS,
+        TOKEN_BUDGET_DEGRADE_RATIO,
+    )
+    with _claim_workflow(workflow_id):
+        async for event in _stream_workflow(
+            graph_input, workflow_id, user_input_messages, event_families, budget
+        ):
+            yield event
 
-    # 在每次工作流开始时重置缓存
-    global coordinator_cache
-    coordinator_cache = []
-    global is_handoff_case
-    is_handoff_case = False
 
-    # 异步地流式执行图，并处理每个产生的事件
-    # TODO: 优化消息内容的提取，特别是针对 on_chat_model_stream 事件
-    async for event in graph.astream_events(
-        {
-            # 传入图的常量
-            "TEAM_MEMBERS": TEAM_MEMBERS,
-            # 传入图的运行时变量
-            "messages": user_input_messages,
-            "deep_thinking_mode": deep_thinking_mode,
-            "search_before_planning": search_before_planning,
+async def resume_agent_workflow(
+    workflow_id: str, debug: bool = False, event_families: Optional[list[str]] = None
+):
+    """
+    从最后一个完成的节点恢复一个被中断的工作流（需要启用检查点）。
+
+    @param {str} workflow_id - 要恢复的工作流ID。
+    @param {bool} debug - 如果为True，则启用DEBUG级别的日志记录。
+    @param {list|None} event_families - 订阅的事件类别（见EVENT_FAMILIES），None表示全部。
+    @returns {AsyncGenerator} 与run_agent_workflow相同格式的事件流。
+    @raises {ValueError} 未启用检查点、找不到该工作流或该工作流已经完成时抛出。
+    @raises {WorkflowConflictError} 该工作流正在运行时抛出。
+    """
+    if graph.checkpointer is None:
+        raise ValueError("未启用检查点(CHECKPOINT_ENABLED)，无法恢复工作流")
+
+    if debug:
+        enable_debug_logging()
+
+    # 从排队到结束都占用该ID，检查点在此期间不会被另一次运行改写
+    with _claim_workflow(workflow_id):
+        snapshot = await graph.aget_state(_workflow_config(workflow_id))
+        if not snapshot.values:
+            raise ValueError(f"找不到工作流: {workflow_id}")
+        if not snapshot.next:
+            raise ValueError(f"工作流已经完成: {workflow_id}")
+
+        logger.info(f"从节点{snapshot.next}恢复工作流: {workflow_id}")
+        user_input_messages = [
+            msg for msg in snapshot.values.get("messages", []) if isinstance(msg, dict)
+        ]
+        yield {
+            "event": "start_of_workflow",
+            "data": {
+                "workflow_id": workflow_id,
+                "input": user_input_messages,
+                "resumed_from": list(snapshot.next),
+            },
+        }
+        # 从检查点中的用量快照继续累计，预算沿用原请求的设置
+        usage = snapshot.values.get("token_usage") or {}
+        budget = TokenBudget(
+            usage.get("limit", WORKFLOW_TOKEN_BUDGET),
+            usage.get("agent_limits", AGENT_TOKEN_BUDGETS),
+            TOKEN_BUDGET_DEGRADE_RATIO,
+            usage=usage,
+        )
+        # 输入为None时，LangGraph从该thread最后一个检查点继续执行
+        async for event in _stream_workflow(
+            None, workflow_id, user_input_messages, event_families, budget
+        ):
+            yield event
+
+
+def _workflow_config(workflow_id: str) -> Optional[dict]:
+    """启用检查点时，以workflow_id作为LangGraph的thread_id。"""
+    if graph.checkpointer is None:
+        return None
+    return {"configurable": {"thread_id": workflow_id}}
+
+
+async def _stream_workflow(
+    graph_input: Optional[dict],
+    workflow_id: str,
+    user_input_messages: list,
+    event_families: Optional[list[str]] = None,
+    budget: Optional[TokenBudget] = None,
+):
+    """
+    执行图并将LangGraph的原生事件转换为前端事件。
+
+    @param {dict|None} graph_input - 图的输入；恢复工作流时为None。
+    @param {str} workflow_id - 工作流ID。
+    @param {list} user_input_messages - 用户的请求消息列表。
+    @param {list|None} event_families - 订阅的事件类别，None表示全部。
+    @param {TokenBudget|None} budget - 本次运行的Token用量统计与预算，不提供时只统计不限制。
+    @returns {AsyncGenerator} 事件字典的异步生成器。
+    """
+    # 每次运行使用独立的转换器，并发的工作流之间不共享任何状态
+    transformer = WorkflowEventTransformer(workflow_id, user_input_messages, event_families)
+    # 取消令牌随config传给图中的节点和工具，用于中止任务取消无法触及的工作（线程、子进程、浏览器）
+    token = CancellationToken()
+    tracker = InflightWorkTracker()
+    # Token预算同样随config传递：作为回调统计每次LLM调用的用量，节点据此降级模型或提前结束
+    budget = budget or TokenBudget()
+    config = _workflow_config(workflow_id) or {}
+    config = {
+        **config,
+        "configurable": {
+            **config.get("configurable", {}),
+            CONFIG_KEY_CANCELLATION: token,
+            CONFIG_KEY_TOKEN_BUDGET: budget,
         },
+        "callbacks": [tracker, llm_metrics, budget],
+    }
+
+    # 异步地流式执行图，并处理每个产生的事件
+    events = graph.astream_events(
+        graph_input,
+        config=config,
         version="v2",  # 指定要运行的图的版本
-    ):
-        kind = event.get("event")
-        data = event.get("data")
-        name = event.get("name")
-        metadata = event.get("metadata")
-        node = (
-            ""
-            if (metadata.get("checkpoint_ns") is None)
-            else metadata.get("checkpoint_ns").split(":")[0]
-        )
-        langgraph_step = (
-            ""
-            if (metadata.get("langgraph_step") is None)
-            else str(metadata["langgraph_step"])
+        # 未订阅的事件在产生处就被过滤掉，不必生成后再丢弃
+        **astream_event_filters(event_families, graph.name),
+    )
+    active_workflows.inc()
+    try:
+        async for event in events:
+            for ydata in transformer.transform(event):
+                yield ydata
+    except (GeneratorExit, asyncio.CancelledError):
+        # 客户端断开或工作流被取消：节点任务此时已被取消，再中止它们留在线程、子进程和浏览器中的工作
+        token.cancel("客户端断开连接或工作流被取消")
+        aborted = tracker.aborted()
+        cancellation_stats.record_cancellation(aborted)
+        logger.info(
+            f"工作流已取消: {workflow_id}，中止了进行中的调用: "
+            f"{[(kind, name, round(seconds, 1)) for kind, name, seconds in aborted]}"
         )
-        run_id = "" if (event.get("run_id") is None) else str(event["run_id"])
-
-        # 根据事件类型(kind)和来源节点(name/node)，将LangGraph的原生事件
-        # 转换为前端可以理解的、标准化的事件格式。
-        if kind == "on_chain_start" and name in streaming_llm_agents:
-            if name == "planner":
-                # 当planner开始时，认为是整个工作流的开始
-                yield {
-                    "event": "start_of_workflow",
-                    "data": {"workflow_id": workflow_id, "input": user_input_messages},
-                }
-            ydata = {
-                "event": "start_of_agent",
-                "data": {
-                    "agent_name": name,
-                    "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
-                },
-            }
-        elif kind == "on_chain_end" and name in streaming_llm_agents:
-            ydata = {
-                "event": "end_of_agent",
-                "data": {
-                    "agent_name": name,
-                    "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
-                },
-            }
-        elif kind == "on_chat_model_start" and node in streaming_llm_agents:
-            ydata = {
-                "event": "start_of_llm",
-                "data": {"agent_name": node},
-            }
-        elif kind == "on_chat_model_end" and node in streaming_llm_agents:
-            ydata = {
-                "event": "end_of_llm",
-                "data": {"agent_name": node},
-            }
-        #如果事件类型
-        elif kind == "on_chat_model_stream" and node in streaming_llm_agents:
-            content = data["chunk"].content
-            if content is None or content == "":
-                if not data["chunk"].additional_kwargs.get("reasoning_content"):
-                    # 跳过空消息或不包含推理内容的消息
-                    continue
-                ydata = {
-                    "event": "message",
-                    "data": {
-                        "message_id": data["chunk"].id,
-                        "delta": {
-                            "reasoning_content": (
-                                data["chunk"].additional_kwargs["reasoning_content"]
-                            )
-                        },
-                    },
-                }
-            else:
-                # 对coordinator的特殊处理，用于识别"handoff"指令
-                if node == "coordinator":
-                    if len(coordinator_cache) < MAX_CACHE_SIZE:
-                        coordinator_cache.append(content)
-                        cached_content = "".join(coordinator_cache)
-                        if cached_content.startswith("handoff"):
-                            is_handoff_case = True
-                            continue
-                        if len(coordinator_cache) < MAX_CACHE_SIZE:
-                            continue
-                        # 缓存满了，发送缓存的消息
-                        ydata = {
-                            "event": "message",
-                            "data": {
-                                "message_id": data["chunk"].id,
-                                "delta": {"content": cached_content},
-                            },
-                        }
-                    elif not is_handoff_case:
-                        # 对于非handoff情况，直接发送消息
-                        ydata = {
-                            "event": "message",
-                            "data": {
-                                "message_id": data["chunk"].id,
-                                "delta": {"content": content},
-                            },
-                        }
-                else:
-                    # 对于其他Agent，直接发送消息
-                    ydata = {
-                        "event": "message",
-                        "data": {
-                            "message_id": data["chunk"].id,
-                            "delta": {"content": content},
-                        },
-                    }
-        elif kind == "on_tool_start" and node in TEAM_MEMBERS:
-            ydata = {
-                "event": "tool_call",
-                "data": {
-                    "tool_call_id": f"{workflow_id}_{node}_{name}_{run_id}",
-                    "tool_name": name,
-                    "tool_input": data.get("input"),
-                },
-            }
-        elif kind == "on_tool_end" and node in TEAM_MEMBERS:
-            ydata = {
-                "event": "tool_call_result",
-                "data": {
-                    "tool_call_id": f"{workflow_id}_{node}_{name}_{run_id}",
-                    "tool_name": name,
-                    # "tool_result": data["output"].content if data.get("output") else "",
-                    "tool_result": data.get("output", ""),
-                },
-            }
-        else:
-            # 忽略其他不关心的事件
-            continue
-        yield ydata
+        raise
+    finally:
+        active_workflows.dec()
+        # 立即关闭图的事件流，取消仍在运行的节点任务（包括进行中的LLM请求）
+        await events.aclose()
 
     # 在工作流正常结束后，发送工作流结束事件
-    # 之前的逻辑只在 is_handoff_case 为 True 时发送此事件，导致正常流程下连接中断
-    final_messages = []
-    # 从最终的输出中提取消息
-    # 'data' 变量来自 stream 事件循环的最后一个事件，其中包含了图的最终输出
-    messages_to_process = data.get("output", {}).get("messages", [])
-    for msg in messages_to_process:
-        if isinstance(msg, BaseMessage):
-            # 如果是LangChain的消息对象，则进行转换
-            final_messages.append(convert_message_to_dict(msg))
-        elif isinstance(msg, dict) and "role" in msg and "content" in msg:
-            # 如果已经是我们期望的字典格式，则直接使用
-            final_messages.append(msg)
-    
-    yield {
-        "event": "end_of_workflow",
-        "data": {
-            "workflow_id": workflow_id,
-            "messages": final_messages,
-        },
-    }
+    yield transformer.end_of_workflow(budget.usage())
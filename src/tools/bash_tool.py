@@ -1,7 +1,10 @@
 import logging
+import os
+import signal
 import subprocess
 from typing import Annotated
 from langchain_core.tools import tool
+from .cancellation import CancellationToken, cancellation_stats, current_token
 from .decorators import log_io
 
 # Initialize logger
@@ -16,6 +19,10 @@ def bash_tool(
     """Use this to execute bash command and do necessary operations."""
     logger.info(f"Executing Bash Command: {cmd}")
     try:
+        token = current_token()
+        if token is not None:
+            # Inside a workflow, run it so it can be killed if the workflow is cancelled
+            return _run_cancellable(cmd, token)
         # Execute the command and capture output
         result = subprocess.run(
             cmd, shell=True, check=True, text=True, capture_output=True
@@ -34,5 +41,45 @@ def bash_tool(
         return error_message
 
 
+def _run_cancellable(cmd: str, token: CancellationToken) -> str:
+    """
+    Run a command in its own process group and kill the group if the token is cancelled.
+
+    Args:
+        cmd: The bash command to be executed
+        token: The cancellation token of the calling workflow
+
+    Returns:
+        The command's stdout
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a non-zero code
+    """
+    process = subprocess.Popen(
+        cmd,
+        shell=True,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+
+    def kill():
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGKILL)
+            cancellation_stats.record("processes_killed")
+
+    unregister = token.register(kill)
+    try:
+        stdout, stderr = process.communicate()
+    finally:
+        unregister()
+    if token.cancelled:
+        return f"Command was cancelled: {token.reason}"
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return stdout
+
+
 if __name__ == "__main__":
     print(bash_tool.invoke("ls -all"))
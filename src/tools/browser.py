@@ -6,6 +6,7 @@ from langchain.tools import BaseTool
 from browser_use import AgentHistoryList, Browser, BrowserConfig
 from browser_use import Agent as BrowserAgent
 from src.agents.llm import vl_llm
+from src.tools.cancellation import cancellation_stats, on_cancel
 from src.tools.decorators import create_logged_tool
 from src.config import CHROME_INSTANCE_PATH
 
@@ -40,11 +41,15 @@ class BrowserTool(BaseTool):
             llm=vl_llm,
             browser=expected_browser,
         )
+        agent = self._agent
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                result = loop.run_until_complete(self._agent.run())
+                # Stopping the agent ends its run after the current step, which
+                # then closes the browser it opened
+                with on_cancel(lambda: _stop(agent)):
+                    result = loop.run_until_complete(agent.run())
                 return (
                     str(result)
                     if not isinstance(result, AgentHistoryList)
@@ -61,15 +66,24 @@ class BrowserTool(BaseTool):
             task=instruction, llm=vl_llm  # Will be set per request
         )
         try:
+            # Cancelling the task closes the browser in the agent's run()
             result = await self._agent.run()
             return (
                 str(result)
                 if not isinstance(result, AgentHistoryList)
                 else result.final_result
             )
+        except asyncio.CancelledError:
+            cancellation_stats.record("browser_sessions_closed")
+            raise
         except Exception as e:
             return f"Error executing browser task: {str(e)}"
 
 
+def _stop(agent: BrowserAgent):
+    agent.stop()
+    cancellation_stats.record("browser_sessions_closed")
+
+
 BrowserTool = create_logged_tool(BrowserTool)
 browser_tool = BrowserTool()
@@ -0,0 +1,224 @@
+import asyncio
+import ctypes
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import ensure_config
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowCancelledError(Exception):
+    """Raised inside work that was aborted because its workflow was cancelled."""
+
+
+class CancellationToken:
+    """
+    Signals that a workflow was cancelled to the work running on its behalf.
+
+    Asyncio work is cancelled with its task. The token is for work that task
+    cancellation cannot reach: tools running in worker threads, subprocesses
+    and browser sessions register a callback that aborts them.
+    """
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._callbacks: dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel the token and run the registered callbacks once."""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    def raise_if_cancelled(self):
+        if self.reason is not None:
+            raise WorkflowCancelledError(self.reason)
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Register a callback to run on cancellation.
+
+        Args:
+            callback: Called from the cancelling thread; runs immediately if the
+                token is already cancelled
+
+        Returns:
+            A function that unregisters the callback
+        """
+        with self._lock:
+            if self.reason is None:
+                callback_id = self._next_id
+                self._next_id += 1
+                self._callbacks[callback_id] = callback
+                return lambda: self._callbacks.pop(callback_id, None)
+        callback()
+        return lambda: None
+
+
+# Key of the workflow's token in the runnable config's "configurable" section
+CONFIG_KEY_CANCELLATION = "cancellation_token"
+
+
+def current_token() -> Optional[CancellationToken]:
+    """
+    Return the token of the workflow the caller runs in, if any.
+
+    The token travels in the runnable config, which LangChain propagates to
+    graph nodes, agents and tools, including tools run in executor threads.
+    """
+    return ensure_config().get("configurable", {}).get(CONFIG_KEY_CANCELLATION)
+
+
+@contextmanager
+def on_cancel(callback: Callable[[], None]) -> Iterator[None]:
+    """
+    Run callback if the current workflow is cancelled while the block runs.
+
+    Does nothing outside a workflow.
+    """
+    token = current_token()
+    if token is None:
+        yield
+        return
+    unregister = token.register(callback)
+    try:
+        yield
+    finally:
+        unregister()
+
+
+@contextmanager
+def interrupt_thread_on_cancel() -> Iterator[None]:
+    """
+    Raise WorkflowCancelledError in the calling thread if the workflow is cancelled.
+
+    The exception is delivered asynchronously at the thread's next bytecode, so
+    this interrupts Python code such as an exec()'d snippet but not a blocking
+    C call.
+    """
+    thread_id = threading.get_ident()
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def interrupt():
+        with lock:
+            if not done.is_set():
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(thread_id), ctypes.py_object(WorkflowCancelledError)
+                )
+                cancellation_stats.record("threads_interrupted")
+
+    with on_cancel(interrupt):
+        try:
+            yield
+        finally:
+            with lock:
+                done.set()
+
+
+class InflightWorkTracker(BaseCallbackHandler):
+    """
+    Callback handler that keeps track of the LLM and tool calls in flight.
+
+    When a workflow is cancelled, the calls that failed with a cancellation
+    error or are still in flight are the work its cancellation aborted.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._inflight: dict[UUID, tuple[str, str, float]] = {}
+        self._aborted: list[tuple[str, str, float]] = []
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, kind: str, serialized: Optional[dict], **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or kind
+        with self._lock:
+            self._inflight[run_id] = (kind, name, time.monotonic())
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None):
+        with self._lock:
+            call = self._inflight.pop(run_id, None)
+            if call is not None and isinstance(
+                error, (asyncio.CancelledError, WorkflowCancelledError)
+            ):
+                kind, name, started = call
+                self._aborted.append((kind, name, time.monotonic() - started))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm", serialized, **kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", serialized, **kwargs)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", serialized, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def aborted(self) -> list[tuple[str, str, float]]:
+        """Return (kind, name, seconds it had run) for every cancelled or still running call."""
+        now = time.monotonic()
+        with self._lock:
+            return self._aborted + [
+                (kind, name, now - started) for kind, name, started in self._inflight.values()
+            ]
+
+
+class CancellationStats:
+    """Thread-safe counters of cancelled workflows and the work their cancellation aborted."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def record_cancellation(self, inflight: list[tuple[str, str, float]]):
+        """Record a cancelled workflow and the calls that were in flight when it was cancelled."""
+        with self._lock:
+            self._counts["workflows_cancelled"] += 1
+            for kind, name, _ in inflight:
+                self._counts[f"{kind}_calls_aborted"] += 1
+                if kind == "tool":
+                    self._counts[f"tool_calls_aborted:{name}"] += 1
+
+    def get(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+cancellation_stats = CancellationStats()
@@ -1,15 +1,42 @@
 import logging
 import functools
-from typing import Any, Callable, Type, TypeVar
+import inspect
+import time
+from typing import Any, Callable, ClassVar, Type, TypeVar
+
+from langchain_core.tools import BaseTool
+
+from src.metrics import node_duration, node_errors, tool_duration, tool_errors
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
 
+class _timed:
+    """Context manager that observes the block's duration and counts the errors it raises."""
+
+    __slots__ = ("histogram", "errors", "labels", "started")
+
+    def __init__(self, histogram, errors, **labels: str):
+        self.histogram = histogram
+        self.errors = errors
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.errors.inc(**self.labels)
+        return False
+
+
 def log_io(func: Callable) -> Callable:
     """
-    A decorator that logs the input parameters and output of a tool function.
+    A decorator that logs the input parameters and output of a tool function
+    and records its latency and errors in the tool metrics.
 
     Args:
         func: The tool function to be decorated
@@ -17,21 +44,25 @@ def log_io(func: Callable) -> Callable:
     Returns:
         The wrapped function with input/output logging
     """
+    func_name = func.__name__
 
     @functools.wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
-        # Log input parameters
-        func_name = func.__name__
-        params = ", ".join(
-            [*(str(arg) for arg in args), *(f"{k}={v}" for k, v in kwargs.items())]
-        )
-        logger.debug(f"Tool {func_name} called with parameters: {params}")
+        # Only build the log message when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            params = ", ".join(
+                [*(str(arg) for arg in args), *(f"{k}={v}" for k, v in kwargs.items())]
+            )
+            logger.debug(f"Tool {func_name} called with parameters: {params}")
 
         # Execute the function
-        result = func(*args, **kwargs)
+        with _timed(tool_duration, tool_errors, tool=func_name):
+            result = func(*args, **kwargs)
 
         # Log the output
-        logger.debug(f"Tool {func_name} returned: {result}")
+        if debug:
+            logger.debug(f"Tool {func_name} returned: {result}")
 
         return result
 
@@ -39,10 +70,16 @@ def log_io(func: Callable) -> Callable:
 
 
 class LoggedToolMixin:
-    """A mixin class that adds logging functionality to any tool."""
+    """A mixin class that adds logging and latency/error metrics to any tool."""
+
+    # Whether the base tool implements _arun itself; BaseTool's default _arun
+    # calls _run in an executor, which is already measured
+    _native_arun: ClassVar[bool] = False
 
     def _log_operation(self, method_name: str, *args: Any, **kwargs: Any) -> None:
         """Helper method to log tool operations."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         tool_name = self.__class__.__name__.replace("Logged", "")
         params = ", ".join(
             [*(str(arg) for arg in args), *(f"{k}={v}" for k, v in kwargs.items())]
@@ -52,7 +89,20 @@ class LoggedToolMixin:
     def _run(self, *args: Any, **kwargs: Any) -> Any:
         """Override _run method to add logging."""
         self._log_operation("_run", *args, **kwargs)
-        result = super()._run(*args, **kwargs)
+        with _timed(tool_duration, tool_errors, tool=self.name):
+            result = super()._run(*args, **kwargs)
+        logger.debug(
+            f"Tool {self.__class__.__name__.replace('Logged', '')} returned: {result}"
+        )
+        return result
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        """Override _arun method to add logging."""
+        if not self._native_arun:
+            return await super()._arun(*args, **kwargs)
+        self._log_operation("_arun", *args, **kwargs)
+        with _timed(tool_duration, tool_errors, tool=self.name):
+            result = await super()._arun(*args, **kwargs)
         logger.debug(
             f"Tool {self.__class__.__name__.replace('Logged', '')} returned: {result}"
         )
@@ -71,7 +121,7 @@ def create_logged_tool(base_tool_class: Type[T]) -> Type[T]:
     """
 
     class LoggedTool(LoggedToolMixin, base_tool_class):
-        pass
+        _native_arun = base_tool_class._arun is not BaseTool._arun
 
     # Set a more descriptive name for the class
     LoggedTool.__name__ = f"Logged{base_tool_class.__name__}"
@@ -86,12 +136,25 @@ def track_node(node_name: str) -> Callable:
         node_name: The name of the node to be tracked.
 
     Returns:
-        A decorator that logs the entry into the specified node.
+        A decorator that logs the entry into the specified node and records
+        its latency and errors in the node metrics. Coroutine functions are
+        wrapped with a coroutine so they stay awaitable.
     """
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                logger.info(f"Entering node: {node_name}")
+                with _timed(node_duration, node_errors, node=node_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             logger.info(f"Entering node: {node_name}")
-            return func(*args, **kwargs)
+            with _timed(node_duration, node_errors, node=node_name):
+                return func(*args, **kwargs)
         return wrapper
     return decorator
@@ -2,6 +2,7 @@ import logging
 from typing import Annotated
 from langchain_core.tools import tool
 from langchain_experimental.utilities import PythonREPL
+from .cancellation import interrupt_thread_on_cancel
 from .decorators import log_io
 
 # Initialize REPL and logger
@@ -20,7 +21,10 @@ def python_repl_tool(
     you should print it out with `print(...)`. This is visible to the user."""
     logger.info("Executing Python code")
     try:
-        result = repl.run(code)
+        # The REPL keeps its globals between calls, so it runs in this thread and
+        # is interrupted there if the workflow is cancelled
+        with interrupt_thread_on_cancel():
+            result = repl.run(code)
         logger.info("Code execution successful")
     except BaseException as e:
         error_msg = f"Failed to execute. Error: {repr(e)}"
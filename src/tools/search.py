@@ -1,10 +1,212 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
 import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Optional
+
+import langchain_community.utilities.tavily_search as tavily_search_api
 from langchain_community.tools.tavily_search import TavilySearchResults
-from src.config import TAVILY_MAX_RESULTS
+
+from src.cache import SqliteTTLStore
+from src.config import (
+    TAVILY_MAX_RESULTS,
+    TAVILY_BASE_URL,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL_HOURS,
+    SEARCH_CACHE_MAX_MB,
+)
 from .decorators import create_logged_tool
 
 logger = logging.getLogger(__name__)
 
+# The Tavily API wrapper reads its endpoint from this module constant on every request
+tavily_search_api.TAVILY_API_URL = TAVILY_BASE_URL.rstrip("/")
+
+# Tool fields that change the results and are therefore part of the cache key
+_KEY_FIELDS = (
+    "max_results",
+    "search_depth",
+    "include_domains",
+    "exclude_domains",
+    "include_answer",
+    "include_raw_content",
+    "include_images",
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so trivially different spellings share a cache entry.
+
+    Applies Unicode NFKC normalization, lowercases, collapses whitespace and
+    drops surrounding quotes and trailing punctuation.
+
+    Args:
+        query: The raw search query
+
+    Returns:
+        The normalized query
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.strip("\"'").rstrip("?!.。？！ ").strip()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one upstream request.
+
+    The first caller for a key becomes the leader and runs the request; callers
+    arriving while it is in flight wait for the leader's result. Futures are
+    thread-safe, so sync callers in worker threads and async callers on the
+    event loop share the same flights.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> tuple[concurrent.futures.Future, bool]:
+        """Return the flight for key and whether the caller is its leader."""
+        with self._lock:
+            if key in self._flights:
+                return self._flights[key], False
+            future = self._flights[key] = concurrent.futures.Future()
+            return future, True
+
+    def land(self, key: str, future: concurrent.futures.Future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+
+class CachedSearchMixin:
+    """
+    A mixin that adds a result cache and request coalescing to a search tool.
+
+    Results are cached per normalized query and tool configuration in a
+    bounded on-disk store with a TTL. Concurrent identical searches, e.g. from
+    the planner's pre-search and the researcher of another workflow, share one
+    upstream request. Failed searches are not cached.
+    """
+
+    def _cache_key(self, query: str) -> str:
+        config = {field: getattr(self, field, None) for field in _KEY_FIELDS}
+        payload = json.dumps([self.name, normalize_query(query), config], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _cacheable(result: Any) -> bool:
+        # TavilySearchResults returns (repr(error), {}) instead of raising
+        return isinstance(result, tuple) and bool(result[1])
+
+    def _cache_get(self, key: str) -> Optional[tuple]:
+        value = search_cache.get(key)
+        search_stats.record("hits" if value is not None else "misses")
+        if value is None:
+            return None
+        content, artifact = json.loads(value)
+        return content, artifact
+
+    def _cache_set(self, key: str, result: Any):
+        if self._cacheable(result):
+            search_cache.set(key, json.dumps(result, ensure_ascii=False).encode())
+
+    def _run(self, query: str, **kwargs: Any) -> Any:
+        key = self._cache_key(query)
+        while True:
+            if (cached := self._cache_get(key)) is not None:
+                return cached
+            future, leader = search_flights.join(key)
+            if leader:
+                break
+            search_stats.record("coalesced")
+            try:
+                return future.result()
+            except concurrent.futures.CancelledError:
+                # The leader was cancelled, try again (possibly as the new leader)
+                continue
+
+        try:
+            result = super()._run(query, **kwargs)
+            self._cache_set(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            search_flights.land(key, future)
+
+    async def _arun(self, query: str, **kwargs: Any) -> Any:
+        key = self._cache_key(query)
+        while True:
+            if (cached := await asyncio.to_thread(self._cache_get, key)) is not None:
+                return cached
+            future, leader = search_flights.join(key)
+            if leader:
+                break
+            search_stats.record("coalesced")
+            try:
+                # Shielded, so a cancelled follower does not cancel the shared flight
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        try:
+            result = await super()._arun(query, **kwargs)
+            await asyncio.to_thread(self._cache_set, key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            search_flights.land(key, future)
+
+
+class SearchCacheStats:
+    """Thread-safe counters of cache hits, misses and coalesced searches."""
+
+    def __init__(self):
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def get(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+search_cache = SqliteTTLStore(
+    SEARCH_CACHE_PATH if SEARCH_CACHE_ENABLED else ":memory:",
+    ttl_seconds=SEARCH_CACHE_TTL_HOURS * 3600,
+    max_bytes=int(SEARCH_CACHE_MAX_MB * 1024 * 1024),
+    table="search_results",
+)
+search_flights = SingleFlight()
+search_stats = SearchCacheStats()
+
 # Initialize Tavily search tool with logging
 LoggedTavilySearch = create_logged_tool(TavilySearchResults)
-tavily_tool = LoggedTavilySearch(name="tavily_search", max_results=TAVILY_MAX_RESULTS)
+
+
+class CachedTavilySearch(CachedSearchMixin, LoggedTavilySearch):
+    """Tavily search with logging, a result cache and request coalescing."""
+
+
+SearchTool = CachedTavilySearch if SEARCH_CACHE_ENABLED else LoggedTavilySearch
+tavily_tool = SearchTool(name="tavily_search", max_results=TAVILY_MAX_RESULTS)
@@ -1,6 +1,14 @@
 import logging
-from src.config import TEAM_MEMBERS
+from src.config import (
+    TEAM_MEMBERS,
+    FAN_OUT_ENABLED,
+    WORKFLOW_TOKEN_BUDGET,
+    AGENT_TOKEN_BUDGETS,
+    TOKEN_BUDGET_DEGRADE_RATIO,
+)
 from src.graph import build_graph
+from src.graph.budget import CONFIG_KEY_TOKEN_BUDGET, TokenBudget
+from src.agents.llm_cache import get_llm_response_cache
 
 # Configure logging
 logging.basicConfig(
@@ -18,15 +26,19 @@ logger = logging.getLogger(__name__)
 
 # Create the graph
 # 调用构建函数，构建工作流图
-graph = build_graph()
+graph = build_graph(fan_out=FAN_OUT_ENABLED)
 
 
-def run_agent_workflow(user_input: str, debug: bool = False):
+def run_agent_workflow(
+    user_input: str, debug: bool = False, plan_driven_routing: bool = False
+):
     """Run the agent workflow with the given user input.
 
     Args:
         user_input: The user's query or request
         debug: If True, enables debug level logging
+        plan_driven_routing: If True, the supervisor follows the planner's plan
+            step by step and only asks the LLM when the plan cannot be followed
 
     Returns:
         The final state after the workflow completes
@@ -38,6 +50,11 @@ def run_agent_workflow(user_input: str, debug: bool = False):
         enable_debug_logging()
 
     logger.info(f"Starting workflow with user input: {user_input}")
+    budget = TokenBudget(
+        WORKFLOW_TOKEN_BUDGET,
+        AGENT_TOKEN_BUDGETS,
+        TOKEN_BUDGET_DEGRADE_RATIO,
+    )
     result = graph.invoke(
         {
             # Constants
@@ -46,9 +63,19 @@ def run_agent_workflow(user_input: str, debug: bool = False):
             "messages": [{"role": "user", "content": user_input}],
             "deep_thinking_mode": True,
             "search_before_planning": True,
-        }
+            "routing_mode": "plan" if plan_driven_routing else "llm",
+            "plan_step_index": 0,
+        },
+        config={
+            "configurable": {CONFIG_KEY_TOKEN_BUDGET: budget},
+            "callbacks": [budget],
+        },
     )
     logger.debug(f"Final workflow state: {result}")
+    logger.info(f"Routing stats: {result.get('routing_stats', {})}")
+    logger.info(f"Token usage: {budget.usage()}")
+    if llm_cache := get_llm_response_cache():
+        logger.info(f"LLM cache stats: {llm_cache.get_stats()}")
     logger.info("Workflow completed successfully")
     return result
 
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+import time
+
+from langgraph.graph import END, START, StateGraph
+
+from src.service import workflow_service
+from src.tools.bash_tool import bash_tool
+from src.tools.cancellation import CancellationToken, cancellation_stats, interrupt_thread_on_cancel
+from src.tools.python_repl import python_repl_tool
+
+
+def _tool_graph(tool, tool_input):
+    async def coder(state: dict):
+        return {"output": await tool.ainvoke(tool_input)}
+
+    builder = StateGraph(dict)
+    builder.add_node("coder", coder)
+    builder.add_edge(START, "coder")
+    builder.add_edge("coder", END)
+    return builder.compile()
+
+
+def _cancel_during_tool(monkeypatch, tool, tool_input):
+    """Start a workflow running the tool and disconnect while the tool runs."""
+    monkeypatch.setattr(workflow_service, "graph", _tool_graph(tool, tool_input))
+
+    async def run():
+        events = workflow_service.run_agent_workflow([{"role": "user", "content": "hi"}])
+        task = asyncio.create_task(anext(events))
+        await asyncio.sleep(0.5)
+        # The client disconnects while the tool is running
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await events.aclose()
+
+    before = cancellation_stats.get()
+    asyncio.run(run())
+    after = cancellation_stats.get()
+    for key in ("workflows_cancelled", f"tool_calls_aborted:{tool.name}"):
+        assert after.get(key, 0) == before.get(key, 0) + 1
+
+
+def _wait_for(condition) -> bool:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_cancel_kills_subprocess(monkeypatch, tmp_path):
+    """Test that cancelling a workflow kills the bash command it is running."""
+    pid_file = tmp_path / "pid"
+    _cancel_during_tool(monkeypatch, bash_tool, {"cmd": f"echo $$ > {pid_file}; sleep 30"})
+    pid = int(pid_file.read_text())
+
+    def exited():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        return False
+
+    assert _wait_for(exited)
+
+
+def test_cancel_interrupts_python_repl(monkeypatch, tmp_path):
+    """Test that cancelling a workflow interrupts code running in the Python REPL."""
+    marker = tmp_path / "interrupted"
+    code = (
+        "import time\n"
+        "try:\n"
+        "    while True:\n"
+        "        time.sleep(0.01)\n"
+        "finally:\n"
+        f"    open({str(marker)!r}, 'w').close()\n"
+    )
+    _cancel_during_tool(monkeypatch, python_repl_tool, {"code": code})
+    assert _wait_for(marker.exists)
+
+
+def test_token_callbacks_run_once_and_immediately_when_cancelled():
+    """Test that callbacks run once on cancel and right away when registered afterwards."""
+    token = CancellationToken()
+    calls = []
+    unregister = token.register(lambda: calls.append("a"))
+    token.register(lambda: calls.append("b"))
+    unregister()
+    token.cancel("stop")
+    token.cancel("again")
+    token.register(lambda: calls.append("c"))
+    assert calls == ["b", "c"]
+    assert token.reason == "stop"
+    # Outside a workflow there is no token and nothing is interrupted
+    with interrupt_thread_on_cancel():
+        assert threading.current_thread() is threading.main_thread()
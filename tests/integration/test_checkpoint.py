@@ -0,0 +1,64 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import StateGraph, START, END
+
+from src.graph.checkpoint import SqliteCheckpointSaver
+
+
+class _State(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def _build(saver, fail_second: dict):
+    def first(state):
+        return {"steps": ["first" * 500]}
+
+    def second(state):
+        if fail_second["fail"]:
+            raise RuntimeError("crash")
+        return {"steps": ["second"]}
+
+    builder = StateGraph(_State)
+    builder.add_node("first", first)
+    builder.add_node("second", second)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_resume_from_last_completed_node(tmp_path):
+    """Test that a crashed run resumes after the last completed node."""
+    saver = SqliteCheckpointSaver(str(tmp_path / "cp.sqlite"))
+    fail = {"fail": True}
+    graph = _build(saver, fail)
+    config = {"configurable": {"thread_id": "wf-1"}}
+
+    with pytest.raises(RuntimeError):
+        graph.invoke({"steps": []}, config)
+    assert graph.get_state(config).next == ("second",)
+
+    # A new saver on the same file sees the persisted state, as after a restart
+    fail["fail"] = False
+    graph = _build(SqliteCheckpointSaver(str(tmp_path / "cp.sqlite")), fail)
+    result = graph.invoke(None, config)
+    assert result["steps"] == ["first" * 500, "second"]
+
+
+def test_async_resume_and_gc(tmp_path):
+    """Test the async path and that expired workflows are garbage collected."""
+    saver = SqliteCheckpointSaver(str(tmp_path / "cp.sqlite"))
+    graph = _build(saver, {"fail": False})
+    config = {"configurable": {"thread_id": "wf-2"}}
+
+    async def run():
+        await graph.ainvoke({"steps": []}, config)
+        return await graph.aget_state(config)
+
+    assert asyncio.run(run()).values["steps"][-1] == "second"
+
+    assert saver.gc(retention_hours=1e-9) == 1
+    assert saver.get_tuple(config) is None
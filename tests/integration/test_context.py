@@ -0,0 +1,41 @@
+from langchain_core.messages import HumanMessage
+
+from src.graph.context import build_agent_context, estimate_tokens
+
+
+def _state():
+    return {
+        "messages": [
+            {"role": "user", "content": "Compare X and Y"},
+            HumanMessage(content='{"steps": []}', name="planner"),
+            HumanMessage(content="r1 " * 2000, name="researcher"),
+            HumanMessage(content="c1 " * 2000, name="coder"),
+            HumanMessage(content="r2 " * 200, name="researcher"),
+            HumanMessage(content="r3 " * 200, name="researcher"),
+        ]
+    }
+
+
+def test_no_budget_returns_full_history():
+    """Test that a zero budget keeps the original behaviour."""
+    state = _state()
+    assert build_agent_context(state, "researcher", token_budget=0) is state["messages"]
+
+
+def test_context_pins_request_and_filters_by_role():
+    """Test that the request and plan are pinned and irrelevant agents are dropped."""
+    context = build_agent_context(_state(), "researcher", token_budget=100_000)
+    names = [m.get("name") if isinstance(m, dict) else m.name for m in context]
+    assert names == [None, "planner", "researcher", "researcher", "researcher"]
+    # The oldest researcher output is truncated, the two most recent are kept whole
+    assert len(context[2].content) < len("r1 " * 2000)
+    assert context[-1].content == "r3 " * 200
+
+
+def test_context_stays_within_budget():
+    """Test that older outputs are dropped once the budget is exhausted."""
+    budget = 500
+    context = build_agent_context(_state(), "reporter", token_budget=budget, summarize=False)
+    assert sum(estimate_tokens(m) for m in context) <= budget
+    assert context[-1].name == "researcher"
+    assert context[0]["content"] == "Compare X and Y"
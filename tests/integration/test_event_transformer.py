@@ -0,0 +1,151 @@
+import asyncio
+import random
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import END, START, StateGraph
+
+from src.service import workflow_service
+from src.service.event_transformer import WorkflowEventTransformer, astream_event_filters
+
+
+def _events(client: int, handoff: bool, rng: random.Random):
+    """Simulated astream_events output of a coordinator run."""
+    coordinator = {"checkpoint_ns": "coordinator:1", "langgraph_step": 1}
+    chunks = ["hand", "off", "_to", "_planner", "()"] if handoff else [
+        "Hello", " client", f" {client}", ", bye", "."
+    ]
+    yield {"event": "on_chain_start", "name": "coordinator", "data": {}, "metadata": coordinator}
+    yield {"event": "on_chat_model_start", "name": "llm", "data": {}, "metadata": coordinator}
+    for chunk in chunks:
+        # Non-handoff replies arrive in randomly split pieces
+        split = not handoff and rng.random() < 0.3
+        for piece in ([chunk[:1], chunk[1:]] if split else [chunk]):
+            yield {
+                "event": "on_chat_model_stream",
+                "name": "llm",
+                "data": {"chunk": AIMessageChunk(content=piece, id=f"run-{client}")},
+                "metadata": coordinator,
+            }
+    yield {"event": "on_chat_model_end", "name": "llm", "data": {}, "metadata": coordinator}
+    yield {"event": "on_chain_end", "name": "coordinator", "data": {}, "metadata": coordinator}
+    yield {"event": "on_chain_end", "name": "LangGraph", "data": {"output": {"messages": []}}, "metadata": {}}
+
+
+class _FakeGraph:
+    checkpointer = None
+    name = "LangGraph"
+
+    async def astream_events(self, graph_input, config=None, version=None, **filters):
+        content = graph_input["messages"][0]["content"]
+        client, handoff = int(content.split(":")[0]), content.endswith("plan")
+        rng = random.Random(client)
+        for event in _events(client, handoff, rng):
+            # Yield to the event loop so the 200 streams interleave
+            await asyncio.sleep(rng.random() / 1000)
+            yield event
+
+
+def test_handoff_detection_is_isolated_per_run(monkeypatch):
+    """Test 200 interleaved runs in one process; each client gets only its own output."""
+    monkeypatch.setattr(workflow_service, "graph", _FakeGraph())
+
+    async def client(i: int):
+        handoff = i % 2 == 0
+        request = [{"role": "user", "content": f"{i}:{'plan' if handoff else 'chat'}"}]
+        events = [
+            event
+            async for event in workflow_service.run_agent_workflow(request, workflow_id=f"wf-{i}")
+        ]
+        return i, handoff, events
+
+    async def run():
+        return await asyncio.gather(*(client(i) for i in range(200)))
+
+    for i, handoff, events in asyncio.run(run()):
+        deltas = "".join(e["data"]["delta"]["content"] for e in events if e["event"] == "message")
+        assert deltas == ("" if handoff else f"Hello client {i}, bye.")
+        assert [e["event"] for e in events if e["event"] != "message"] == [
+            "start_of_agent", "start_of_llm", "end_of_llm", "end_of_agent", "end_of_workflow",
+        ]
+        assert events[-1]["data"]["workflow_id"] == f"wf-{i}"
+
+
+def test_transformer_does_not_repeat_events_after_handoff():
+    """Test that chunks after a detected handoff are dropped rather than re-sending the last event."""
+    transformer = WorkflowEventTransformer("wf", [])
+    events = []
+    for event in _events(0, True, random.Random(0)):
+        events += transformer.transform(event)
+    assert [e["event"] for e in events] == ["start_of_agent", "start_of_llm", "end_of_llm", "end_of_agent"]
+
+
+def _filtered_graph_events(event_families):
+    """Run a planner -> supervisor graph with astream_events filtered for the given families."""
+
+    def planner(state: dict):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="step one")]))
+        return {"messages": [llm.invoke("plan")]}
+
+    def supervisor(state: dict):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="FINISH")]))
+        return {"messages": [llm.with_config(tags=[TAG_NOSTREAM]).invoke("route")]}
+
+    builder = StateGraph(dict)
+    builder.add_node("planner", planner)
+    builder.add_node("supervisor", supervisor)
+    builder.add_edge(START, "planner")
+    builder.add_edge("planner", "supervisor")
+    builder.add_edge("supervisor", END)
+    graph = builder.compile()
+
+    async def run():
+        return [
+            event
+            async for event in graph.astream_events(
+                {"messages": []}, version="v2", **astream_event_filters(event_families, graph.name)
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_event_filters_are_applied_at_the_source():
+    """Test that unsubscribed and supervisor events are never produced by astream_events."""
+    final_only = _filtered_graph_events([])
+    assert {(e["event"], e["name"]) for e in final_only if e["event"] != "on_chain_stream"} == {
+        ("on_chain_start", "LangGraph"),
+        ("on_chain_start", "planner"),
+        ("on_chain_end", "planner"),
+        ("on_chain_end", "LangGraph"),
+    }
+
+    llm_events = _filtered_graph_events(["llm"])
+    chat_nodes = {
+        e["metadata"]["langgraph_node"] for e in llm_events if e["event"].startswith("on_chat_model")
+    }
+    assert chat_nodes == {"planner"}
+
+    transformer = WorkflowEventTransformer("wf", [], [])
+    events = [ydata for event in final_only for ydata in transformer.transform(event)]
+    assert [e["event"] for e in events] == ["start_of_workflow"]
+    assert transformer.end_of_workflow()["data"]["messages"]
+
+
+def test_transformer_drops_unsubscribed_families():
+    """Test that reasoning deltas and lifecycle events are dropped when not subscribed."""
+    transformer = WorkflowEventTransformer("wf", [], ["llm"])
+    metadata = {"checkpoint_ns": "planner:1", "langgraph_step": 1}
+    events = []
+    for chunk in (
+        AIMessageChunk(content="", additional_kwargs={"reasoning_content": "hmm"}, id="run-1"),
+        AIMessageChunk(content="plan", id="run-1"),
+    ):
+        events += transformer.transform(
+            {"event": "on_chat_model_stream", "name": "llm", "data": {"chunk": chunk}, "metadata": metadata}
+        )
+    events += transformer.transform(
+        {"event": "on_chain_end", "name": "planner", "data": {}, "metadata": metadata}
+    )
+    assert events == [{"event": "message", "data": {"message_id": "run-1", "delta": {"content": "plan"}}}]
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.agents.http_pool import HttpClientPool, origin_of
+from src.agents.llm import basic_llm, get_llm_by_type, reasoning_llm
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_clients_are_shared_per_origin():
+    """Test that LLMs of the same backend get the same pooled clients."""
+    pool = HttpClientPool()
+    assert pool.sync_client("https://api.example.com/v1") is pool.sync_client("https://api.example.com:443/v2")
+    assert pool.async_client("https://api.example.com/v1") is not pool.async_client("http://api.example.com/v1")
+    assert origin_of("http://localhost:8900/v1") == "http://localhost:8900"
+
+    assert get_llm_by_type("cheap") is not basic_llm
+    for llm in (basic_llm, reasoning_llm, get_llm_by_type("cheap")):
+        assert llm.http_client is not None and llm.http_async_client is not None
+
+
+def test_pool_reuses_connections_and_counts_them(server_url):
+    """Test that sequential requests reuse one connection, per event loop for async clients."""
+    pool = HttpClientPool()
+    for _ in range(3):
+        assert pool.sync_client(server_url).get(f"{server_url}/x").text == "ok"
+
+    async def fetch_twice():
+        client = pool.async_client(server_url)
+        for _ in range(2):
+            assert (await client.get(f"{server_url}/y")).text == "ok"
+
+    # Every asyncio.run() has its own loop and therefore its own connection
+    asyncio.run(fetch_twice())
+    asyncio.run(fetch_twice())
+
+    stats = pool.get_stats()[origin_of(server_url)]
+    assert stats["requests"] == 7
+    assert stats["connections_opened"] == 3
+    assert stats["tls_handshakes"] == 0
+    assert stats["reuse_rate"] == pytest.approx(4 / 7)
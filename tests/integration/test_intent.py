@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.graph import intent, nodes
+from src.graph.intent import INTENT_PLANNER, INTENT_REPLY, DecisionLog, IntentClassifier, evaluate, read_decisions
+from src.metrics import coordinator_intent_checks, coordinator_intent_decisions
+
+SMALL_TALK = [
+    "hi", "hello", "hello there", "hey", "good morning", "good evening", "how are you", "how are you doing today",
+    "thanks", "thank you", "who are you", "what's your name", "nice to meet you", "bye",
+    "你好", "早上好", "晚上好", "你是谁", "谢谢", "再见", "最近怎么样",
+]
+TASKS = [
+    "research the latest trends in solar panel efficiency",
+    "compare the gdp of france and germany over the last decade",
+    "write a python script that downloads stock prices and plots them",
+    "find recent papers about retrieval augmented generation and summarize them",
+    "analyze the sales data in data.csv and report the top products",
+    "search for the best open source vector databases and compare them",
+    "summarize the news about electric vehicles this week",
+    "calculate the compound interest on 10000 dollars over 5 years",
+    "帮我调研一下国内新能源汽车的市场份额",
+    "写一个爬虫抓取豆瓣电影top250",
+    "分析一下最近一年比特币的价格走势",
+    "比较三种主流深度学习框架的优缺点",
+]
+DECISIONS = [{"text": t, "handoff": False, "latency": 0.8} for t in SMALL_TALK] + [
+    {"text": t, "handoff": True, "latency": 0.8} for t in TASKS
+]
+
+
+@pytest.fixture(scope="module")
+def classifier() -> IntentClassifier:
+    return IntentClassifier(dim=1 << 16, threshold=0.8).fit([(d["text"], d["handoff"]) for d in DECISIONS])
+
+
+def test_trained_classifier_round_trips_and_reports_agreement(classifier, tmp_path):
+    """Test training from a decision log, saving/loading and the evaluation report."""
+    log = DecisionLog(str(tmp_path / "decisions.jsonl"))
+    for decision in DECISIONS:
+        log.record(decision["text"], decision["handoff"], decision["latency"])
+    assert [{k: d[k] for k in ("text", "handoff", "latency")} for d in read_decisions(log.path)] == DECISIONS
+
+    classifier.save(str(tmp_path / "intent.npz"))
+    loaded = IntentClassifier.load(str(tmp_path / "intent.npz"))
+    assert loaded.probability("research solar panels") == pytest.approx(classifier.probability("research solar panels"))
+
+    report = evaluate(loaded, read_decisions(log.path))
+    assert report["examples"] == len(DECISIONS)
+    assert report["coverage"] > 0.8 and report["disagreement_rate"] == 0.0
+    assert report["classify_ms"] < report["llm_ms"] and report["saved_ms_per_request"] > 0
+    assert loaded.classify("hello, how are you") == INTENT_REPLY
+    assert loaded.classify("research and compare the gdp of japan and korea") == INTENT_PLANNER
+
+
+def _coordinator(state: dict):
+    """Run the async coordinator node inside a runnable, collecting its custom events."""
+
+    async def run():
+        events = [
+            event
+            async for event in RunnableLambda(nodes.acoordinator_node).astream_events(state, version="v2")
+        ]
+        return events[-1]["data"]["output"], [e for e in events if e["event"] == "on_custom_event"]
+
+    return asyncio.run(run())
+
+
+def test_confident_decisions_skip_the_coordinator_llm(classifier, monkeypatch, tmp_path):
+    """Test the planner shortcut, the template reply, and the sampled check against the LLM."""
+    intent.set_intent_classifier(classifier)
+    monkeypatch.setattr(nodes, "COORDINATOR_CLASSIFIER_SHADOW_RATE", 0.0)
+    monkeypatch.setattr(nodes, "_agent_llm", lambda agent: pytest.fail("the LLM must not be called"))
+    before = {d: coordinator_intent_decisions.get(decision=d) for d in ("planner", "reply", "llm")}
+    try:
+        command, events = _coordinator({"messages": [{"role": "user", "content": "research the gdp of italy"}]})
+        assert command.goto == "planner" and events == []
+
+        command, events = _coordinator({"messages": [{"role": "user", "content": "你好"}]})
+        assert command.goto == "__end__"
+        assert events[0]["name"] == "coordinator_reply" and "Langmanus" in events[0]["data"]["content"]
+        assert coordinator_intent_decisions.get(decision="planner") == before["planner"] + 1
+        assert coordinator_intent_decisions.get(decision="reply") == before["reply"] + 1
+
+        # A sampled decision still goes to the LLM, which disagrees here and wins
+        class _Reply:
+            async def ainvoke(self, messages):
+                return AIMessage(content="Hi!")
+
+        log = DecisionLog(str(tmp_path / "decisions.jsonl"))
+        monkeypatch.setattr(nodes, "COORDINATOR_CLASSIFIER_SHADOW_RATE", 1.0)
+        monkeypatch.setattr(nodes, "_agent_llm", lambda agent: _Reply())
+        monkeypatch.setattr(nodes, "get_decision_log", lambda: log)
+        disagree = coordinator_intent_checks.get(result="disagree")
+        command, _ = _coordinator({"messages": [{"role": "user", "content": "research the gdp of italy"}]})
+        assert command.goto == "__end__"
+        assert coordinator_intent_checks.get(result="disagree") == disagree + 1
+        assert coordinator_intent_decisions.get(decision="llm") == before["llm"] + 1
+        assert [(d["text"], d["handoff"]) for d in read_decisions(log.path)] == [("research the gdp of italy", False)]
+    finally:
+        intent.set_intent_classifier(None)
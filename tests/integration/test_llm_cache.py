@@ -0,0 +1,113 @@
+import time
+from typing import Any, Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.agents import llm_cache
+from src.agents.llm_cache import CACHE_HIT_METADATA_KEY, ResponseCacheMixin, configure_llm_response_cache
+from src.cache import SqliteTTLStore
+
+
+USAGE = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+
+class _ReplyModel(BaseChatModel):
+    """Returns the next reply on every call; streams it word by word."""
+
+    replies: Any
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "reply"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = AIMessage(content=next(self.replies), usage_metadata=USAGE)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        for word in next(self.replies).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=USAGE))
+
+
+class _FakeChatModel(ResponseCacheMixin, _ReplyModel):
+    pass
+
+
+def _model(*replies):
+    return _FakeChatModel(replies=iter(replies))
+
+
+def _messages(time_of_day="10:00:00"):
+    return [
+        SystemMessage(content=f"CURRENT_TIME: Mon Jan 06 2025 {time_of_day}"),
+        HumanMessage(content="What is MCP?"),
+    ]
+
+
+def test_invoke_and_stream_are_served_from_cache(tmp_path, monkeypatch):
+    """Test that repeated calls replay the first response and are counted as hits."""
+    monkeypatch.setattr(llm_cache, "_llm_response_cache", None)
+    cache = configure_llm_response_cache(path=str(tmp_path / "llm.sqlite"), agents=None)
+
+    model = _model("first answer", "second answer")
+    assert model.invoke(_messages()).content == "first answer"
+    # Ids and the time of day do not change the cache key
+    assert model.invoke(_messages("11:30:00")).content == "first answer"
+
+    model = _model("streamed answer here", "other")
+    question = [HumanMessage(content="Stream please")]
+    first = [chunk.content for chunk in model.stream(question)]
+    replayed = [chunk.content for chunk in model.stream(question)]
+    assert len(first) > 1 and replayed == first
+    replayed = model.invoke(question)
+    assert replayed.content == "streamed answer here "
+
+    # Replays are flagged and report no token usage: no tokens were spent on them
+    assert replayed.usage_metadata is None and replayed.response_metadata[CACHE_HIT_METADATA_KEY]
+    assert model.invoke(_messages()).usage_metadata is None
+    assert _model("fresh").invoke([HumanMessage(content="new")]).usage_metadata["total_tokens"] == 15
+
+    assert cache.get_stats()["unknown"] == {"hits": 4, "misses": 3, "hit_rate": 4 / 7}
+
+
+def test_cache_only_serves_configured_agents(tmp_path, monkeypatch):
+    """Test that calls from other graph nodes bypass the cache."""
+    monkeypatch.setattr(llm_cache, "_llm_response_cache", None)
+    configure_llm_response_cache(path=":memory:", agents=["supervisor"])
+    model = _model("one", "two")
+    assert model.invoke(_messages()).content == "one"
+    assert model.invoke(_messages()).content == "two"
+
+
+def test_store_expires_and_evicts_least_recently_used(tmp_path):
+    """Test TTL expiry and LRU eviction by total size."""
+    store = SqliteTTLStore(str(tmp_path / "store.sqlite"), ttl_seconds=0, max_bytes=10)
+    store.set("a", b"1234")
+    store.set("b", b"1234")
+    assert store.get("a") == b"1234"  # "a" is now more recently used than "b"
+    store.set("c", b"1234")
+    assert store.get("b") is None
+    assert store.get("a") == store.get("c") == b"1234"
+
+    # Replacing an entry counts its new size only, and the total survives reopening the file
+    store.set("a", b"12")
+    assert store.total_bytes == 6
+    store = SqliteTTLStore(str(tmp_path / "store.sqlite"), ttl_seconds=0, max_bytes=10)
+    assert store.total_bytes == 6
+    # Eviction walks past a whole batch when one large write needs the room
+    store = SqliteTTLStore(":memory:", ttl_seconds=0, max_bytes=200)
+    for i in range(100):
+        store.set(f"k{i}", b"12")
+    store.set("big", b"x" * 190)
+    assert store.get("k93") is None and store.get("k95") == b"12" and store.total_bytes == 200
+
+    store = SqliteTTLStore(":memory:", ttl_seconds=0.05, max_bytes=0)
+    store.set("a", b"x")
+    store.set("b", b"yy")
+    time.sleep(0.1)
+    assert store.get("a") is None and store.total_bytes == 2
+    assert store.purge_expired() == 1 and store.total_bytes == 0
@@ -0,0 +1,119 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Iterator
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.agents import llm, llm_router
+from src.agents.llm_router import BACKEND_METADATA_KEY, RoutedChatModel, get_backend_stats
+
+
+class _Backend(BaseChatModel):
+    """Answers its name after a delay, or fails; streams the answer word by word."""
+
+    reply: str
+    delay: float = 0.0
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "backend"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.reply)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.reply)
+        for word in self.reply.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.reply)
+        for word in self.reply.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def _routed(*backends: _Backend, hedge_delay: float = 0.05) -> tuple[RoutedChatModel, list[str]]:
+    # Unique names keep the process-wide backend statistics of each test apart
+    names = [f"{backend.reply.split()[0]}-{uuid.uuid4().hex[:6]}" for backend in backends]
+    model = RoutedChatModel(backends=list(backends), names=names, hedge_delay=hedge_delay, min_hedge_delay=0.05)
+    return model, names
+
+
+def test_slow_primary_is_hedged_by_the_next_backend():
+    """Test that a backend without a first token after the hedge delay is raced by the next one."""
+    model, (slow, fast) = _routed(_Backend(reply="slow answer", delay=1.0), _Backend(reply="fast answer"))
+
+    async def stream():
+        return [chunk async for chunk in model.astream([HumanMessage(content="hi")])]
+
+    started = time.monotonic()
+    chunks = asyncio.run(stream())
+    assert time.monotonic() - started < 0.5
+    assert "".join(chunk.content for chunk in chunks).strip() == "fast answer"
+    assert chunks[0].response_metadata[BACKEND_METADATA_KEY] == fast
+    assert get_backend_stats(slow).get()["hedged"] == 1
+    assert get_backend_stats(fast).get()["hedge_won"] == 1
+
+    # Sync streams hedge too
+    assert "".join(chunk.content for chunk in model.stream([HumanMessage(content="hi")])).strip() == "fast answer"
+
+
+def test_non_streamed_calls_only_fail_over():
+    """Test that a call without streaming waits for its backend instead of paying for a second answer."""
+    model, (slow, _) = _routed(_Backend(reply="slow answer", delay=0.2), _Backend(reply="fast answer"))
+    assert model.invoke([HumanMessage(content="hi")]).content == "slow answer"
+    assert asyncio.run(model.ainvoke([HumanMessage(content="hi")])).content == "slow answer"
+    assert get_backend_stats(slow).get()["hedged"] == 0
+
+
+def test_calls_that_cannot_hedge_stay_in_the_calling_thread(monkeypatch):
+    """Test that sync calls without a hedge fail over inline instead of starting a thread pool."""
+    model, _ = _routed(_Backend(reply="broken", fail=True), _Backend(reply="spare answer"), hedge_delay=0)
+    monkeypatch.setattr(llm_router, "ThreadPoolExecutor", lambda **kwargs: pytest.fail("no thread is needed"))
+    assert model.invoke([HumanMessage(content="hi")]).content == "spare answer"
+    assert "".join(chunk.content for chunk in model.stream([HumanMessage(content="hi")])).strip() == "spare answer"
+
+    hedged, _ = _routed(_Backend(reply="slow answer", delay=0.2), _Backend(reply="fast answer"))
+    assert hedged.invoke([HumanMessage(content="hi")]).content == "slow answer"
+
+
+def test_same_endpoints_collapse_and_reasoning_is_not_hedged(monkeypatch):
+    """Test that types sharing a model and base URL route to one backend and reasoning only fails over."""
+    monkeypatch.setattr(llm, "LLM_ENDPOINTS", {
+        "reasoning": ("r1", "https://r"), "basic": ("m", "https://b"), "cheap": ("m", "https://b"),
+    })
+    monkeypatch.setattr(llm, "LLM_HEDGE_DELAY", 5.0)
+    monkeypatch.setattr(llm, "_routed_llm_cache", {})
+    monkeypatch.setattr(llm, "get_llm_by_type", lambda llm_type: _Backend(reply=llm_type))
+    assert llm.get_llm_by_types(["basic", "cheap"]).reply == "basic"
+    routed = llm.get_llm_by_types(["reasoning", "basic", "cheap"])
+    assert routed.names == ["reasoning", "basic"] and routed.hedge_delay == 0
+
+
+def test_errors_fail_over_and_repeated_failures_demote_the_backend():
+    """Test failover on errors and that a backend failing repeatedly is tried last."""
+    model, (broken, spare) = _routed(
+        _Backend(reply="broken", fail=True), _Backend(reply="spare answer"), hedge_delay=0
+    )
+    for _ in range(3):
+        assert asyncio.run(model.ainvoke([HumanMessage(content="hi")])).content == "spare answer"
+    stats = get_backend_stats(broken).get()
+    assert stats["error"] == 3 and not stats["healthy"]
+    assert model._order() == [1, 0]
+
+    # Once demoted the healthy backend answers first and no error is added
+    assert model.invoke([HumanMessage(content="hi")]).content == "spare answer"
+    assert get_backend_stats(broken).get()["error"] == 3
+    assert get_backend_stats(spare).get()["success"] == 4
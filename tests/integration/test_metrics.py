@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.tools import BaseTool
+
+from src.api.app import app
+from src.metrics import MetricsRegistry, node_duration, node_errors, tool_duration, tool_errors
+from src.tools.decorators import create_logged_tool, log_io, track_node
+
+
+def test_registry_renders_prometheus_text():
+    """Test that counters, gauges and cumulative histogram buckets render in text format."""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["path"])
+    inflight = registry.gauge("inflight", "In flight")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    requests.inc(path="/a")
+    requests.inc(2, path="/a")
+    inflight.inc()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Queue", [({}, 3)])])
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{path="/a"} 3' in lines
+    assert "inflight 1" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+    assert "# TYPE queue_depth gauge" in lines
+    assert "queue_depth 3" in lines
+    with pytest.raises(ValueError):
+        requests.inc(status="200")
+
+
+def test_track_node_times_sync_and_async_nodes():
+    """Test that track_node records latency and errors for both node flavours."""
+
+    @track_node("metrics_test_node")
+    def node(state):
+        if state.get("fail"):
+            raise RuntimeError("boom")
+        return state
+
+    @track_node("metrics_test_node")
+    async def anode(state):
+        return state
+
+    _, count = node_duration.get(node="metrics_test_node")
+    errors = node_errors.get(node="metrics_test_node")
+    node({})
+    asyncio.run(anode({}))
+    with pytest.raises(RuntimeError):
+        node({"fail": True})
+    assert node_duration.get(node="metrics_test_node")[1] == count + 3
+    assert node_errors.get(node="metrics_test_node") == errors + 1
+
+
+def test_tool_metrics_count_each_call_once():
+    """Test that logged tools are timed once per call, sync or async."""
+
+    @log_io
+    def metrics_test_function(x):
+        return x
+
+    class EchoTool(BaseTool):
+        name: str = "metrics_test_echo"
+        description: str = "Echo the input"
+
+        def _run(self, text: str) -> str:
+            if text == "fail":
+                raise ValueError(text)
+            return text
+
+    tool = create_logged_tool(EchoTool)()
+    _, function_count = tool_duration.get(tool="metrics_test_function")
+    _, tool_count = tool_duration.get(tool="metrics_test_echo")
+    errors = tool_errors.get(tool="metrics_test_echo")
+
+    metrics_test_function(1)
+    assert tool.invoke("hi") == "hi"
+    assert asyncio.run(tool.ainvoke("hi")) == "hi"
+    with pytest.raises(ValueError):
+        tool.invoke("fail")
+
+    assert tool_duration.get(tool="metrics_test_function")[1] == function_count + 1
+    assert tool_duration.get(tool="metrics_test_echo")[1] == tool_count + 3
+    assert tool_errors.get(tool="metrics_test_echo") == errors + 1
+
+
+def test_metrics_endpoint():
+    """Test that /metrics serves the registry and the service statistics."""
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(fetch())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE langmanus_node_duration_seconds histogram" in body
+    assert "langmanus_active_workflows 0" in body
+    assert "langmanus_scheduler_queue_depth 0" in body
+    assert 'langmanus_scheduler_requests_total{outcome="admitted"}' in body
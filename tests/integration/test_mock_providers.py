@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import httpx
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.mock_providers import MockConfig, PromptCache, create_app
+from src.graph.types import Router
+from src.metrics import LLMMetricsCallback, prompt_cache_stats
+from src.prompts.template import get_prompt_template
+from src.tools.search import tavily_tool
+
+
+def _llm(app) -> ChatOpenAI:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock")
+    return ChatOpenAI(
+        model="mock", api_key="mock", base_url="http://mock/v1", http_async_client=client
+    )
+
+
+def _messages(agent: str, *history) -> list:
+    return [SystemMessage(content=get_prompt_template(agent)), HumanMessage(content="hi"), *history]
+
+
+def test_mock_llm_scripts_each_agent():
+    """Test that the mock answers the planner, supervisor and tool agents like a real run."""
+    llm = _llm(create_app(MockConfig(ttft=0, tokens_per_second=0)))
+
+    async def run():
+        plan = "".join([chunk.content async for chunk in llm.astream(_messages("planner"))])
+        route = await llm.with_structured_output(Router).ainvoke(_messages("supervisor"))
+        finish = await llm.with_structured_output(Router).ainvoke(
+            _messages("supervisor", HumanMessage(content="Response from reporter: done"))
+        )
+        call = await llm.bind_tools([tavily_tool]).ainvoke(_messages("researcher"))
+        return plan, route, finish, call
+
+    plan, route, finish, call = asyncio.run(run())
+    assert [step["agent_name"] for step in json.loads(plan)["steps"]] == ["researcher", "reporter"]
+    assert route == {"next": "researcher"}
+    assert finish == {"next": "FINISH"}
+    assert call.tool_calls[0]["name"] == "tavily_search"
+    assert call.usage_metadata["output_tokens"] > 0
+
+
+def test_prompt_cache_hits_are_reported_per_agent():
+    """Test that a repeated prompt prefix is reported as cached and counted for its agent."""
+    llm = _llm(create_app(MockConfig(ttft=0, tokens_per_second=0, prompt_cache=PromptCache(min_tokens=128))))
+    config = {"callbacks": [LLMMetricsCallback()], "metadata": {"langgraph_node": "prompt_cache_test"}}
+
+    async def run():
+        first = await llm.ainvoke(_messages("planner"), config=config)
+        second = await llm.ainvoke(_messages("planner", HumanMessage(content="and more")), config=config)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.usage_metadata["input_token_details"]["cache_read"] == 0
+    assert second.usage_metadata["input_token_details"]["cache_read"] > 0
+    stats = prompt_cache_stats()["prompt_cache_test"]
+    # The system prompt of the second call was cached in 128-token steps
+    assert stats["cached_tokens"] >= 512
+    assert 0 < stats["hit_rate"] < 1
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import time
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ensure_config
+from langgraph.constants import TAG_NOSTREAM
+
+import src.workflow  # noqa: F401  builds the graph before nodes is imported on its own
+from src.graph import build_graph, nodes
+from src.graph.budget import CONFIG_KEY_TOKEN_BUDGET, TokenBudget, current_budget
+from src.graph.plan import (
+    parse_plan,
+    route_from_plan,
+    parallel_step_group,
+    PLAN_DEVIATION_MARKER,
+    PlanStreamParser,
+    PlanParseError,
+)
+
+
+PLAN = json.dumps(
+    {
+        "thought": "t",
+        "title": "T",
+        "steps": [
+            {"agent_name": "researcher", "title": "a", "description": "look up x"},
+            {"agent_name": "coder", "title": "b", "description": "compute y"},
+            {"agent_name": "reporter", "title": "c", "description": "report"},
+        ],
+    }
+)
+
+
+def _state(index, messages=None, full_plan=PLAN):
+    return {
+        "full_plan": full_plan,
+        "plan_step_index": index,
+        "messages": messages or [],
+    }
+
+
+def test_parse_plan_rejects_malformed_plans():
+    """Test that invalid JSON, empty steps and unknown agents are rejected."""
+    assert parse_plan(None) is None
+    assert parse_plan("{not json") is None
+    assert parse_plan(json.dumps({"steps": []})) is None
+    assert parse_plan(json.dumps({"steps": [{"agent_name": "nobody"}]})) is None
+    assert len(parse_plan(PLAN)) == 3
+
+
+def test_route_from_plan_walks_steps_in_order():
+    """Test that the plan is followed step by step and finishes after the last step."""
+    assert route_from_plan(_state(0)) == ("researcher", None)
+    done = [HumanMessage(content="ok", name="researcher")]
+    assert route_from_plan(_state(1, done)) == ("coder", None)
+    done = [HumanMessage(content="ok", name="reporter")]
+    assert route_from_plan(_state(3, done)) == ("FINISH", None)
+
+
+def test_route_from_plan_falls_back_on_failure():
+    """Test that malformed plans, failed steps and deviations fall back to the LLM."""
+    assert route_from_plan(_state(0, full_plan="oops")) == (None, "malformed_plan")
+    wrong_agent = [HumanMessage(content="ok", name="coder")]
+    assert route_from_plan(_state(1, wrong_agent)) == (None, "step_failed")
+    deviated = [
+        HumanMessage(content=f"{PLAN_DEVIATION_MARKER}: site down", name="researcher")
+    ]
+    assert route_from_plan(_state(1, deviated)) == (None, "step_failed")
+
+
+def test_parallel_step_group_respects_cap_and_dependencies():
+    """Test that consecutive independent research steps are grouped up to the cap."""
+    plan = json.dumps(
+        {
+            "steps": [
+                {"agent_name": "researcher", "title": "x", "description": "look up x"},
+                {"agent_name": "browser", "title": "y", "description": "browse y"},
+                {"agent_name": "researcher", "title": "z", "description": "look up z"},
+                {"agent_name": "researcher", "title": "w", "depends_on": ["z"]},
+                {"agent_name": "reporter", "title": "r", "description": "report"},
+            ]
+        }
+    )
+    assert parallel_step_group(_state(0, full_plan=plan), 2) == [0, 1]
+    assert parallel_step_group(_state(0, full_plan=plan), 5) == [0, 1, 2]
+    assert parallel_step_group(_state(3, full_plan=plan), 5) == [3]
+    assert parallel_step_group(_state(4, full_plan=plan), 5) == [4]
+
+
+def test_stream_parser_emits_steps_as_they_close():
+    """Test that fenced plans are parsed incrementally, one step at a time."""
+    parser = PlanStreamParser()
+    raw = f"```json\n{PLAN}\n```"
+    completed = 0
+    for i in range(0, len(raw), 7):
+        steps = parser.feed(raw[i : i + 7])
+        if steps and completed == 0:
+            # The first step is available before the later steps are written
+            assert '"title": "c"' in raw[i + 7 :]
+        completed += len(steps)
+    assert completed == 3
+    assert [step["title"] for step in parser.steps] == ["a", "b", "c"]
+    assert parser.close() == json.loads(PLAN)
+    assert parser.text == PLAN
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "Sure, here is the plan: {",
+        "```python\n{",
+        '{"steps": [{"agent_name": "researcher"]',
+        '{"steps": [{"agent_name": "researcher" "title": "a"}',
+        '{"thought": "t"} and more',
+        '{"thought": @',
+    ],
+)
+def test_stream_parser_aborts_on_structural_errors(raw):
+    """Test that structural errors are reported before the stream ends."""
+    parser = PlanStreamParser()
+    with pytest.raises(PlanParseError):
+        for char in raw:
+            parser.feed(char)
+
+
+class _PlanLLM:
+    """Streams a plan a few characters at a time, optionally failing after it."""
+
+    def __init__(self, raw: str, error: Exception | None = None):
+        self.raw = raw
+        self.error = error
+
+    async def astream(self, messages):
+        for i in range(0, len(self.raw), 7):
+            await asyncio.sleep(0.01)
+            yield AIMessage(content=self.raw[i : i + 7])
+        if self.error is not None:
+            raise self.error
+
+
+def _run_planner(monkeypatch, llm: _PlanLLM, research, on_done=lambda: None):
+    monkeypatch.setattr(nodes, "PLANNER_EARLY_DISPATCH", True)
+    monkeypatch.setattr(nodes, "_planner_inputs", lambda state: (llm, []))
+    monkeypatch.setattr(nodes, "aresearch_node", research)
+    budget = TokenBudget()
+    config = {"callbacks": [budget], "configurable": {CONFIG_KEY_TOKEN_BUDGET: budget}}
+    state = {"messages": [], "routing_mode": "plan"}
+
+    async def run():
+        events = []
+        try:
+            # Filtered on the tag like the service's event stream
+            async for event in RunnableLambda(nodes.aplanner_node).astream_events(
+                state, config, version="v2", exclude_tags=[TAG_NOSTREAM]
+            ):
+                events.append(event)
+        finally:
+            # Checked before the event loop cancels any task left behind
+            on_done()
+        return events[-1]["data"]["output"], events
+
+    command, events = asyncio.run(run())
+    return command, events, budget
+
+
+def test_early_step_runs_with_the_runs_callbacks_but_does_not_stream(monkeypatch):
+    """Test that the early step shares the run's budget and config but stays out of the event stream."""
+    seen = {}
+    llm = GenericFakeChatModel(
+        messages=iter([AIMessage(content="found x", usage_metadata={"input_tokens": 5, "output_tokens": 3, "total_tokens": 8})]),
+        # The fake drops usage from streamed chunks
+        disable_streaming=True,
+    )
+
+    async def research(state):
+        seen["budget"] = current_budget()
+        seen["step"] = state["plan_step"]["title"]
+        await llm.ainvoke("look up x", ensure_config())
+        return nodes._agent_command("researcher", "found x")
+
+    command, events, budget = _run_planner(monkeypatch, _PlanLLM(PLAN), research)
+    assert seen == {"budget": budget, "step": "a"}
+    assert budget.usage()["agents"]["researcher"]["total_tokens"] == 8
+    assert not [e for e in events if e["event"].startswith("on_chat_model")]
+    assert command.goto == "supervisor" and command.update["plan_step_index"] == 1
+    assert [m.name for m in command.update["messages"]] == ["planner", "researcher"]
+
+
+def test_early_step_is_cancelled_whenever_the_planner_gives_up(monkeypatch):
+    """Test that an invalid plan or a failing planner stops the early step before the node returns."""
+    state, stopped = {}, []
+
+    async def research(_):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    def check():
+        stopped.append(state.pop("cancelled", False))
+
+    half = PLAN[: PLAN.index('{"agent_name": "coder"')]
+    command, _, _ = _run_planner(monkeypatch, _PlanLLM(half + "@"), research, check)
+    assert command.goto == "__end__"
+    with pytest.raises(ConnectionError):
+        _run_planner(monkeypatch, _PlanLLM(half, ConnectionError("reset")), research, check)
+    assert stopped == [True, True]
+
+
+class _StepAgent:
+    """Answers with the title of its plan step; earlier steps take longer, so the branches finish in reverse."""
+
+    def __init__(self, finished: list):
+        self.finished = finished
+
+    @staticmethod
+    def _step(input: dict) -> tuple[str, float]:
+        title = input["messages"][-1].content.split("\n")[0].rsplit(": ", 1)[1]
+        return title, 0.1 * ("cba".index(title) + 1)
+
+    def invoke(self, input, config=None):
+        title, delay = self._step(input)
+        time.sleep(delay)
+        self.finished.append(title)
+        return {"output": f"result {title}"}
+
+    async def ainvoke(self, input, config=None):
+        title, delay = self._step(input)
+        await asyncio.sleep(delay)
+        self.finished.append(title)
+        return {"output": f"result {title}"}
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_fanned_out_results_are_merged_in_plan_order(monkeypatch, mode):
+    """Test that independent steps run at once and their messages still land in State.messages in plan order."""
+    plan = json.dumps(
+        {
+            "thought": "t",
+            "title": "T",
+            "steps": [
+                {"agent_name": "researcher", "title": "a", "description": "look up x"},
+                {"agent_name": "browser", "title": "b", "description": "open y"},
+                {"agent_name": "researcher", "title": "c", "description": "look up z"},
+                {"agent_name": "reporter", "title": "d", "description": "report"},
+            ],
+        }
+    )
+    llm = GenericFakeChatModel(
+        messages=iter([AIMessage(content=reply) for reply in ["handoff_to_planner()", plan, "report"]])
+    )
+    finished = []
+    monkeypatch.setattr(nodes, "get_llm_by_types", lambda llm_types: llm)
+    monkeypatch.setattr(nodes, "research_agent", _StepAgent(finished))
+    monkeypatch.setattr(nodes, "browser_agent", _StepAgent(finished))
+    graph = build_graph(fan_out=True, max_parallel_steps=3)
+    state = {
+        "TEAM_MEMBERS": ["researcher", "coder", "browser", "reporter"],
+        "messages": [{"role": "user", "content": "look up x, y and z"}],
+        "routing_mode": "plan",
+        "plan_step_index": 0,
+    }
+
+    started = time.monotonic()
+    result = graph.invoke(state) if mode == "sync" else asyncio.run(graph.ainvoke(state))
+    # One step at a time they would take 0.6s
+    assert time.monotonic() - started < 0.5
+    assert finished == ["c", "b", "a"]
+    steps = [m for m in result["messages"] if getattr(m, "name", None) in ("researcher", "browser")]
+    assert [m.name for m in steps] == ["researcher", "browser", "researcher"]
+    assert [m.content for m in steps] == [
+        nodes.RESPONSE_FORMAT.format(m.name, f"result {title}") for m, title in zip(steps, "abc")
+    ]
+    assert result["messages"][-1].name == "reporter"
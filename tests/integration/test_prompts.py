@@ -0,0 +1,40 @@
+import os
+
+from langchain_core.prompts import PromptTemplate
+
+from src.prompts.template import PromptRegistry, get_prompt_template, prompt_registry
+
+
+def test_compiled_prompt_matches_prompt_template():
+    """Test that the compiled formatter renders like PromptTemplate."""
+    state = {"CURRENT_TIME": "now", "TEAM_MEMBERS": ["researcher", "coder"]}
+    for name in ("supervisor", "planner", "coordinator", "reporter"):
+        expected = PromptTemplate.from_template(get_prompt_template(name)).format(**state)
+        assert prompt_registry.get(name).format(**state) == expected
+
+
+def test_registry_reloads_when_file_changes(tmp_path):
+    """Test that templates are parsed once and recompiled when the mtime changes."""
+    path = tmp_path / "greeting.md"
+    path.write_text("Hello <<NAME>>, {json} stays")
+    registry = PromptRegistry(str(tmp_path))
+
+    first = registry.get("greeting")
+    assert registry.get("greeting") is first
+    assert first.format(NAME="Ada") == "Hello Ada, {json} stays"
+
+    path.write_text("Bye <<NAME>>")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, first.mtime_ns + 1_000_000))
+    assert registry.get("greeting").format(NAME="Ada") == "Bye Ada"
+
+
+def test_variables_follow_a_static_prefix():
+    """Test that time and team members are rendered after the byte-identical instructions."""
+    for name in ("supervisor", "planner", "coordinator", "reporter", "researcher", "coder", "browser"):
+        prompt = prompt_registry.get(name)
+        first = prompt.format(CURRENT_TIME="Mon Jan 01 2024 10:00:00", TEAM_MEMBERS=["researcher"])
+        second = prompt.format(CURRENT_TIME="Tue Jan 02 2024 11:30:15", TEAM_MEMBERS=["coder"])
+        assert first.startswith(prompt.static_prefix) and second.startswith(prompt.static_prefix)
+        # Everything but the trailing variables block is shared
+        assert len(prompt.static_prefix) > 0.9 * len(first)
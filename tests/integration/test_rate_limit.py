@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.agents.rate_limit import RateLimitedTransport, RateLimiter, retry_after_seconds
+
+
+def test_waiting_calls_are_served_by_priority():
+    """Test that a latency-critical call overtakes a bulk call queued before it."""
+    limiter = RateLimiter("test", requests_per_minute=1200)
+    limiter._requests.level = 0
+    order = []
+
+    async def call(name: str, priority: int):
+        await limiter.aacquire(priority=priority)
+        order.append(name)
+
+    async def run():
+        reporter = asyncio.create_task(call("reporter", 3))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(call("supervisor", 0), reporter)
+
+    asyncio.run(run())
+    assert order == ["supervisor", "reporter"]
+    stats = limiter.get_stats()
+    assert stats["requests"] == 2 and stats["throttled"] == 2 and stats["waiting"] == 0
+
+
+def test_token_bucket_spreads_a_burst():
+    """Test that prompt tokens beyond the burst capacity wait for the refill."""
+    limiter = RateLimiter("test", tokens_per_minute=6000)
+    start = time.monotonic()
+    limiter.acquire(tokens=1000)
+    assert time.monotonic() - start < 0.05
+    limiter.acquire(tokens=20)
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+
+def test_429_pauses_calls_for_retry_after_and_slows_the_rate():
+    """Test that a 429 answer backs off all calls and later successes restore the rate."""
+    responses = iter([
+        httpx.Response(429, headers={"retry-after-ms": "300"}),
+        httpx.Response(200, json={}),
+    ])
+    limiter = RateLimiter("test", requests_per_minute=6000)
+    client = httpx.Client(
+        transport=RateLimitedTransport(httpx.MockTransport(lambda request: next(responses)), limiter)
+    )
+
+    assert client.post("http://llm/v1/chat/completions", json={}).status_code == 429
+    assert limiter.get_stats()["rate_factor"] == 0.5
+    start = time.monotonic()
+    assert client.post("http://llm/v1/chat/completions", json={}).status_code == 200
+    assert time.monotonic() - start >= 0.25
+
+    stats = limiter.get_stats()
+    assert stats["rate_limited"] == 1 and stats["throttled"] == 1
+    assert stats["rate_factor"] == pytest.approx(0.55)
+
+
+def test_retry_after_formats():
+    """Test parsing of retry-after-ms, delta seconds and missing headers."""
+    assert retry_after_seconds(httpx.Headers({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(httpx.Headers({"retry-after": "7"})) == 7
+    assert retry_after_seconds(httpx.Headers({"retry-after": "soon"})) is None
+    assert retry_after_seconds(httpx.Headers({})) is None
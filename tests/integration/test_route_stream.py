@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import AsyncIterator, Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.graph.budget import TokenBudget
+from src.graph.route_stream import RouteScanner, StreamingRouter
+from src.graph.types import OPTIONS
+from src.metrics import (
+    LLMMetricsCallback,
+    llm_errors,
+    llm_tokens,
+    supervisor_decision_duration,
+    supervisor_time_saved,
+)
+
+
+class _SlowJson(BaseChatModel):
+    """Streams its reply a few characters at a time and records whether the stream was closed."""
+
+    reply: str
+    delay: float = 0.02
+    closed: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-json"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _pieces(self) -> list[str]:
+        return [self.reply[i:i + 3] for i in range(0, len(self.reply), 3)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        try:
+            for piece in self._pieces():
+                time.sleep(self.delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        finally:
+            self.closed.append("sync")
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        try:
+            for piece in self._pieces():
+                await asyncio.sleep(self.delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        finally:
+            self.closed.append("async")
+
+
+def _router(reply: str) -> tuple[StreamingRouter, _SlowJson]:
+    model = _SlowJson(reply=reply, closed=[])
+    # Same layout as ChatOpenAI.with_structured_output: the bound model followed by its parser
+    return StreamingRouter(model.bind(stop=None) | JsonOutputParser(), OPTIONS), model
+
+
+def test_route_is_taken_once_the_next_value_is_unambiguous():
+    """Test that the decision returns before the rest of the answer is generated and the stream is closed."""
+    reply = '{"next": "coder", "reason": "' + "the task needs code " * 10 + '"}'
+    router, model = _router(reply)
+    _, early_before = supervisor_decision_duration.get(mode="early")
+    _, saved_before = supervisor_time_saved.get()
+
+    started = time.monotonic()
+    assert router.invoke([HumanMessage(content="route")]) == {"next": "coder"}
+    # 5 of the 75 chunks were read
+    assert time.monotonic() - started < 0.5
+    assert model.closed == ["sync"]
+
+    assert asyncio.run(router.ainvoke([HumanMessage(content="route")])) == {"next": "coder"}
+    assert model.closed == ["sync", "async"]
+    assert supervisor_decision_duration.get(mode="early")[1] == early_before + 2
+    assert supervisor_time_saved.get()[1] == saved_before + 2
+
+
+def test_tokens_of_a_closed_stream_are_estimated():
+    """Test that a stream cut short still counts its prompt and partial output, and no error."""
+    router, _ = _router('{"next": "browser", "reason": "' + "x" * 200 + '"}')
+    budget = TokenBudget()
+    config = {"callbacks": [budget, LLMMetricsCallback()], "metadata": {"langgraph_node": "route_stream_test"}}
+    RunnableLambda(router.invoke).invoke([HumanMessage(content="p" * 400)], config=config)
+
+    usage = budget.usage()["agents"]["route_stream_test"]
+    # Only the few characters read before the route was taken count as output
+    assert usage["input_tokens"] == 100 and 0 < usage["output_tokens"] <= 3
+    assert llm_tokens.get(agent="route_stream_test", type="input") == 100
+    assert llm_errors.get(agent="route_stream_test") == 0
+
+
+def test_undecided_stream_falls_back_to_the_full_parse():
+    """Test that an answer whose next value never becomes unambiguous is parsed in full."""
+    router, model = _router('{"next": "re", "note": "ambiguous"}')
+    _, full_before = supervisor_decision_duration.get(mode="full")
+    assert router.invoke([HumanMessage(content="route")]) == {"next": "re", "note": "ambiguous"}
+    assert supervisor_decision_duration.get(mode="full")[1] == full_before + 1
+
+
+def test_scanner_prefixes_and_tool_call_arguments():
+    """Test prefix disambiguation and reading function-calling arguments."""
+    scanner = RouteScanner(OPTIONS)
+    assert scanner.feed(AIMessageChunk(content='{"next": "re')) is None
+    assert scanner.feed(AIMessageChunk(content="p")) == "reporter"
+    assert scanner.remaining("reporter") == len('orter"}')
+
+    scanner = RouteScanner(OPTIONS)
+    chunk = AIMessageChunk(content="", tool_call_chunks=[{"name": "Router", "args": '{"next":"FIN', "id": "1", "index": 0}])
+    assert scanner.feed(chunk) == "FINISH"
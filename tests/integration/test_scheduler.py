@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.api import app as app_module
+from src.service.scheduler import QueueFullError, WorkflowScheduler
+
+
+async def _workflow(name: str, release: asyncio.Event):
+    yield {"event": "start_of_workflow", "data": {"workflow_id": name}}
+    await release.wait()
+    yield {"event": "end_of_workflow", "data": {"workflow_id": name}}
+
+
+async def _consume(scheduler, admission, name, release, log):
+    async for event in scheduler.run(admission, _workflow(name, release)):
+        log.append((name, event["event"], event["data"].get("position")))
+
+
+def test_scheduler_bounds_concurrency_and_queue():
+    """Test that excess workflows queue in order with position updates and overflow is rejected."""
+
+    async def run():
+        scheduler = WorkflowScheduler(max_concurrent=1, max_queue=2)
+        release = {name: asyncio.Event() for name in "abc"}
+        log = []
+        tasks = []
+        for name in "abc":
+            admission = scheduler.admit()
+            tasks.append(asyncio.create_task(_consume(scheduler, admission, name, release[name], log)))
+        with pytest.raises(QueueFullError):
+            scheduler.admit()
+        await asyncio.sleep(0)
+        stats_while_full = scheduler.get_stats()
+        for name in "abc":
+            release[name].set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        return log, stats_while_full, scheduler.get_stats()
+
+    log, full, done = asyncio.run(run())
+    assert [entry for entry in log if entry[1] == "queued"] == [
+        ("b", "queued", 1),
+        ("c", "queued", 2),
+        ("c", "queued", 1),
+    ]
+    starts = [name for name, event, _ in log if event == "start_of_workflow"]
+    assert starts == ["a", "b", "c"]
+    assert (full["running"], full["queue_depth"], full["rejected"]) == (1, 2, 1)
+    assert (done["running"], done["queue_depth"], done["admitted"]) == (0, 0, 3)
+    assert done["wait_seconds_max"] > 0
+
+
+def test_chat_endpoint_returns_429_when_queue_is_full(monkeypatch):
+    """Test that the API rejects requests with 429 and Retry-After once the queue is full."""
+    scheduler = WorkflowScheduler(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(app_module, "scheduler", scheduler)
+    running = scheduler.admit()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/chat/stream", json={"messages": [{"role": "user", "content": "hi"}]}
+            )
+
+    response = asyncio.run(run())
+    running.release()
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "5"
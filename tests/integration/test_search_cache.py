@@ -0,0 +1,71 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+from src.cache import SqliteTTLStore
+from src.tools import search
+from src.tools.search import CachedTavilySearch, normalize_query
+
+
+class _StubSearchAPI(TavilySearchAPIWrapper):
+    """Local stand-in for the Tavily API that counts upstream requests."""
+
+    calls: int = 0
+    delay: float = 0.05
+    fail: bool = False
+
+    def _results(self, query):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return {"results": [{"title": query, "url": "https://example.com", "content": f"about {query}", "score": 1.0}]}
+
+    def raw_results(self, query, *args, **kwargs):
+        time.sleep(self.delay)
+        return self._results(query)
+
+    async def raw_results_async(self, query, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._results(query)
+
+
+@pytest.fixture
+def tool(tmp_path, monkeypatch):
+    store = SqliteTTLStore(str(tmp_path / "search.sqlite"), ttl_seconds=60, max_bytes=1 << 20)
+    monkeypatch.setattr(search, "search_cache", store)
+    return CachedTavilySearch(name="tavily_search", max_results=5, api_wrapper=_StubSearchAPI())
+
+
+def test_normalized_queries_share_cache_entry(tool):
+    """Test that near-identical queries are served from the cache."""
+    assert normalize_query('  "What is   MCP?" ') == "what is mcp"
+    first = tool.invoke({"query": "What is MCP?"})
+    assert tool.invoke({"query": "what is mcp"}) == first
+    assert tool.api_wrapper.calls == 1
+
+
+def test_concurrent_searches_are_coalesced(tool):
+    """Test that concurrent identical searches share one upstream request."""
+
+    async def run():
+        return await asyncio.gather(*(tool.ainvoke({"query": "LangGraph"}) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert tool.api_wrapper.calls == 1
+    assert all(result == results[0] for result in results)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: tool.invoke({"query": "deer flow"}), range(4)))
+    assert tool.api_wrapper.calls == 2
+
+
+def test_failed_searches_are_not_cached(tool):
+    """Test that upstream errors are returned but not stored."""
+    tool.api_wrapper.fail = True
+    assert "upstream down" in tool.invoke({"query": "flaky"})
+    tool.api_wrapper.fail = False
+    assert tool.invoke({"query": "flaky"})[0]["content"] == "about flaky"
+    assert tool.api_wrapper.calls == 2
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+from src.api.sse import coalesce_message_deltas, dumps
+
+
+def _delta(message_id, text, field="content"):
+    return {"event": "message", "data": {"message_id": message_id, "delta": {field: text}}}
+
+
+async def _stream(events, delays=None):
+    for i, event in enumerate(events):
+        if delays and delays.get(i):
+            await asyncio.sleep(delays[i])
+        yield event
+
+
+def _coalesce(events, delays=None, window_ms=50, max_chars=1000):
+    async def run():
+        return [
+            event
+            async for event in coalesce_message_deltas(
+                _stream(events, delays), window_ms, max_chars
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_consecutive_deltas_are_merged_in_order():
+    """Test that deltas of the same message and field merge without reordering other events."""
+    events = [
+        {"event": "start_of_llm", "data": {"agent_name": "planner"}},
+        _delta("a", "thinking ", "reasoning_content"),
+        _delta("a", "hard", "reasoning_content"),
+        _delta("a", "Hel"),
+        _delta("a", "lo"),
+        _delta("b", "other"),
+        {"event": "end_of_llm", "data": {"agent_name": "planner"}},
+    ]
+    assert _coalesce(events) == [
+        events[0],
+        _delta("a", "thinking hard", "reasoning_content"),
+        _delta("a", "Hello"),
+        _delta("b", "other"),
+        events[-1],
+    ]
+    assert _coalesce(events, window_ms=0) == events
+
+
+def test_window_and_size_limit_flush_pending_deltas():
+    """Test that a stalled stream flushes after the window and large deltas flush early."""
+    events = [_delta("a", "x"), _delta("a", "y"), _delta("a", "z")]
+    # The stream stalls for longer than the window after the second delta
+    assert _coalesce(events, delays={2: 0.2}) == [_delta("a", "xy"), _delta("a", "z")]
+    assert _coalesce(events, max_chars=2) == [_delta("a", "xy"), _delta("a", "z")]
+
+
+def test_upstream_errors_propagate():
+    """Test that an error in the workflow stream reaches the SSE generator."""
+
+    async def failing():
+        yield _delta("a", "x")
+        raise RuntimeError("boom")
+
+    async def run():
+        return [event async for event in coalesce_message_deltas(failing(), 50, 1000)]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+@pytest.mark.parametrize("window_ms", [0, 50])
+def test_closing_the_stream_closes_the_upstream_at_once(window_ms):
+    """Test that closing the coalesced stream runs the upstream's cleanup before aclose returns."""
+    closed = []
+
+    async def upstream():
+        try:
+            yield _delta("a", "x")
+            yield {"event": "end_of_llm", "data": {}}
+            await asyncio.sleep(10)
+        finally:
+            closed.append(True)
+
+    async def run():
+        stream = coalesce_message_deltas(upstream(), window_ms, 1000)
+        first = await anext(stream)
+        await stream.aclose()
+        return first, list(closed)
+
+    first, closed_on_return = asyncio.run(run())
+    assert first["data"]["delta"] == {"content": "x"}
+    assert closed_on_return == [True]
+
+
+def test_dumps_matches_json_without_ascii_escaping():
+    """Test that the fast encoder produces the same JSON as json.dumps."""
+    data = {"delta": {"content": "你好 \"x\""}, "n": [1, 2.5, None, True]}
+    assert json.loads(dumps(data)) == data
+    assert "你好" in dumps(data)
@@ -0,0 +1,117 @@
+import json
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import RunnableLambda
+
+from src.agents import llm
+from src.graph import nodes
+from src.graph.budget import CONFIG_KEY_TOKEN_BUDGET, TokenBudget
+
+PLAN = json.dumps(
+    {
+        "thought": "t",
+        "title": "T",
+        "steps": [
+            {"agent_name": "researcher", "title": "a", "description": "look up x"},
+            {"agent_name": "reporter", "title": "b", "description": "write it up"},
+        ],
+    }
+)
+
+
+def _record_call(budget: TokenBudget, agent: str, input_tokens: int, output_tokens: int):
+    run_id = uuid.uuid4()
+    budget.on_chat_model_start({}, [], run_id=run_id, metadata={"langgraph_node": agent})
+    message = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    )
+    budget.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+
+def _in_workflow(budget: TokenBudget, func, *args):
+    """Call func the way a graph node is called, with the budget in the runnable config."""
+    return RunnableLambda(lambda _: func(*args)).invoke(
+        None, config={"configurable": {CONFIG_KEY_TOKEN_BUDGET: budget}}
+    )
+
+
+def test_budget_accumulates_usage_per_agent_and_restores_it():
+    """Test that usage is counted per agent and can be restored from a snapshot."""
+    budget = TokenBudget(limit=1000, agent_limits={"researcher": 200}, degrade_ratio=0.5)
+    _record_call(budget, "planner", 300, 100)
+    _record_call(budget, "researcher", 150, 60)
+
+    usage = budget.usage()
+    assert usage["total_tokens"] == 610
+    assert usage["agents"]["researcher"] == {
+        "input_tokens": 150,
+        "output_tokens": 60,
+        "total_tokens": 210,
+    }
+    assert budget.exhausted("researcher") and not budget.exhausted()
+    assert budget.degraded("coder") and not budget.exhausted("coder")
+
+    restored = TokenBudget(usage["limit"], usage["agent_limits"], usage=usage)
+    assert restored.usage() == usage
+
+
+def test_agents_switch_to_cheaper_models_near_the_budget(monkeypatch):
+    """Test that LLM types are degraded once the degrade ratio is reached."""
+    monkeypatch.setitem(llm.LLM_ENDPOINTS, "cheap", ("small", "https://cheap"))
+    budget = TokenBudget(limit=1000, degrade_ratio=0.8)
+    planner = ("reasoning", "basic")
+    assert _in_workflow(budget, nodes._llm_types, "planner", planner) == planner
+    _record_call(budget, "planner", 700, 100)
+    assert _in_workflow(budget, nodes._llm_types, "planner", planner) == ("basic", "cheap")
+    assert _in_workflow(budget, nodes._llm_types, "researcher", ("basic", "cheap")) == ("cheap",)
+    assert _in_workflow(budget, nodes._llm_types, "browser", ("vision",)) == ("vision",)
+    assert budget.usage()["budget_actions"] == ["degraded:planner", "degraded:researcher"]
+    # Outside a workflow nothing is degraded
+    assert nodes._llm_types("planner", planner) == planner
+
+    # Without a separate cheap model, moving basic to cheap is not a downgrade
+    monkeypatch.setitem(llm.LLM_ENDPOINTS, "cheap", llm.LLM_ENDPOINTS["basic"])
+    budget = TokenBudget(limit=1000, degrade_ratio=0.8)
+    _record_call(budget, "planner", 700, 100)
+    assert _in_workflow(budget, nodes._llm_types, "researcher", ("basic", "cheap")) == ("basic", "cheap")
+    assert _in_workflow(budget, nodes._llm_types, "planner", planner) == ("basic",)
+    assert budget.usage()["budget_actions"] == ["degraded:planner"]
+
+
+def test_supervisor_hands_over_to_reporter_then_finishes_when_budget_is_exhausted():
+    """Test that an exhausted request budget skips the routing LLM and wraps up the run."""
+    budget = TokenBudget(limit=100)
+    _record_call(budget, "researcher", 90, 20)
+    state = {"messages": [HumanMessage(content="hi")], "routing_stats": {}}
+
+    command = _in_workflow(budget, nodes.supervisor_node, state)
+    assert command.goto == "reporter"
+    assert command.update["routing_stats"]["llm_calls"] == 0
+    assert command.update["token_usage"]["total_tokens"] == 110
+
+    state["messages"].append(HumanMessage(content="Response from reporter", name="reporter"))
+    command = _in_workflow(budget, nodes.supervisor_node, state)
+    assert command.goto == "__end__"
+
+
+def test_supervisor_redirects_agents_over_their_budget():
+    """Test that a plan step for an agent over its own budget goes to the reporter instead."""
+    budget = TokenBudget(agent_limits={"researcher": 50})
+    _record_call(budget, "researcher", 40, 20)
+    state = {
+        "messages": [HumanMessage(content="hi")],
+        "routing_mode": "plan",
+        "full_plan": PLAN,
+        "plan_step_index": 0,
+    }
+
+    command = _in_workflow(budget, nodes.supervisor_node, state, 3)
+    assert command.goto == "reporter"
+    assert "redirected:researcher->reporter" in budget.usage()["budget_actions"]
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+
+from src.agents.tool_loop import MAX_ITERATIONS_OUTPUT, ToolCallingAgent, tool_batches
+
+PROMPT = ChatPromptTemplate.from_messages(
+    [("system", "You look things up."), MessagesPlaceholder("messages"), MessagesPlaceholder("agent_scratchpad")]
+)
+QUERIES = ["alpha", "beta", "gamma", "delta"]
+
+
+class _Planner(BaseChatModel):
+    """Asks for one lookup per query in its first turn, then answers with the tool results it got."""
+
+    always_call: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "planner"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        results = [message.content for message in messages if isinstance(message, ToolMessage)]
+        if results and not self.always_call:
+            message = AIMessage(content=" ".join(results))
+        else:
+            calls = [
+                {"name": "lookup", "args": {"query": query}, "id": f"call_{len(results)}_{i}"}
+                for i, query in enumerate(QUERIES)
+            ]
+            message = AIMessage(content="", tool_calls=calls)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class _Gauge:
+    """Tracks how many lookups run at the same time."""
+
+    def __init__(self):
+        self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.running -= 1
+
+
+def _lookup_tool(gauge: _Gauge, delay: float = 0.4):
+    @tool
+    async def lookup(query: str) -> str:
+        """Look up a query."""
+        with gauge:
+            # Later queries finish first, so ordered results are not a side effect of timing
+            await asyncio.sleep(delay * (len(QUERIES) - QUERIES.index(query)) / len(QUERIES))
+        return f"<{query}>"
+
+    def lookup_sync(query: str) -> str:
+        with gauge:
+            time.sleep(delay * (len(QUERIES) - QUERIES.index(query)) / len(QUERIES))
+        return f"<{query}>"
+
+    lookup.func = lookup_sync
+    return lookup
+
+
+def test_tool_calls_of_a_turn_run_concurrently_in_order():
+    """Test that the lookups of one turn overlap and their results keep the order of the calls."""
+    gauge = _Gauge()
+    agent = ToolCallingAgent(_Planner(), [_lookup_tool(gauge)], PROMPT)
+    expected = " ".join(f"<{query}>" for query in QUERIES)
+
+    async def run():
+        events = [
+            event
+            async for event in agent.astream_events({"messages": [HumanMessage(content="go")]}, version="v2")
+        ]
+        return events[-1]["data"]["output"]["output"], events
+
+    started = time.monotonic()
+    output, events = asyncio.run(run())
+    assert output == expected
+    # Run one at a time the lookups would take 1s
+    assert time.monotonic() - started < 0.8 and gauge.peak == 4
+    # Tool start and end events still reach the event stream, one pair per call
+    assert [e["data"]["input"]["query"] for e in events if e["event"] == "on_tool_start"] == QUERIES
+    assert sorted(e["data"]["output"] for e in events if e["event"] == "on_tool_end") == sorted(
+        f"<{query}>" for query in QUERIES
+    )
+
+    gauge.peak = 0
+    assert agent.invoke({"messages": [HumanMessage(content="go")]}) == {"output": expected}
+    assert gauge.peak == 4
+
+
+def test_per_tool_limit_and_max_iterations():
+    """Test that a tool's concurrency limit holds in both paths and the loop stops after max_iterations."""
+    gauge = _Gauge()
+    agent = ToolCallingAgent(
+        _Planner(), [_lookup_tool(gauge, delay=0.04)], PROMPT, concurrency_limits={"lookup": 2}
+    )
+    asyncio.run(agent.ainvoke({"messages": [HumanMessage(content="go")]}))
+    assert gauge.peak == 2
+    gauge.peak = 0
+    agent.invoke({"messages": [HumanMessage(content="go")]})
+    assert gauge.peak == 2
+
+    looping = ToolCallingAgent(_Planner(always_call=True), [_lookup_tool(gauge, 0)], PROMPT, max_iterations=3)
+    assert looping.invoke({"messages": [HumanMessage(content="go")]}) == {"output": MAX_ITERATIONS_OUTPUT}
+
+
+def test_calls_with_side_effects_run_alone():
+    """Test that calls to sequential tools split the turn into batches."""
+    calls = [{"name": name} for name in ["read_file", "read_file", "write_file", "read_file", "list_directory"]]
+    assert tool_batches(calls, ["write_file"]) == [[0, 1], [2], [3, 4]]
+    assert tool_batches(calls) == [[0, 1, 2, 3, 4]]
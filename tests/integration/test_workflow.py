@@ -1,6 +1,18 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Iterator
+
 import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import ensure_config
+
 from src.workflow import run_agent_workflow, enable_debug_logging
-import logging
+from src.agents.tool_loop import ToolCallingAgent
+from src.graph import build_graph, nodes
 
 
 def test_enable_debug_logging():
@@ -22,3 +34,93 @@ def test_run_agent_workflow_empty_input():
     """Test workflow execution with empty input."""
     with pytest.raises(ValueError):
         run_agent_workflow("")
+
+
+PLAN = json.dumps(
+    {
+        "thought": "t",
+        "title": "T",
+        "steps": [
+            {"agent_name": "researcher", "title": "a", "description": "look up x"},
+            {"agent_name": "reporter", "title": "r", "description": "report"},
+        ],
+    }
+)
+REPLIES = {"coordinator": "handoff_to_planner()", "planner": PLAN, "researcher": "found x", "reporter": "report"}
+
+
+class _NodeModel(BaseChatModel):
+    """Answers as the graph node calling it and records whether the sync or the async API was used."""
+
+    calls: list
+
+    @property
+    def _llm_type(self) -> str:
+        return "node"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, run_manager, mode: str) -> AIMessage:
+        node = ensure_config()["metadata"]["langgraph_node"]
+        self.calls.append((node, mode))
+        return AIMessage(content=REPLIES[node])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._reply(run_manager, "sync"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._reply(run_manager, "async"))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        yield ChatGenerationChunk(message=AIMessageChunk(content=self._reply(run_manager, "sync").content))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        yield ChatGenerationChunk(message=AIMessageChunk(content=self._reply(run_manager, "async").content))
+
+
+@pytest.fixture
+def node_model(monkeypatch) -> _NodeModel:
+    model = _NodeModel(calls=[])
+    prompt = ChatPromptTemplate.from_messages(
+        [MessagesPlaceholder("messages"), MessagesPlaceholder("agent_scratchpad")]
+    )
+    monkeypatch.setattr(nodes, "get_llm_by_types", lambda llm_types: model)
+    monkeypatch.setattr(nodes, "research_agent", ToolCallingAgent(model, [], prompt))
+    return model
+
+
+def _graph_input() -> dict:
+    return {
+        "TEAM_MEMBERS": ["researcher", "coder", "browser", "reporter"],
+        "messages": [{"role": "user", "content": "look up x and report"}],
+        "routing_mode": "plan",
+        "plan_step_index": 0,
+    }
+
+
+def test_sync_and_async_runs_use_the_matching_node_implementations(node_model):
+    """Test that invoke runs the sync nodes, while ainvoke and astream_events run the async ones."""
+    graph = build_graph()
+    agents = ["coordinator", "planner", "researcher", "reporter"]
+
+    result = graph.invoke(_graph_input())
+    assert result["messages"][-1].name == "reporter"
+    assert [node for node, _ in node_model.calls] == agents
+    assert {mode for _, mode in node_model.calls} == {"sync"}
+
+    for run in (
+        lambda: graph.ainvoke(_graph_input()),
+        lambda: graph.astream_events(_graph_input(), version="v2"),
+    ):
+        node_model.calls.clear()
+
+        async def consume():
+            output = run()
+            if hasattr(output, "__aiter__"):
+                return [event async for event in output]
+            return await output
+
+        asyncio.run(consume())
+        assert [node for node, _ in node_model.calls] == agents
+        assert {mode for _, mode in node_model.calls} == {"async"}
@@ -0,0 +1,173 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import httpx
+from langgraph.graph import END, START, StateGraph
+
+from src.api import app as app_module
+from src.graph.checkpoint import SqliteCheckpointSaver
+from src.service import workflow_service
+from src.service.jobs import CANCELLED, COMPLETED, PENDING, JobManager
+from src.service.scheduler import WorkflowScheduler
+
+
+async def _workflow(n: int, started: asyncio.Event = None, release: asyncio.Event = None):
+    for i in range(n):
+        if i == 1 and started is not None:
+            started.set()
+            await release.wait()
+        yield {"event": "message", "data": {"message_id": "run-1", "delta": {"content": str(i)}}}
+    yield {"event": "end_of_workflow", "data": {"workflow_id": "wf"}}
+
+
+async def _collect(job, last_event_id=0, limit=None):
+    received = []
+    async for event_id, event in job.events(last_event_id):
+        received.append((event_id, event))
+        if limit is not None and len(received) == limit:
+            break
+    return received
+
+
+def test_job_outlives_subscriber_and_replays_after_last_event_id():
+    """Test that a dropped subscriber misses nothing after reconnecting with Last-Event-ID."""
+
+    async def run():
+        manager = JobManager(buffer_size=100, retention_seconds=60)
+        started, release = asyncio.Event(), asyncio.Event()
+        job = manager.submit("wf", _workflow(5, started, release))
+        await started.wait()
+        # The first client disconnects after one event
+        first = await _collect(job, limit=1)
+        release.set()
+        rest = await _collect(job, last_event_id=first[-1][0])
+        return job, first, rest
+
+    job, first, rest = asyncio.run(run())
+    assert job.status == COMPLETED
+    assert [event_id for event_id, _ in first + rest] == [1, 2, 3, 4, 5, 6]
+    assert rest[-1][1]["event"] == "end_of_workflow"
+
+
+def test_ring_buffer_overflow():
+    """Test that events evicted from the ring buffer are reported as dropped."""
+
+    async def run():
+        manager = JobManager(buffer_size=3, retention_seconds=60)
+        return await _collect(manager.submit("a", _workflow(9)))
+
+    replay = asyncio.run(run())
+    assert replay[0][1] == {"event": "events_dropped", "data": {"from_id": 1, "to_id": 7}}
+    assert [event_id for event_id, _ in replay[1:]] == [8, 9, 10]
+
+
+def test_cancelling_a_queued_job_releases_its_scheduler_slot():
+    """Test that a job cancelled while queued gives its admission back, before or after it started."""
+
+    async def run():
+        scheduler = WorkflowScheduler(max_concurrent=1, max_queue=8)
+        manager = JobManager(buffer_size=100, retention_seconds=60)
+
+        def submit(job_id):
+            admission = scheduler.admit()
+            return manager.submit(job_id, scheduler.run(admission, _workflow(3)), admission)
+
+        running, queued = submit("a"), submit("b")
+        # Cancelled before its task took a single step
+        assert queued.cancel()
+        # Cancelled while waiting in the scheduler queue
+        waiting = submit("c")
+        await asyncio.sleep(0)
+        assert waiting.status == PENDING and waiting.cancel()
+        await _collect(running)
+        cancelled = await _collect(queued)
+        await _collect(waiting)
+        return scheduler.get_stats(), running, queued, waiting, cancelled
+
+    stats, running, queued, waiting, cancelled = asyncio.run(run())
+    assert (stats["running"], stats["queue_depth"]) == (0, 0)
+    assert running.status == COMPLETED and queued.status == waiting.status == CANCELLED
+    assert [event["event"] for _, event in cancelled] == ["workflow_cancelled"]
+
+
+def test_workflow_job_endpoints(monkeypatch):
+    """Test starting a background workflow and resuming its event stream over HTTP."""
+    monkeypatch.setattr(app_module, "run_agent_workflow", lambda *args: _workflow(3))
+    monkeypatch.setattr(
+        app_module, "job_manager", JobManager(buffer_size=100, retention_seconds=60)
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            created = await client.post(
+                "/api/workflows", json={"messages": [{"role": "user", "content": "hi"}]}
+            )
+            workflow_id = created.json()["workflow_id"]
+            while (await client.get(f"/api/workflows/{workflow_id}")).json()["status"] != COMPLETED:
+                await asyncio.sleep(0.01)
+            replay = await client.get(f"/api/workflows/{workflow_id}/events")
+            resumed = await client.get(
+                f"/api/workflows/{workflow_id}/events", headers={"Last-Event-ID": "1"}
+            )
+            missing = await client.get("/api/workflows/unknown")
+            return created, replay, resumed, missing
+
+    created, replay, resumed, missing = asyncio.run(run())
+    assert created.status_code == 202
+    # The deltas were coalesced into one event before being logged
+    assert '"012"' in replay.text
+    ids = [line[3:].strip() for line in resumed.text.splitlines() if line.startswith("id:")]
+    assert ids == ["2"]
+    assert "event: end_of_workflow" in resumed.text
+    assert missing.status_code == 404
+
+
+class _State(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def test_workflow_ids_are_claimed_across_paths(monkeypatch, tmp_path):
+    """Test that a running workflow id blocks every path, and new runs cannot reuse a checkpointed id."""
+    builder = StateGraph(_State)
+    builder.add_node("step", lambda state: {"steps": ["done"]})
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    graph = builder.compile(checkpointer=SqliteCheckpointSaver(str(tmp_path / "cp.sqlite")))
+    graph.invoke({"steps": []}, {"configurable": {"thread_id": "old"}})
+    release = asyncio.Event()
+
+    async def stream(graph_input, workflow_id, *args):
+        await release.wait()
+        yield {"event": "end_of_workflow", "data": {"workflow_id": workflow_id}}
+
+    monkeypatch.setattr(workflow_service, "graph", graph)
+    monkeypatch.setattr(workflow_service, "_stream_workflow", stream)
+    monkeypatch.setattr(
+        app_module, "job_manager", JobManager(buffer_size=100, retention_seconds=60)
+    )
+    body = {"messages": [{"role": "user", "content": "hi"}]}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            reused = await client.post("/api/workflows", json={**body, "workflow_id": "old"})
+            created = await client.post("/api/workflows", json={**body, "workflow_id": "new"})
+            # The job holds the id while it waits for its first event
+            while "new" not in workflow_service._running_workflows:
+                await asyncio.sleep(0.01)
+            busy = [
+                await client.post("/api/chat/stream", json={**body, "workflow_id": "new"}),
+                await client.post("/api/chat/resume", json={"workflow_id": "new"}),
+            ]
+            release.set()
+            while (await client.get("/api/workflows/new")).json()["status"] != COMPLETED:
+                await asyncio.sleep(0.01)
+            return reused, created, busy
+
+    reused, created, busy = asyncio.run(run())
+    assert reused.status_code == 409 and "/api/chat/resume" in reused.json()["detail"]
+    assert created.status_code == 202
+    assert [response.status_code for response in busy] == [409, 409]
+    assert workflow_service._running_workflows == set()